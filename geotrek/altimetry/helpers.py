@@ -1,9 +1,11 @@
 import logging
+from hashlib import md5
 
-from django.contrib.gis.geos import GEOSGeometry
+import numpy as np
+from django.contrib.gis.geos import Polygon
+from django.core.cache import caches
 from django.utils import translation
 from django.utils.translation import gettext as _, get_language
-from django.contrib.gis.geos import LineString
 from django.conf import settings
 from django.db import connection
 
@@ -18,6 +20,9 @@ class AltimetryHelper:
     def elevation_profile(cls, geometry3d, precision=None, offset=0):
         """Extract elevation profile from a 3D geometry.
 
+        Returns (distance, x, y, z) for each vertex, distance being measured
+        along the 2D geometry and coordinates expressed in API_SRID.
+
         :precision:  geometry sampling in meters
         """
         precision = precision or settings.ALTIMETRIC_PROFILE_PRECISION
@@ -25,31 +30,23 @@ class AltimetryHelper:
         if geometry3d.geom_type == 'Point':
             return [[0, geometry3d.x, geometry3d.y, geometry3d.z]]
 
-        if geometry3d.geom_type == 'MultiLineString':
-            profile = []
-            for subcoords in geometry3d.coords:
-                subline = LineString(subcoords, srid=geometry3d.srid)
-                offset += subline.length
-                subprofile = AltimetryHelper.elevation_profile(subline, precision, offset)
-                profile.extend(subprofile)
-            return profile
+        multi = geometry3d.geom_type == 'MultiLineString'
+        parts = geometry3d.coords if multi else [geometry3d.coords]
 
-        # Add measure to 2D version of geometry3d
         # Get distance from origin for each vertex
-        sql = """
-        WITH line2d AS (SELECT ST_Force2D('%(ewkt)s'::geometry) AS geom),
-             line_measure AS (SELECT ST_Addmeasure(geom, 0, ST_length(geom)) AS geom FROM line2d),
-             points2dm AS (SELECT (ST_DumpPoints(geom)).geom AS point FROM line_measure)
-        SELECT (%(offset)s + ST_M(point)) FROM points2dm;
-        """ % {'offset': offset, 'ewkt': geometry3d.ewkt}
-        cursor = connection.cursor()
-        cursor.execute(sql)
-        pointsm = cursor.fetchall()
+        distances = []
+        for coords in parts:
+            points = np.array(coords, dtype=float)
+            steps = np.hypot(np.diff(points[:, 0]), np.diff(points[:, 1]))
+            if multi:
+                offset += steps.sum()
+            distances.append(offset + np.concatenate(([0.0], np.cumsum(steps))))
+
         # Join (offset+distance, x, y, z) together
         geom3dapi = geometry3d.transform(settings.API_SRID, clone=True)
-        assert len(pointsm) == len(geom3dapi.coords), 'Cannot map distance to xyz'
-        dxyz = [pointsm[i] + v for i, v in enumerate(geom3dapi.coords)]
-        return dxyz
+        coords3dapi = np.array(sum(geom3dapi.coords, ()) if multi else geom3dapi.coords, dtype=float)
+        dxyz = np.column_stack((np.concatenate(distances), coords3dapi))
+        return [tuple(v) for v in dxyz.tolist()]
 
     @classmethod
     def altimetry_limits(cls, profile):
@@ -126,6 +123,31 @@ class AltimetryHelper:
 
     @classmethod
     def elevation_area(cls, geom):
+        """Extract elevations on a regular grid around the geometry.
+
+        Result is cached for the geometry and the currently loaded DEM.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT MAX(rid) FROM altimetry_dem")
+            dem_version = cursor.fetchone()[0]
+        area_cache = caches['fat']
+        cache_lookup = f"altimetry_dem_area_{md5(geom.ewkb).hexdigest()}_{dem_version}"
+        area = area_cache.get(cache_lookup)
+        if area is None:
+            area = cls._elevation_area(geom)
+            if area:
+                area_cache.set(cache_lookup, area)
+        return area
+
+    @classmethod
+    def _world_to_raster(cls, coords, origin, scale):
+        """Index of pixels containing coordinates, as computed by ST_Value"""
+        cells = (coords - origin) / scale
+        rounded = np.round(cells)
+        return np.where(np.abs(rounded - cells) <= np.finfo(np.float32).eps, rounded, np.floor(cells)).astype(int)
+
+    @classmethod
+    def _elevation_area(cls, geom):
         xmin, ymin, xmax, ymax = cls._nice_extent(geom)
         width = xmax - xmin
         height = ymax - ymin
@@ -138,74 +160,64 @@ class AltimetryHelper:
         if height < precision or width < precision:
             precision = min([height, width])
 
+        # Grid of sampled points, from south-west to north-east
+        columns = np.arange(xmin, xmax + 1, precision, dtype=float)
+        lines = np.arange(ymin, ymax + 1, precision, dtype=float)
+        resolution_w, resolution_h = len(columns), len(lines)
+
+        # Fetch DEM pixels covering the grid at once, resampled to one pixel per point of the grid
+        # (pixels centered on points), so that fine DEMs do not send more values than the grid has
         sql = """
-            -- Author: Celian Garcia
-            WITH columns AS (
-                    SELECT generate_series({xmin}::int, {xmax}::int, {precision}) AS x
-                ),
-                lines AS (
-                    SELECT generate_series({ymin}::int, {ymax}::int, {precision}) AS y
-                ),
-                resolution AS (
-                    SELECT x, y
-                    FROM (SELECT COUNT(x) AS x FROM columns) AS col,
-                         (SELECT COUNT(y) AS y FROM lines)   AS lin
-                ),
-                points2d AS (
-                    SELECT row_number() OVER (ORDER BY lines.y, columns.x) AS id,
-                           ST_SetSRID(ST_MakePoint(x, y), {srid}) AS geom,
-                           ST_Transform(ST_SetSRID(ST_MakePoint(x, y), {srid}), 4326) AS geomll
-                    FROM columns, lines
-                ),
-                draped AS (
-                    SELECT id, CASE WHEN ST_Value(altimetry_dem.rast, p.geom)::int = -99999 THEN 0 ELSE ST_Value(altimetry_dem.rast, p.geom)::int END AS altitude
-                    FROM altimetry_dem, points2d AS p
-                    WHERE ST_Intersects(altimetry_dem.rast, p.geom)
+            WITH tiles AS (
+                    SELECT ST_Union(rast) AS rast
+                    FROM altimetry_dem
+                    WHERE ST_Intersects(rast, ST_MakeEnvelope(%(xmin)s, %(ymin)s, %(xmax)s, %(ymax)s, %(srid)s))
                 ),
-                all_draped AS (
-                    SELECT geomll, geom, altitude
-                    FROM points2d LEFT JOIN draped ON (points2d.id = draped.id)
-                    ORDER BY points2d.id
+                clipped AS (
+                    SELECT ST_Clip(rast, ST_Expand(ST_MakeEnvelope(%(xmin)s, %(ymin)s, %(xmax)s, %(ymax)s, %(srid)s),
+                                                   ST_PixelWidth(rast) + ST_PixelHeight(rast))) AS rast
+                    FROM tiles
+                    WHERE rast IS NOT NULL
                 ),
-                extent_latlng AS (
-                    SELECT ST_Envelope(ST_Union(geom)) AS extent,
-                           MIN(altitude) AS min_z,
-                           MAX(altitude) AS max_z,
-                           AVG(altitude) AS center_z
-                    FROM all_draped
+                resampled AS (
+                    SELECT ST_Resample(rast, ST_MakeEmptyRaster(1, 1, %(xmin)s - %(step)s / 2.0, %(ymax)s + %(step)s / 2.0,
+                                                                %(step)s, -1.0 * %(step)s, 0, 0, %(srid)s),
+                                       'NearestNeighbour') AS rast
+                    FROM clipped
                 )
-            SELECT extent,
-                   ST_transform(extent, 4326),
-                   center_z,
-                   min_z,
-                   max_z,
-                   resolution.x AS resolution_w,
-                   resolution.y AS resolution_h,
-                   altitude
-            FROM extent_latlng, resolution, all_draped;
-        """.format(xmin=xmin, ymin=ymin, xmax=xmax, ymax=ymax,
-                   srid=settings.SRID, precision=precision)
-        cursor = connection.cursor()
-        cursor.execute(sql)
-        result = cursor.fetchall()
-        first = result[0]
-        envelop_native, envelop, center_z, min_z, max_z, resolution_w, resolution_h, a = first
-        envelop = GEOSGeometry(envelop, srid=4326)
-        envelop_native = GEOSGeometry(envelop_native, srid=settings.SRID)
-
-        if center_z is None:
+            SELECT ST_UpperLeftX(rast), ST_UpperLeftY(rast), ST_ScaleX(rast), ST_ScaleY(rast), ST_DumpValues(rast, 1)
+            FROM resampled;
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {'xmin': columns[0], 'ymin': lines[0], 'xmax': columns[-1], 'ymax': lines[-1],
+                                 'step': float(precision), 'srid': settings.SRID})
+            result = cursor.fetchone()
+        if result is None or result[4] is None:
+            logger.warning("No DEM present")
+            return {}
+        upperleft_x, upperleft_y, scale_x, scale_y, values = result
+        # NULL (no data) values become NaN
+        pixels = np.rint(np.array(values, dtype=float))
+        pixels[pixels == -99999] = 0
+
+        # Sample the pixel containing each point of the grid
+        cols = cls._world_to_raster(columns, upperleft_x, scale_x)
+        rows = cls._world_to_raster(lines, upperleft_y, scale_y)
+        cols_inside = (cols >= 0) & (cols < pixels.shape[1])
+        rows_inside = (rows >= 0) & (rows < pixels.shape[0])
+        grid = np.full((resolution_h, resolution_w), np.nan)
+        grid[np.ix_(rows_inside, cols_inside)] = pixels[np.ix_(rows[rows_inside], cols[cols_inside])]
+        if np.isnan(grid).all():
             logger.warning("No DEM present")
             return {}
+        min_z = int(np.nanmin(grid))
+        max_z = int(np.nanmax(grid))
+        center_z = np.nanmean(grid)
+        altitudes = (np.nan_to_num(grid, nan=0.0) - min_z).tolist()
 
-        altitudes = []
-        row = []
-        for i, record in enumerate(result):
-            if i > 0 and i % resolution_w == 0:
-                altitudes.append(row)
-                row = []
-            elevation = (record[7] or 0.0) - min_z
-            row.append(elevation)
-        altitudes.append(row)
+        envelop_native = Polygon.from_bbox((columns[0], lines[0], columns[-1], lines[-1]))
+        envelop_native.srid = settings.SRID
+        envelop = envelop_native.transform(4326, clone=True)
 
         area = {
             'center': {
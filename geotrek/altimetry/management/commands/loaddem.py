@@ -1,16 +1,20 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from django.apps import apps
 from django.contrib.gis.gdal.error import GDALException
 from django.core.management.base import BaseCommand, CommandError
-from django.db import connection
+from django.db import connection, transaction, DatabaseError
 from django.db.models import F
 from django.conf import settings
 from django.contrib.gis.gdal import GDALRaster
 import os.path
 from subprocess import call, PIPE
 import tempfile
+from contextlib import nullcontext
 
 from geotrek.altimetry.models import AltimetryMixin, Dem
-from geotrek.core.models import Topology
+from geotrek.core.helpers import TopologyHelper
+from geotrek.core.models import Path, Topology
 
 
 class Command(BaseCommand):
@@ -24,6 +28,10 @@ class Command(BaseCommand):
         parser.add_argument('--replace', action='store_true', default=False, help='Replace existing DEM if any.')
         parser.add_argument('--update-altimetry', action='store_true', default=False,
                             help='Update altimetry of all 3D geometries, /!\\ This option takes lot of time to perform')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Update altimetry by chunks of this number of objects, reporting progress')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of chunks of altimetry updated in parallel (default 1)')
 
     def handle(self, *args, **options):
 
@@ -110,15 +118,58 @@ class Command(BaseCommand):
         if update_altimetry_paths:
             if verbose:
                 self.stdout.write('Updating 3d geometries.\n')
+            chunk_size, workers = options['chunk_size'], options['workers']
             for model in apps.get_models():
                 if 'geom' in [field.name for field in model._meta.get_fields()] and issubclass(model, AltimetryMixin):
-                    if settings.TREKKING_TOPOLOGY_ENABLED:
-                        if not issubclass(model, Topology):
-                            model.objects.all().update(geom=F('geom'))
+                    if settings.TREKKING_TOPOLOGY_ENABLED and issubclass(model, Topology):
+                        continue
+                    if chunk_size or workers > 1:
+                        self.update_altimetry_by_chunks(model, chunk_size, workers, verbose)
                     else:
                         model.objects.all().update(geom=F('geom'))
         return
 
+    def update_chunk(self, model, pks):
+        # Topologies on updated paths are recomputed once per chunk
+        deferred = settings.TREKKING_TOPOLOGY_ENABLED and issubclass(model, Path)
+        with transaction.atomic(), TopologyHelper.deferred_geometries() if deferred else nullcontext():
+            model.objects.filter(pk__in=pks).update(geom=F('geom'))
+        return len(pks)
+
+    def update_altimetry_chunk(self, model, pks):
+        try:
+            return self.update_chunk(model, pks)
+        finally:
+            # Each worker thread has its own connection
+            connection.close()
+
+    def update_altimetry_by_chunks(self, model, chunk_size, workers, verbose):
+        """ Update altimetry of the given model by chunks, in parallel if several workers """
+        pks = list(model.objects.order_by('pk').values_list('pk', flat=True))
+        if not pks:
+            return
+        chunk_size = chunk_size or -(-len(pks) // workers)
+        chunks = [pks[i:i + chunk_size] for i in range(0, len(pks), chunk_size)]
+        done = 0
+        failed = []
+        # Run chunks outside of the main thread connection, so that they are committed independently
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.update_altimetry_chunk, model, chunk): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                try:
+                    done += future.result()
+                except DatabaseError:
+                    # e.g. deadlock between workers updating the same topologies
+                    failed.append(futures[future])
+                    continue
+                if verbose:
+                    self.stdout.write('{}: {}/{} updated'.format(model._meta.verbose_name_plural, done, len(pks)))
+        for chunk in failed:
+            # Retry conflicting chunks one by one
+            done += self.update_chunk(model, chunk)
+            if verbose:
+                self.stdout.write('{}: {}/{} updated'.format(model._meta.verbose_name_plural, done, len(pks)))
+
     def call_command_system(self, cmd, **kwargs):
         return_code = call(cmd, **kwargs)
         return return_code
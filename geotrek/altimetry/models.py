@@ -3,6 +3,7 @@ import os
 import cairosvg
 from django.conf import settings
 from django.contrib.gis.db import models
+from django.core.cache import caches
 from django.urls import reverse
 from django.utils.translation import get_language, gettext_lazy as _
 from mapentity.helpers import is_file_uptodate
@@ -46,7 +47,18 @@ class AltimetryMixin(models.Model):
         return self
 
     def get_elevation_profile(self):
-        return AltimetryHelper.elevation_profile(self.geom_3d)
+        date_update = getattr(self, 'date_update', None)
+        if self.pk is None or date_update is None:
+            return AltimetryHelper.elevation_profile(self.geom_3d)
+        # geom_3d is computed by triggers, which also set date_update
+        profile_cache = caches['fat']
+        date_update = date_update.strftime('%y%m%d%H%M%S%f')
+        cache_lookup = f"altimetry_profile_{self._meta.model_name}_{self.pk}_{date_update}"
+        profile = profile_cache.get(cache_lookup)
+        if profile is None:
+            profile = AltimetryHelper.elevation_profile(self.geom_3d)
+            profile_cache.set(cache_lookup, profile)
+        return profile
 
     def get_elevation_area(self):
         return AltimetryHelper.elevation_area(self.geom)
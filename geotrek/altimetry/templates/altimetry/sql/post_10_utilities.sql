@@ -47,48 +47,20 @@ CREATE FUNCTION {{ schema_geotrek }}.ft_smooth_line(
     step integer)
   RETURNS SETOF geometry AS $$
 -- function moving average on altitude lines with specified step
-
-DECLARE
-
-    points geometry[];
-    points_output geometry[];
-    current_values float;
-    count_values integer;
-    val geometry;
-    element geometry;
-
+-- (one pass over the points using a window)
 BEGIN
     IF step <= 0
     THEN
         RETURN QUERY SELECT * FROM ft_smooth_line(linegeom);
+        RETURN;
     END IF;
 
-    FOR element in SELECT (ST_DumpPoints(linegeom)).geom LOOP
-		points := array_append(points, element);
-    END LOOP;
-
-    FOR i IN 0 .. array_length(points, 1) LOOP
-
-        current_values := 0.0;
-		count_values := 0;
-
-		FOREACH val in ARRAY points[i-step:i+step] LOOP
-			-- val is null when out of array
-			IF val IS NOT NULL
-			THEN
-				count_values := count_values + 1;
-				current_values := current_values + ST_Z(val);
-			END IF;
-		END LOOP;
-
-		points_output := array_append(points_output, ST_MakePoint(ST_X(points[i]), ST_Y(points[i]), (current_values / count_values)::integer));
-
-
-    END LOOP;
-    --RAISE EXCEPTION 'Nonexistent ID --> %', ST_AsEWKT(ST_SetSRID(ST_MakeLine(points_output), ST_SRID(linegeom)));
-
-    RETURN QUERY SELECT (ST_DumpPoints(ST_SetSRID(ST_MakeLine(points_output), ST_SRID(linegeom)))).geom as geom;
-
+    RETURN QUERY
+        WITH points AS (SELECT (dp).path[1] AS idx, (dp).geom AS geom FROM ST_DumpPoints(linegeom) AS dp)
+        SELECT ST_SetSRID(ST_MakePoint(ST_X(geom), ST_Y(geom), (AVG(ST_Z(geom)) OVER w)::integer), ST_SRID(linegeom))
+        FROM points
+        WINDOW w AS (ORDER BY idx ROWS BETWEEN step PRECEDING AND step FOLLOWING)
+        ORDER BY idx;
 END;
 
 $$ LANGUAGE plpgsql;
@@ -112,20 +84,31 @@ BEGIN
     ELSE
         RETURN QUERY
             WITH -- Get endings of each segment of the line
-                 r1 AS (SELECT ST_PointN(linegeom, generate_series(1, ST_NPoints(linegeom)-1)) as p1,
-                               ST_PointN(linegeom, generate_series(2, ST_NPoints(linegeom))) as p2,
-                               generate_series(2, ST_NPoints(linegeom)) = ST_NPoints(linegeom) as is_last),
+                 r1 AS (SELECT i, ST_PointN(linegeom, i) as p1,
+                               ST_PointN(linegeom, i + 1) as p2,
+                               i + 1 = ST_NPoints(linegeom) as is_last
+                        FROM generate_series(1, ST_NPoints(linegeom)-1) AS i),
                  -- Get the number of sub-segments
-                 r2 AS (SELECT p1, p2, is_last, trunc(ST_Distance(p1, p2) / step)::integer + 1 AS n FROM r1),
+                 r2 AS (SELECT i, p1, p2, is_last, trunc(ST_Distance(p1, p2) / step)::integer + 1 AS n FROM r1),
                  -- Get relative positions of new points along the segment (without last point, except for last segment)
-                 r3 AS (SELECT p1, p2, generate_series(0, CASE WHEN is_last THEN n ELSE n - 1 END)/n::double precision AS f FROM r2),
+                 r3 AS (SELECT i, p1, p2, k, k/n::double precision AS f
+                        FROM r2, generate_series(0, CASE WHEN is_last THEN n ELSE n - 1 END) AS k),
                  -- Create new points
-                 r4 AS (SELECT ST_MakePoint(ST_X(p1) + (ST_X(p2) - ST_X(p1)) * f,
-                                            ST_Y(p1) + (ST_Y(p2) - ST_Y(p1)) * f) as p,
+                 r4 AS (SELECT i, k, ST_MakePoint(ST_X(p1) + (ST_X(p2) - ST_X(p1)) * f,
+                                                  ST_Y(p1) + (ST_Y(p2) - ST_Y(p1)) * f) as p,
                                ST_SRID(p1) AS srid FROM r3),
-                 -- Set SRID of new points
-                 r5 AS (SELECT ST_SetSRID(p, srid) as p FROM r4)
-            SELECT add_point_elevation(p) FROM r5;
+                 -- Set SRID of new points, and keep their order along segments
+                 r5 AS (SELECT row_number() OVER (ORDER BY i, k) AS idx, ST_SetSRID(p, srid) as p FROM r4)
+            -- Get elevation of all points with one join on DEM tiles
+            SELECT ST_SetSRID(ST_MakePoint(ST_X(r5.p), ST_Y(r5.p), coalesce(dem.ele, 0)), ST_SRID(r5.p))
+            FROM r5
+            LEFT JOIN LATERAL (
+                SELECT ST_Value(rast, 1, r5.p)::integer AS ele
+                FROM altimetry_dem
+                WHERE ST_Intersects(rast, r5.p)
+                LIMIT 1
+            ) AS dem ON TRUE
+            ORDER BY r5.idx;
 
     END IF;
 END;
@@ -155,14 +138,16 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+CREATE FUNCTION {{ schema_geotrek }}.ft_elevation_gains(line geometry, OUT positive_gain integer, OUT negative_gain integer) AS $$
+-- Sum of elevation differences between consecutive points, in one pass
+    SELECT coalesce(SUM(greatest(dz, 0)), 0)::integer, coalesce(SUM(least(dz, 0)), 0)::integer
+    FROM (SELECT ST_Z((dp).geom) - LAG(ST_Z((dp).geom)) OVER (ORDER BY (dp).path) AS dz
+          FROM ST_DumpPoints(line) AS dp) AS deltas;
+$$ LANGUAGE sql IMMUTABLE;
+
 CREATE FUNCTION {{ schema_geotrek }}.ft_elevation_infos(geom geometry) RETURNS elevation_infos AS $$
 DECLARE
-    num_points integer;
     current geometry;
-    points3d geometry[];
-    ele integer;
-    last_ele integer;
-    last_last_ele integer;
     result elevation_infos;
 BEGIN
     -- Skip if no DEM (speed-up tests)
@@ -187,25 +172,10 @@ BEGIN
     -- Now geom is LineString only.
 
     -- Compute gain and elevation using (higher resolution)
-    result.positive_gain := 0;
-    result.negative_gain := 0;
-    last_ele := NULL;
-    last_last_ele := NULL;
-    points3d := ARRAY[]::geometry[];
-
-    FOR current IN SELECT * FROM ft_drape_line(geom, {{ ALTIMETRIC_PROFILE_PRECISION }}) LOOP
-        -- Smooth the elevation profile
-        ele := ST_Z(current);
-        -- Create the 3d points
-        points3d := array_append(points3d, current);
-        -- Add positive only if ele - last_ele > 0
-        result.positive_gain := result.positive_gain + greatest(ele - coalesce(last_ele, ele), 0);
-        -- Add negative only if ele - last_ele < 0
-        result.negative_gain := result.negative_gain + least(ele - coalesce(last_ele, ele), 0);
-        last_ele := ele;
-        last_last_ele := last_ele;
-    END LOOP;
-    result.draped := ST_SetSRID(ST_MakeLine(points3d), ST_SRID(geom));
+    SELECT ST_SetSRID(ST_MakeLine(array_agg(draped.geom ORDER BY draped.idx)), ST_SRID(geom))
+        INTO result.draped
+        FROM ft_drape_line(geom, {{ ALTIMETRIC_PROFILE_PRECISION }}) WITH ORDINALITY AS draped (geom, idx);
+    SELECT * FROM ft_elevation_gains(result.draped) INTO result.positive_gain, result.negative_gain;
 
     result.min_elevation := ST_ZMin(result.draped)::integer;
     result.max_elevation := ST_ZMax(result.draped)::integer;
@@ -222,13 +192,9 @@ $$ LANGUAGE plpgsql;
 
 CREATE FUNCTION {{ schema_geotrek }}.ft_elevation_infos(geom geometry, epsilon float) RETURNS elevation_infos AS $$
 DECLARE
-    num_points integer;
     current geometry;
-    points3d geometry[];
-    points3d_smoothed geometry[];
-    points3d_simplified geometry[];
+    points3d geometry;
     result elevation_infos;
-    previous_geom geometry;
 BEGIN
     -- Skip if no DEM (speed-up tests)
     IF NOT EXISTS (SELECT 1 FROM altimetry_dem) THEN
@@ -259,42 +225,18 @@ BEGIN
     -- Now geom is LineString only.
 
 
-    result.positive_gain := 0;
-    result.negative_gain := 0;
-    points3d := ARRAY[]::geometry[];
-    points3d_smoothed := ARRAY[]::geometry[];
-    points3d_simplified := ARRAY[]::geometry[];
-
-    FOR current IN SELECT * FROM ft_drape_line(geom, {{ ALTIMETRIC_PROFILE_PRECISION }}) LOOP
-        -- Create the 3d points
-        points3d := array_append(points3d, current);
-    END LOOP;
+    -- Drape the line, all points at once
+    SELECT ST_MakeLine(array_agg(draped.geom ORDER BY draped.idx))
+        INTO points3d
+        FROM ft_drape_line(geom, {{ ALTIMETRIC_PROFILE_PRECISION }}) WITH ORDINALITY AS draped (geom, idx);
 
     -- smoothing line
-    FOR current IN SELECT * FROM ft_smooth_line(St_MakeLine(points3d), {{ ALTIMETRIC_PROFILE_AVERAGE }}) LOOP
-        -- Create the 3d points
-        points3d_smoothed := array_append(points3d_smoothed, current);
-    END LOOP;
-
-    -- simplify gain calculs
-
-    previous_geom := NULL;
-
-    -- Compute gain using simplification
-    -- see http://www.postgis.org/docs/ST_Simplify.html
-    --     https://en.wikipedia.org/wiki/Ramer%E2%80%93Douglas%E2%80%93Peucker_algorithm
-    FOR current IN SELECT (ST_DumpPoints(ST_MakeLine(points3d_smoothed))).geom
-    LOOP
-        -- Add positive only if current - previous_geom > 0
-	result.positive_gain := result.positive_gain + greatest(ST_Z(current) - coalesce(ST_Z(previous_geom),
-								ST_Z(current)), 0);
-	-- Add negative only if current - previous_geom < 0
-	result.negative_gain := result.negative_gain + least(ST_Z(current) - coalesce(ST_Z(previous_geom),
-							     ST_Z(current)), 0);
-	previous_geom := current;
-    END LOOP;
+    SELECT ST_SetSRID(ST_MakeLine(array_agg(smoothed.geom ORDER BY smoothed.idx)), ST_SRID(geom))
+        INTO result.draped
+        FROM ft_smooth_line(points3d, {{ ALTIMETRIC_PROFILE_AVERAGE }}) WITH ORDINALITY AS smoothed (geom, idx);
 
-    result.draped := ST_SetSRID(ST_MakeLine(points3d_smoothed), ST_SRID(geom));
+    -- Compute gain
+    SELECT * FROM ft_elevation_gains(result.draped) INTO result.positive_gain, result.negative_gain;
 
     -- Compute elevation using (higher resolution)
     result.min_elevation := ST_ZMin(result.draped)::integer;
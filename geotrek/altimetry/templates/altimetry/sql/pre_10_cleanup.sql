@@ -1,4 +1,6 @@
 DROP FUNCTION IF EXISTS ft_elevation_infos(geometry, float) CASCADE;
+DROP FUNCTION IF EXISTS ft_elevation_infos(geometry) CASCADE;
+DROP FUNCTION IF EXISTS ft_elevation_gains(geometry) CASCADE;
 DROP FUNCTION IF EXISTS add_point_elevation(geometry) CASCADE;
 DROP FUNCTION IF EXISTS ft_drape_line(geometry, integer) CASCADE;
 DROP FUNCTION IF EXISTS ft_smooth_line(geometry, integer) CASCADE;
@@ -82,6 +82,21 @@ class CommandLoadDemTest(TransactionTestCase):
         trek = Trek.objects.get(pk=self.trek.pk)
         self.assertAlmostEqual(trek.geom_3d.coords[-1][-1], 188)
 
+    @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+    def test_success_update_altimetry_by_chunks(self):
+        output_stdout = StringIO()
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'elevation.tif')
+        paths = [PathFactory.create(geom=LineString((605600, 6650000 + i), (605900, 6650010 + i), srid=2154))
+                 for i in range(3)]
+        trek = TrekFactory.create(paths=paths[:1], published=False)
+        call_command('loaddem', filename, update_altimetry=True, chunk_size=2, workers=2, verbosity=2,
+                     stdout=output_stdout)
+        self.assertIn('Paths: 3/3 updated', output_stdout.getvalue())
+        path = Path.objects.get(pk=paths[0].pk)
+        self.assertAlmostEqual(path.geom_3d.coords[-1][-1], 188)
+        trek = Trek.objects.get(pk=trek.pk)
+        self.assertAlmostEqual(trek.geom_3d.coords[-1][-1], 188)
+
     def test_fail_table_altimetry_dem(self):
         """ DEM data already exist """
         filename = os.path.join(os.path.dirname(__file__), 'data', 'elevation.tif')
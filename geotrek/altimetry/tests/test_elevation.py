@@ -113,8 +113,23 @@ class ElevationProfileTest(TestCase):
                                LineString((2.5, 2.5, 6), (2.5, 0, 7)),
                                srid=settings.SRID)
 
-        profile = AltimetryHelper.elevation_profile(geom)
+        with self.assertNumQueries(0):
+            profile = AltimetryHelper.elevation_profile(geom)
         self.assertEqual(len(profile), 4)
+        self.assertEqual([round(v[0], 1) for v in profile], [1.0, 2.0, 3.5, 6.0])
+        self.assertEqual([v[3] for v in profile], [8, 10, 6, 7])
+
+    def test_elevation_profile_linestring(self):
+        geom = LineString((1.5, 2.5, 8), (2.5, 2.5, 10), (2.5, 0, 7), srid=settings.SRID)
+
+        with self.assertNumQueries(0):
+            profile = AltimetryHelper.elevation_profile(geom)
+        self.assertEqual([round(v[0], 1) for v in profile], [0.0, 1.0, 3.5])
+        api_geom = geom.transform(settings.API_SRID, clone=True)
+        for (distance, x, y, z), coords in zip(profile, api_geom.coords):
+            self.assertAlmostEqual(x, coords[0])
+            self.assertAlmostEqual(y, coords[1])
+            self.assertEqual(z, coords[2])
 
     def test_elevation_profile_point(self):
         geom = Point(1.5, 2.5, 8, srid=settings.SRID)
@@ -203,6 +218,14 @@ class ElevationAreaTest(TestCase):
         self.assertEqual(extent['altitudes']['max'], 45)
         self.assertEqual(extent['altitudes']['min'], 0)
 
+    def test_area_is_cached_for_geometry_and_dem(self):
+        with self.assertNumQueries(1):
+            area = AltimetryHelper.elevation_area(self.geom)
+        self.assertEqual(area, self.area)
+        fill_raster()
+        with self.assertNumQueries(2):
+            AltimetryHelper.elevation_area(self.geom)
+
 
 class ElevationOtherGeomAreaTest(TestCase):
     @classmethod
@@ -1,4 +1,5 @@
 import os
+from unittest import mock
 
 from django.test import TestCase
 from django.conf import settings
@@ -19,3 +20,14 @@ class AltimetryMixinTest(TestCase):
         self.assertTrue(os.listdir(basefolder))
         directory = os.listdir(basefolder)
         self.assertIn('%s-%s-%s.png' % (Trek._meta.model_name, str(trek.pk), get_language()), directory)
+
+    def test_get_elevation_profile_is_cached(self):
+        trek = TrekFactory.create()
+        profile = trek.get_elevation_profile()
+        with mock.patch('geotrek.altimetry.helpers.AltimetryHelper.elevation_profile') as elevation_profile:
+            self.assertEqual(trek.get_elevation_profile(), profile)
+            elevation_profile.assert_not_called()
+            trek.save()
+            trek.refresh_from_db()
+            trek.get_elevation_profile()
+            elevation_profile.assert_called_once()
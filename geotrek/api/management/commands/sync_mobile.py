@@ -1,19 +1,26 @@
 import argparse
 import filecmp
+import hashlib
+import json
 import logging
+import multiprocessing
 import os
 import re
 import shutil
 import stat
 import tempfile
+from io import StringIO
 from time import sleep
 from zipfile import ZipFile
 
 import cairosvg
 from PIL import Image
+from django.apps import apps
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
-from django.core.management.base import BaseCommand, CommandError
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError, OutputWrapper
+from django.db import connections
 from django.db.models import Q
 from django.http import StreamingHttpResponse
 from django.test.client import RequestFactory
@@ -21,11 +28,12 @@ from django.utils import translation
 from django.utils.translation import gettext as _
 from modeltranslation.utils import build_localized_fieldname
 
+from geotrek import __version__
 from geotrek.api.mobile.views.common import FlatPageViewSet, SettingsView
 from geotrek.api.mobile.views.trekking import TrekViewSet
 from geotrek.common import models as common_models
 from geotrek.common.functions import GeometryType
-from geotrek.common.helpers_sync import ZipTilesBuilder
+from geotrek.common.helpers_sync import TileStore, ZipTilesBuilder
 from geotrek.common.models import FileType  # NOQA
 from geotrek.flatpages.models import MenuItem
 from geotrek.tourism import models as tourism_models
@@ -33,9 +41,26 @@ from geotrek.tourism import urls  # NOQA
 # Register mapentity models
 from geotrek.trekking import models as trekking_models
 from geotrek.trekking import urls  # NOQA
+from geotrek.zoning.models import City, District
+
+if 'geotrek.sensitivity' in settings.INSTALLED_APPS:
+    from geotrek.sensitivity import models as sensitivity_models
 
 logger = logging.getLogger(__name__)
 
+# Command of a worker process, forked with the state of the main process
+worker_command = None
+
+
+def init_worker(command):
+    global worker_command
+    worker_command = command
+    worker_command.stdout = OutputWrapper(StringIO())
+
+
+def run_worker_task(task):
+    return worker_command.run_task(*task)
+
 
 class Command(BaseCommand):
     def add_arguments(self, parser):
@@ -48,12 +73,15 @@ class Command(BaseCommand):
                             help='Skip inclusion of tiles in zip files')
         parser.add_argument('--url', '-u', dest='url', default='http://localhost', help='Base url')
         parser.add_argument('--indent', '-i', default=0, type=int, help='Indent json files')
+        parser.add_argument('--incremental', action='store_true', default=False,
+                            help='Only rebuild treks whose data changed since the previous incremental sync')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of processes syncing treks in parallel')
         parser.add_argument('--task', default=None, help=argparse.SUPPRESS)
 
     def mkdirs(self, name):
-        dirname = os.path.dirname(name)
-        if not os.path.exists(dirname):
-            os.makedirs(dirname)
+        # Directories may be created concurrently by workers
+        os.makedirs(os.path.dirname(name), exist_ok=True)
 
     def sync_view(self, lang, view, name, url='/', params=None, headers={}, zipfile=None, fix2028=False, **kwargs):
         if self.verbosity == 2:
@@ -246,6 +274,113 @@ class Command(BaseCommand):
             else:
                 self.stdout.write("\x1b[3D\x1b[32mzipped\x1b[0m")
 
+    @property
+    def manifest_path(self):
+        return '{}_sync_mobile_manifest.json'.format(self.dst_root)
+
+    def load_manifest(self):
+        """ Fingerprints of the treks of the previous sync, if it was run with the same options and settings """
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (IOError, ValueError):
+            return {}
+        if manifest.get('run') != self.run_fingerprint:
+            return {}
+        return manifest['treks']
+
+    def save_manifest(self):
+        if not self.successfull:
+            # Artifacts of the new tree may be incomplete, next sync has to rebuild everything
+            if os.path.exists(self.manifest_path):
+                os.unlink(self.manifest_path)
+            return
+        treks = {pk: fingerprint for pk, fingerprint in self.fingerprints.items() if pk not in self.incomplete_treks}
+        with open(self.manifest_path, 'w') as f:
+            json.dump({'run': self.run_fingerprint, 'treks': treks}, f)
+
+    def fingerprint(self, data):
+        return hashlib.sha256(json.dumps(data, default=str).encode()).hexdigest()
+
+    def get_run_fingerprint(self, options):
+        """ Options and settings every synced file depends on """
+        return self.fingerprint([
+            __version__, self.languages, self.portal, options['url'], self.indent, self.skip_tiles,
+            [getattr(settings, name, None) for name in (
+                'MOBILE_TILES_URL', 'MOBILE_TILES_EXTENSION', 'MOBILE_TILES_RADIUS_LARGE', 'MOBILE_TILES_RADIUS_SMALL',
+                'MOBILE_TILES_LOW_ZOOMS', 'MOBILE_TILES_HIGH_ZOOMS', 'MOBILE_NUMBER_PICTURES_SYNC',
+                'THUMBNAIL_ALIASES', 'MEDIA_URL', 'API_SRID',
+            )],
+        ])
+
+    def get_trek_fingerprint(self, trek):
+        """ Fingerprint of the data the files of a trek are built from: the trek and its children,
+        their POIs, touristic contents and events, sensitive areas, information desks, attachments
+        and crossed cities and districts.
+        """
+        if trek.pk in self.fingerprints:
+            return self.fingerprints[trek.pk]
+
+        def rows(queryset):
+            return list(queryset.order_by('pk').values_list())
+
+        treks = [trek, *trek.children]
+        pks = {model: set() for model in (trekking_models.POI, tourism_models.TouristicContent,
+                                          tourism_models.TouristicEvent, tourism_models.InformationDesk)}
+        data = [rows(trekking_models.OrderedTrekChild.objects.filter(parent=trek))]
+        for obj in treks:
+            pks[trekking_models.POI].update(obj.pois.values_list('pk', flat=True))
+            pks[tourism_models.TouristicContent].update(obj.touristic_contents.values_list('pk', flat=True))
+            pks[tourism_models.TouristicEvent].update(obj.touristic_events.values_list('pk', flat=True))
+            pks[tourism_models.InformationDesk].update(obj.information_desks.values_list('pk', flat=True))
+            data.append(rows(City.objects.filter(published=True, geom__intersects=obj.geom)))
+            data.append(rows(District.objects.filter(published=True, geom__intersects=obj.geom)))
+        pks[trekking_models.Trek] = {obj.pk for obj in treks}
+        for field in trekking_models.Trek._meta.many_to_many:
+            through = field.remote_field.through
+            data.append(rows(through.objects.filter(**{'{}__in'.format(field.m2m_field_name()): pks[trekking_models.Trek]})))
+        if 'geotrek.sensitivity' in settings.INSTALLED_APPS:
+            areas = set()
+            for obj in treks:
+                areas.update(obj.sensitive_areas.values_list('pk', flat=True))
+            sensitive_areas = sensitivity_models.SensitiveArea.objects.filter(pk__in=areas)
+            species = sensitivity_models.Species.objects.filter(pk__in=sensitive_areas.values('species'))
+            data.append(rows(sensitive_areas))
+            data.append(rows(species))
+            data.append(rows(sensitivity_models.Species.practices.through.objects.filter(species__in=species)))
+        content_types = ContentType.objects.get_for_models(*pks.keys())
+        for model, model_pks in pks.items():
+            data.append(rows(model.objects.filter(pk__in=model_pks)))
+            data.append(rows(common_models.Attachment.objects.filter(content_type=content_types[model],
+                                                                     object_id__in=model_pks)))
+        self.fingerprints[trek.pk] = self.fingerprint(data)
+        return self.fingerprints[trek.pk]
+
+    def trek_unchanged(self, trek):
+        if not self.incremental:
+            return False
+        return self.previous_fingerprints.get(str(trek.pk)) == self.get_trek_fingerprint(trek)
+
+    def reuse_trek_files(self, trek, *names):
+        """ Link files of a trek from the previous sync if the trek did not change since then.
+        Return False if they have to be rebuilt.
+        """
+        if not self.trek_unchanged(trek):
+            return False
+        if not os.path.exists(os.path.join(self.dst_root, names[0])):
+            return False
+        for name in names:
+            src = os.path.join(self.dst_root, name)
+            dst = os.path.join(self.tmp_root, name)
+            if os.path.isdir(src):
+                shutil.copytree(src, dst, copy_function=os.link, dirs_exist_ok=True)
+            elif os.path.isfile(src):
+                self.mkdirs(dst)
+                os.link(src, dst)
+            if self.verbosity == 2:
+                self.stdout.write("\x1b[36m**\x1b[0m \x1b[1m{name}\x1b[0m \x1b[32munchanged\x1b[0m".format(name=name))
+        return True
+
     def sync_flatpage(self, lang):
         """Save FlatPages data for the mobile app as JSON. The original FlatPages format is saved but under the hood
         MenuItems are queried and converted.
@@ -294,20 +429,28 @@ class Command(BaseCommand):
         if self.portal:
             treks = treks.filter(Q(portal__name__in=self.portal) | Q(portal=None))
 
-        for trek in treks:
-            self.sync_geojson(lang, TrekViewSet, '{pk}/trek.geojson'.format(pk=trek.pk), pk=trek.pk,
-                              type_view={'get': 'retrieve'})
-            self.sync_trek_pois(lang, trek)
-            self.sync_trek_touristic_contents(lang, trek)
-            self.sync_trek_touristic_events(lang, trek)
-            self.sync_trek_sensitive_areas(lang, trek)
-            # Sync detail of children too
-            for child in trek.children.annotate(geom_type=GeometryType("geom")).filter(geom_type="LINESTRING"):
-                self.sync_geojson(
-                    lang, TrekViewSet,
-                    '{pk}/treks/{child_pk}.geojson'.format(pk=trek.pk, child_pk=child.pk),
-                    pk=child.pk, type_view={'get': 'retrieve'}, params={'root_pk': trek.pk},
-                )
+        if self.pool:
+            self.run_tasks('sync_trek_task', {pk: (lang, pk) for pk in treks.values_list('pk', flat=True)})
+        else:
+            for trek in treks:
+                self.sync_trek(lang, trek)
+
+    def sync_trek(self, lang, trek):
+        if self.reuse_trek_files(trek, os.path.join(lang, str(trek.pk))):
+            return
+        self.sync_geojson(lang, TrekViewSet, '{pk}/trek.geojson'.format(pk=trek.pk), pk=trek.pk,
+                          type_view={'get': 'retrieve'})
+        self.sync_trek_pois(lang, trek)
+        self.sync_trek_touristic_contents(lang, trek)
+        self.sync_trek_touristic_events(lang, trek)
+        self.sync_trek_sensitive_areas(lang, trek)
+        # Sync detail of children too
+        for child in trek.children.annotate(geom_type=GeometryType("geom")).filter(geom_type="LINESTRING"):
+            self.sync_geojson(
+                lang, TrekViewSet,
+                '{pk}/treks/{child_pk}.geojson'.format(pk=trek.pk, child_pk=child.pk),
+                pk=child.pk, type_view={'get': 'retrieve'}, params={'root_pk': trek.pk},
+            )
 
     def sync_settings_json(self, lang):
         self.sync_json(lang, SettingsView, 'settings')
@@ -385,8 +528,17 @@ class Command(BaseCommand):
         if self.portal:
             treks = treks.filter(Q(portal__name__in=self.portal) | Q(portal=None))
 
-        for trek in treks:
-            self.sync_trek_by_pk_media(trek)
+        if self.pool:
+            self.run_tasks('sync_trek_task', {pk: (None, pk) for pk in treks.values_list('pk', flat=True)})
+        else:
+            for trek in treks:
+                self.sync_trek_media(trek)
+
+    def sync_trek_media(self, trek):
+        if self.reuse_trek_files(trek, os.path.join('nolang', '{}.zip'.format(trek.pk)),
+                                 os.path.join('nolang', str(trek.pk))):
+            return
+        self.sync_trek_by_pk_media(trek)
 
     def sync_global_media(self):
         url_media_nolang = os.path.join('nolang')
@@ -418,6 +570,10 @@ class Command(BaseCommand):
                              zipfile=self.zipfile_settings)
         self.close_zip(self.zipfile_settings, zipname_settings)
 
+    def tiles_builder(self, zipfile, prefix):
+        return ZipTilesBuilder(zipfile, prefix=prefix, failed_tiles=self.failed_tiles, store=self.tiles_store,
+                               workers=settings.MOBILE_TILES_DOWNLOAD_WORKERS, **self.builder_args)
+
     def sync_trek_tiles(self, trek, zipfile):
         """ Add tiles to zipfile for the specified Trek object."""
 
@@ -425,24 +581,24 @@ class Command(BaseCommand):
             self.stdout.write("\x1b[36m**\x1b[0m \x1b[1mnolang/{}/tiles/\x1b[0m ...".format(trek.pk), ending="")
             self.stdout._out.flush()
 
-        def _radius2bbox(lng, lat, radius):
-            return (lng - radius, lat - radius,
-                    lng + radius, lat + radius)
-
-        tiles = ZipTilesBuilder(zipfile, prefix='/{}/tiles/'.format(trek.pk), **self.builder_args)
+        tiles = self.tiles_builder(zipfile, prefix='/{}/tiles/'.format(trek.pk))
 
-        geom = trek.geom
+        geom = trek.geom.transform(4326, clone=True)
         if geom.geom_type == 'MultiLineString':
-            geom = geom[0]  # FIXME
-        geom.transform(4326)
+            lines = [line.coords for line in geom]
+        elif geom.geom_type == 'Point':
+            lines = [(geom.coords, )]
+        else:
+            lines = [geom.coords]
 
-        for (lng, lat) in geom.coords:
-            large = _radius2bbox(lng, lat, settings.MOBILE_TILES_RADIUS_LARGE)
-            small = _radius2bbox(lng, lat, settings.MOBILE_TILES_RADIUS_SMALL)
-            tiles.add_coverage(bbox=large, zoomlevels=settings.MOBILE_TILES_LOW_ZOOMS)
-            tiles.add_coverage(bbox=small, zoomlevels=settings.MOBILE_TILES_HIGH_ZOOMS)
+        tiles.add_lines_coverage(lines, radius=settings.MOBILE_TILES_RADIUS_LARGE,
+                                 zoomlevels=settings.MOBILE_TILES_LOW_ZOOMS)
+        tiles.add_lines_coverage(lines, radius=settings.MOBILE_TILES_RADIUS_SMALL,
+                                 zoomlevels=settings.MOBILE_TILES_HIGH_ZOOMS)
 
         tiles.run()
+        if tiles.tiles & self.failed_tiles:
+            self.incomplete_treks.add(trek.pk)
 
         if self.verbosity == 2:
             self.stdout.write("\x1b[3D\x1b[32mdownloaded\x1b[0m")
@@ -459,7 +615,7 @@ class Command(BaseCommand):
         logger.info("Global extent is %s" % str(global_extent))
         logger.info("Build global tiles file...")
 
-        tiles = ZipTilesBuilder(zipfile, prefix='tiles/', **self.builder_args)
+        tiles = self.tiles_builder(zipfile, prefix='tiles/')
         tiles.add_coverage(bbox=global_extent,
                            zoomlevels=settings.MOBILE_TILES_GLOBAL_ZOOMS)
         tiles.run()
@@ -467,10 +623,117 @@ class Command(BaseCommand):
         if self.verbosity == 2:
             self.stdout.write("\x1b[3D\x1b[32mdownloaded\x1b[0m")
 
+    def start_pool(self):
+        """ Fork worker processes sharing the state of the command """
+        # Forked processes must not share the database connection of the main process
+        connections.close_all()
+        return multiprocessing.get_context('fork').Pool(self.workers, initializer=init_worker, initargs=(self, ))
+
+    def run_task(self, method, args, fingerprints):
+        """ Run a task in a worker process.
+        Return its result with its output and the state to merge into the main process.
+        """
+        self.successfull = True
+        self.fingerprints.update(fingerprints)
+        known_fingerprints = set(self.fingerprints)
+        known_incomplete_treks = set(self.incomplete_treks)
+        known_failed_tiles = set(self.failed_tiles)
+        result = getattr(self, method)(*args)
+        output = self.stdout._out.getvalue()
+        self.stdout = OutputWrapper(StringIO())
+        return {
+            'result': result,
+            'output': output,
+            'successfull': self.successfull,
+            'fingerprints': {pk: fingerprint for pk, fingerprint in self.fingerprints.items()
+                             if pk not in known_fingerprints},
+            'incomplete_treks': self.incomplete_treks - known_incomplete_treks,
+            'failed_tiles': self.failed_tiles - known_failed_tiles,
+        }
+
+    def run_tasks(self, method, tasks):
+        """ Run tasks in worker processes, given by trek pk with their arguments.
+        Return their results by trek pk.
+        """
+        results = {}
+        tasks = {pk: (method, args, {pk: self.fingerprints[pk]} if pk in self.fingerprints else {})
+                 for pk, args in tasks.items()}
+        for pk, task_result in zip(list(tasks), self.pool.imap(run_worker_task, tasks.values())):
+            self.stdout.write(task_result['output'], ending='')
+            if not task_result['successfull']:
+                self.successfull = False
+            self.fingerprints.update(task_result['fingerprints'])
+            self.incomplete_treks |= task_result['incomplete_treks']
+            self.failed_tiles |= task_result['failed_tiles']
+            results[pk] = task_result['result']
+        return results
+
+    def sync_trek_task(self, lang, pk):
+        """ Sync files of a trek in a worker process, media files if no language """
+        trek = trekking_models.Trek.objects.get(pk=pk)
+        if lang is None:
+            self.sync_trek_media(trek)
+        else:
+            with translation.override(lang):
+                self.sync_trek(lang, trek)
+
+    def collect_trek_media(self, pk):
+        """ Objects whose thumbnails and elevation charts are synced with a trek """
+        trek = trekking_models.Trek.objects.get(pk=pk)
+        if self.trek_unchanged(trek):
+            return []
+        objects = []
+        for obj in [trek, *trek.children]:
+            objects.append(obj)
+            objects.extend(obj.pois.filter(published=True))
+            objects.extend(obj.published_pois)
+            objects.extend(obj.touristic_contents.filter(published=True))
+            objects.extend(obj.published_touristic_contents)
+            objects.extend(obj.touristic_events.filter(published=True))
+            objects.extend(obj.published_touristic_events)
+            objects.extend(obj.information_desks.all())
+        return [(obj._meta.label, obj.pk) for obj in objects]
+
+    def prepare_media(self, objects):
+        """ Generate thumbnails and elevation charts of objects shared by treks """
+        for label, object_pk in objects:
+            obj = apps.get_model(label).objects.get(pk=object_pk)
+            # Thumbnails are generated when accessed
+            if isinstance(obj, tourism_models.InformationDesk):
+                obj.resized_picture
+            else:
+                obj.resized_pictures
+            if isinstance(obj, trekking_models.Trek):
+                for lang in self.languages:
+                    obj.prepare_elevation_chart(lang)
+
+    def prepare_treks_media(self):
+        """ Generate media files shared by several treks once, before workers sync treks concurrently """
+        treks = trekking_models.Trek.objects.annotate(geom_type=GeometryType("geom")).filter(geom_type="LINESTRING").existing()
+        published = Q(published=True)
+        for lang in self.languages:
+            published |= Q(**{build_localized_fieldname('published', lang): True})
+        treks = treks.filter(published)
+        if self.portal:
+            treks = treks.filter(Q(portal__name__in=self.portal) | Q(portal=None))
+        pks = treks.order_by('pk').values_list('pk', flat=True)
+        collected = self.run_tasks('collect_trek_media', {pk: (pk, ) for pk in pks})
+        # Each object is prepared by a single task
+        tasks = {}
+        prepared = set()
+        for pk, objects in collected.items():
+            objects = [obj for obj in dict.fromkeys(objects) if obj not in prepared]
+            prepared.update(objects)
+            if objects:
+                tasks[pk] = (objects, )
+        self.run_tasks('prepare_media', tasks)
+
     def sync(self):
         step_value = int(50 / len(settings.MODELTRANSLATION_LANGUAGES))
         current_value = 30
 
+        if self.pool:
+            self.prepare_treks_media()
         self.sync_medias()
 
         for lang in self.languages:
@@ -515,6 +778,8 @@ class Command(BaseCommand):
         self.verbosity = options['verbosity']
         self.skip_tiles = options['skip_tiles']
         self.indent = options['indent']
+        self.incremental = options['incremental']
+        self.workers = options['workers']
         self.factory = RequestFactory()
         self.dst_root = options["path"].rstrip('/')
         self.abs_path = os.path.abspath(options["path"])
@@ -547,7 +812,19 @@ class Command(BaseCommand):
             'tiles_headers': {"Referer": self.referer},
             'ignore_errors': True,
             'tiles_dir': settings.MOBILE_TILES_PATH,
+            # Tiles are kept in the tiles store instead
+            'cache': False,
         }
+        expiry = settings.MOBILE_TILES_EXPIRY
+        self.tiles_store = TileStore(settings.MOBILE_TILES_PATH, source=json.dumps(settings.MOBILE_TILES_URL),
+                                     expiry=expiry * 24 * 3600 if expiry is not None else None)
+        # Tiles which failed to download are not requested again for other zip files
+        self.failed_tiles = set()
+        self.fingerprints = {}
+        self.incomplete_treks = set()
+        if self.incremental:
+            self.run_fingerprint = self.get_run_fingerprint(options)
+            self.previous_fingerprints = self.load_manifest()
         sync_mobile_tmp_dir = tempfile.TemporaryDirectory(dir=settings.TMP_DIR).name
         if options['empty_tmp_folder']:
             for dir in os.listdir(sync_mobile_tmp_dir):
@@ -559,7 +836,13 @@ class Command(BaseCommand):
 
         with tempfile.TemporaryDirectory(dir=sync_mobile_tmp_dir) as tmp_dir:
             self.tmp_root = tmp_dir
-            self.sync()
+            self.pool = self.start_pool() if self.workers > 1 else None
+            try:
+                self.sync()
+            finally:
+                if self.pool:
+                    self.pool.terminate()
+                    self.pool.join()
             if self.celery_task:
                 self.celery_task.update_state(
                     state='PROGRESS',
@@ -571,6 +854,12 @@ class Command(BaseCommand):
                     }
                 )
             self.rename_root()
+            if self.incremental:
+                self.save_manifest()
+        # Contents of expired tiles are no longer used by any synchronization
+        purged = self.tiles_store.purge()
+        if self.verbosity >= 2:
+            self.stdout.write(f"{purged} tiles purged from tiles store")
 
         done_message = 'Done'
         if self.successfull:
@@ -12,7 +12,7 @@ from django.core import management
 from django.core.management.base import CommandError
 from django.db.models import Q
 from django.http import HttpResponse, StreamingHttpResponse
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from django.test.utils import override_settings
 from landez.sources import DownloadError
 from modeltranslation.utils import build_localized_fieldname
@@ -55,6 +55,7 @@ class VarTmpTestCase(TestCase):
         os.mkdir(self.sync_directory)
 
 
+@override_settings(MOBILE_TILES_EXPIRY=0)
 @mock.patch('landez.TilesManager.tileslist', return_value=[(9, 258, 199)])
 class SyncMobileTilesTest(VarTmpTestCase):
     @mock.patch('landez.TilesManager.tile', return_value=b'I am a png')
@@ -138,6 +139,30 @@ class SyncMobileTilesTest(VarTmpTestCase):
         self.assertFalse(os.path.exists(os.path.join(self.sync_directory, 'nolang', '{}.zip'.format(trek_point.pk))))
 
 
+class SyncMobileWorkersTest(TransactionTestCase):
+    """ Use of TransactionTestCase so that data is visible to worker processes """
+    def sync_files(self, **options):
+        sync_directory = TemporaryDirectory(dir=settings.TMP_DIR).name
+        os.mkdir(sync_directory)
+        output = StringIO()
+        management.call_command('sync_mobile', sync_directory, url='http://localhost:8000',
+                                skip_tiles=True, verbosity=2, stdout=output, **options)
+        files = {
+            os.path.relpath(os.path.join(root, name), sync_directory)
+            for root, dirs, names in os.walk(sync_directory) for name in names
+        }
+        return files, output.getvalue()
+
+    def test_sync_treks_with_workers(self):
+        trek = TrekWithPublishedPOIsFactory.create(published=True)
+        AttachmentImageFactory.create(content_object=trek)
+        AttachmentImageFactory.create(content_object=trek.published_pois.first())
+        files, output = self.sync_files(workers=2)
+        self.assertIn('en/{pk}/trek.geojson'.format(pk=trek.pk), output)
+        self.assertIn('nolang/{pk}.zip'.format(pk=trek.pk), files)
+        self.assertSetEqual(files, self.sync_files()[0])
+
+
 class SyncMobileFailTest(VarTmpTestCase):
     def test_fail_directory_not_empty(self):
         os.makedirs(os.path.join(self.sync_directory, 'other'))
@@ -393,6 +418,30 @@ class SyncMobileTreksTest(VarTmpTestCase):
                                  Trek.objects.filter(**{build_localized_fieldname('published', lang): True}).count())
         self.assertIn('en/treks.geojson', output.getvalue())
 
+    def test_sync_treks_incremental(self):
+        def inode(*path):
+            return os.stat(os.path.join(self.sync_directory, *path)).st_ino
+
+        trek_1_json = ('en', str(self.trek_1.pk), 'pois.geojson')
+        trek_1_zip = ('nolang', '{}.zip'.format(self.trek_1.pk))
+        trek_2_json = ('en', str(self.trek_2.pk), 'trek.geojson')
+        management.call_command('sync_mobile', self.sync_directory, url='http://localhost:8000',
+                                skip_tiles=True, incremental=True, verbosity=0)
+        inodes = [inode(*trek_1_json), inode(*trek_1_zip), inode(*trek_2_json)]
+        output = StringIO()
+        management.call_command('sync_mobile', self.sync_directory, url='http://localhost:8000',
+                                skip_tiles=True, incremental=True, verbosity=2, stdout=output)
+        self.assertIn('en/{}\x1b[0m \x1b[32munchanged'.format(self.trek_1.pk), output.getvalue())
+        self.assertEqual([inode(*trek_1_json), inode(*trek_1_zip), inode(*trek_2_json)], inodes)
+
+        self.poi_1.name = 'Changed POI'
+        self.poi_1.save()
+        management.call_command('sync_mobile', self.sync_directory, url='http://localhost:8000',
+                                skip_tiles=True, incremental=True, verbosity=0)
+        self.assertNotEqual(inode(*trek_1_json), inodes[0])
+        with open(os.path.join(self.sync_directory, *trek_1_json), 'r') as f:
+            self.assertIn('Changed POI', [poi['properties']['name'] for poi in json.load(f)['features']])
+
     def test_sync_treks_by_pk(self):
         output = StringIO()
         management.call_command('sync_mobile', self.sync_directory, url='http://localhost:8000',
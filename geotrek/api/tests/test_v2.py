@@ -7,7 +7,7 @@ from unittest import skipIf, mock
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
-from django.contrib.gis.geos import (LineString, MultiLineString, MultiPoint,
+from django.contrib.gis.geos import (LineString, MultiLineString, MultiPoint, MultiPolygon,
                                      Point, Polygon)
 from django.contrib.gis.geos.collections import GeometryCollection
 from django.db import connection
@@ -5582,6 +5582,57 @@ class GenericCacheTestCase(APITestCase):
         self.assertTrue(data['pictogram'].startswith('http://'))
 
 
+class ListCacheTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.trek = trek_factory.TrekFactory.create(name_en="Old name", published=True)
+
+    def test_list_cache_is_used_until_model_changes(self):
+        response = self.client.get(reverse('apiv2:trek-list'), {'format': 'geojson'})
+        self.assertEqual(response.json()['features'][0]['properties']['name']['en'], "Old name")
+
+        # after cache hit, only generations of listed, serialized and related models are queried, at once
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('apiv2:trek-list'), {'format': 'geojson'})
+        self.assertEqual(response.json()['features'][0]['properties']['name']['en'], "Old name")
+
+        self.trek.name_en = "New name"
+        self.trek.save()
+        response = self.client.get(reverse('apiv2:trek-list'), {'format': 'geojson'})
+        self.assertEqual(response.json()['features'][0]['properties']['name']['en'], "New name")
+
+    def test_list_cache_invalidates_when_object_is_deleted(self):
+        other_trek = trek_factory.TrekFactory.create(published=True)
+        response = self.client.get(reverse('apiv2:trek-list'))
+        self.assertEqual(response.json()['count'], 2)
+        other_trek.delete()
+        response = self.client.get(reverse('apiv2:trek-list'))
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_list_cache_invalidates_when_related_model_changes(self):
+        response = self.client.get(reverse('apiv2:trek-list'))
+        self.assertEqual(response.json()['results'][0]['attachments'], [])
+        common_factory.AttachmentFactory.create(content_object=self.trek, attachment_file=get_dummy_uploaded_image())
+        response = self.client.get(reverse('apiv2:trek-list'))
+        self.assertEqual(len(response.json()['results'][0]['attachments']), 1)
+
+    def test_list_cache_invalidates_when_serialized_relations_change(self):
+        theme = common_factory.ThemeFactory.create()
+        response = self.client.get(reverse('apiv2:trek-list'))
+        self.assertEqual(response.json()['results'][0]['themes'], [])
+        # Only the many-to-many table changes
+        self.trek.themes.add(theme)
+        response = self.client.get(reverse('apiv2:trek-list'))
+        self.assertEqual(response.json()['results'][0]['themes'], [theme.pk])
+
+    def test_list_cache_invalidates_when_city_changes(self):
+        response = self.client.get(reverse('apiv2:trek-list'))
+        self.assertEqual(response.json()['results'][0]['cities'], [])
+        zoning_factory.CityFactory.create(code='04000', geom=MultiPolygon(self.trek.geom.buffer(10)))
+        response = self.client.get(reverse('apiv2:trek-list'))
+        self.assertEqual(response.json()['results'][0]['cities'], ['04000'])
+
+
 class CreateReportsAPITest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -15,6 +15,7 @@ from django_filters.widgets import CSVWidget
 from rest_framework.filters import BaseFilterBackend
 from rest_framework_gis.filters import DistanceToPointFilter, InBBOXFilter
 
+from geotrek.core.models import Topology
 from geotrek.flatpages.models import MenuItem, FlatPage
 from modeltranslation.utils import build_localized_fieldname
 
@@ -369,15 +370,25 @@ class NearbyContentFilter(BaseFilterBackend):
         return fields
 
 
+def filter_by_zoning(qs, zoning_model, pks):
+    """ Keep objects intersecting one of the given cities or districts """
+    if issubclass(qs.model, Topology):
+        # Use memberships maintained by triggers instead of spatial queries
+        memberships = qs.model.zoning_memberships_querysets()[f'{zoning_model._meta.model_name}_memberships']
+        return qs.filter(Exists(memberships.filter(topology=OuterRef('pk'),
+                                                   **{f'{zoning_model._meta.model_name}__in': pks})))
+    return qs.filter(Exists(zoning_model.objects.filter(pk__in=pks, geom__intersects=OuterRef('geom'))))
+
+
 class GeotrekZoningAndThemeFilter(BaseFilterBackend):
     def _filter_queryset(self, request, queryset, view):
         qs = queryset
         cities = request.GET.get('cities')
         if cities:
-            qs = qs.filter(Exists(City.objects.filter(code__in=cities.split(","), geom__intersects=OuterRef('geom'))))
+            qs = filter_by_zoning(qs, City, cities.split(","))
         districts = request.GET.get('districts')
         if districts:
-            qs = qs.filter(Exists(District.objects.filter(pk__in=districts.split(","), geom__intersects=OuterRef('geom'))))
+            qs = filter_by_zoning(qs, District, districts.split(","))
         structures = request.GET.get('structures')
         if structures:
             qs = qs.filter(structure__in=structures.split(','))
@@ -706,10 +717,10 @@ class GeotrekTrekQueryParamsFilter(BaseFilterBackend):
             qs = qs.filter(ascent__lte=ascent_max)
         cities = request.GET.get('cities')
         if cities:
-            qs = qs.filter(Exists(City.objects.filter(code__in=cities.split(","), geom__intersects=OuterRef('geom'))))
+            qs = filter_by_zoning(qs, City, cities.split(","))
         districts = request.GET.get('districts')
         if districts:
-            qs = qs.filter(Exists(District.objects.filter(pk__in=districts.split(","), geom__intersects=OuterRef('geom'))))
+            qs = filter_by_zoning(qs, District, districts.split(","))
         structures = request.GET.get('structures')
         if structures:
             qs = qs.filter(structure__in=structures.split(','))
@@ -895,23 +906,11 @@ class GeotrekSiteFilter(GeotrekZoningAndThemeFilter):
             # Being a root node <=> having no parent
             queryset = queryset.filter(parent=None)
         practices_in_hierarchy = request.GET.get('practices_in_hierarchy')
-        # TODO Optimize this filter by finding an alternative to queryset iterating
         if practices_in_hierarchy:
-            wanted_practices = set(map(int, practices_in_hierarchy.split(',')))
-            for site in queryset:
-                # Exclude if practices in hierarchy don't match any wanted practices
-                found_practices = site.super_practices_id
-                if found_practices.isdisjoint(wanted_practices):
-                    queryset = queryset.exclude(id=site.pk)
-        # TODO Optimize this filter by finding an alternative to queryset iterating
+            queryset = queryset.filter(practices_in_hierarchy__overlap=list(map(int, practices_in_hierarchy.split(','))))
         ratings_in_hierarchy = request.GET.get('ratings_in_hierarchy')
         if ratings_in_hierarchy:
-            wanted_ratings = set(map(int, ratings_in_hierarchy.split(',')))
-            for site in queryset:
-                # Exclude if ratings in hierarchy don't match any wanted ratings
-                found_ratings = site.super_ratings_id
-                if found_ratings.isdisjoint(wanted_ratings):
-                    queryset = queryset.exclude(id=site.pk)
+            queryset = queryset.filter(ratings_in_hierarchy__overlap=list(map(int, ratings_in_hierarchy.split(','))))
         types = request.GET.get('types')
         if types:
             queryset = queryset.filter(type__in=types.split(','))
@@ -824,8 +824,11 @@ if 'geotrek.trekking' in settings.INSTALLED_APPS:
             return [label.pk for label in obj.published_labels]
 
         def get_departure_city(self, obj):
-            geom = self.get_first_point(obj.geom)
-            city = zoning_models.City.objects.all().filter(geom__contains=geom).first()
+            if obj.geom.geom_type in ('LineString', 'Point'):
+                city = obj.get_departure_city()
+            else:
+                geom = self.get_first_point(obj.geom)
+                city = zoning_models.City.objects.all().filter(geom__contains=geom).first()
             return city.code if city else None
 
         def _replace_image_paths_with_urls(self, data):
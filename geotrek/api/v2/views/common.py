@@ -1,5 +1,3 @@
-from hashlib import md5
-
 from django.conf import settings
 from django.contrib.gis.db.models.functions import Transform
 from django.db.models import F
@@ -26,33 +24,14 @@ class ThemeViewSet(ListCacheResponseMixin, api_viewsets.GeotrekViewSet):
     serializer_class = api_serializers.ThemeSerializer
     queryset = common_models.Theme.objects.all()
 
-    def get_list_cache_key(self):
-        """ return specific list cache key based on list last_update object """
-        last_update = self.get_queryset().model.last_update_and_count.get('last_update')
-        last_update_trek = Trek.last_update_and_count.get('last_update')
-        last_update_touristic_content = TouristicContent.last_update_and_count.get('last_update')
-        last_update_touristic_event = TouristicEvent.last_update_and_count.get('last_update')
-
-        last_updates = [
-            last_update.isoformat() if last_update else '0000-00-00',
-            last_update_trek.isoformat() if last_update_trek else '0000-00-00',
-            last_update_touristic_content.isoformat() if last_update_touristic_content else '0000-00-00',
-            last_update_touristic_event.isoformat() if last_update_touristic_event else '0000-00-00',
-        ]
+    @property
+    def list_cache_related_models(self):
+        """ themes are listed according to related treks, touristic contents, events and sites """
+        related_models = [Trek, TouristicContent, TouristicEvent]
         if 'geotrek.outdoor' in settings.INSTALLED_APPS:
             from geotrek.outdoor.models import Site
-            list_update_site = Site.last_update_and_count.get('last_update')
-            last_updates.append(
-                list_update_site.isoformat() if list_update_site else '0000-00-00',
-            )
-
-        last_update = max(*last_updates)
-
-        return f"{self.get_base_cache_string()}:{last_update}"
-
-    def list_cache_key_func(self, **kwargs):
-        """ cache key md5 for list viewset action """
-        return md5(self.get_list_cache_key().encode("utf-8")).hexdigest()
+            related_models.append(Site)
+        return related_models
 
     @cache_response_detail()
     def retrieve(self, request, pk=None, format=None):
@@ -6,11 +6,13 @@ from django.utils import translation
 
 from geotrek.api.v2 import serializers as api_serializers, \
     filters as api_filters, viewsets as api_viewsets
+from geotrek.api.v2.cache import ListCacheResponseMixin
 from geotrek.common.models import Attachment, HDViewPoint
 from geotrek.outdoor import models as outdoor_models
+from geotrek.zoning.models import City, District
 
 
-class SiteViewSet(api_viewsets.GeotrekGeometricViewset):
+class SiteViewSet(ListCacheResponseMixin, api_viewsets.GeotrekGeometricViewset):
     filter_backends = api_viewsets.GeotrekGeometricViewset.filter_backends + (
         api_filters.GeotrekSiteFilter,
         api_filters.NearbyContentFilter,
@@ -18,6 +20,7 @@ class SiteViewSet(api_viewsets.GeotrekGeometricViewset):
         api_filters.GeotrekRatingsFilter
     )
     serializer_class = api_serializers.SiteSerializer
+    list_cache_related_models = (Attachment, City, District)
 
     def get_queryset(self):
         with translation.override(self.request.GET.get('language'), deactivate=True):
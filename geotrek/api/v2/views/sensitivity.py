@@ -6,12 +6,13 @@ from django_filters.rest_framework.backends import DjangoFilterBackend
 from geotrek.common.models import Attachment
 from geotrek.api.v2 import serializers as api_serializers, \
     viewsets as api_viewsets
+from geotrek.api.v2.cache import ListCacheResponseMixin
 from geotrek.common.functions import GeometryType, Buffer, Area
 from geotrek.sensitivity import models as sensitivity_models
 from ..filters import GeotrekQueryParamsFilter, GeotrekQueryParamsDimensionFilter, GeotrekInBBoxFilter, GeotrekSensitiveAreaFilter, NearbyContentFilter, UpdateOrCreateDateFilter
 
 
-class SensitiveAreaViewSet(api_viewsets.GeotrekGeometricViewset):
+class SensitiveAreaViewSet(ListCacheResponseMixin, api_viewsets.GeotrekGeometricViewset):
     filter_backends = (
         DjangoFilterBackend,
         GeotrekQueryParamsFilter,
@@ -23,6 +24,7 @@ class SensitiveAreaViewSet(api_viewsets.GeotrekGeometricViewset):
     )
     bbox_filter_field = 'geom_transformed'
     bbox_filter_include_overlapping = True
+    list_cache_related_models = (sensitivity_models.Species, )
 
     def get_serializer_class(self):
         if 'bubble' in self.request.GET:
@@ -9,11 +9,13 @@ from rest_framework.response import Response
 from modeltranslation.utils import build_localized_fieldname
 
 from geotrek.api.v2 import filters as api_filters, serializers as api_serializers, viewsets as api_viewsets
+from geotrek.api.v2.cache import ListCacheResponseMixin
 from geotrek.api.v2.decorators import cache_response_detail
 from geotrek.api.v2.functions import Length3D
 from geotrek.api.v2.renderers import SVGProfileRenderer
 from geotrek.common.models import Attachment, AccessibilityAttachment, HDViewPoint
 from geotrek.trekking import models as trekking_models
+from geotrek.zoning.models import City, District
 
 
 class WebLinkCategoryViewSet(api_viewsets.GeotrekViewSet):
@@ -21,7 +23,7 @@ class WebLinkCategoryViewSet(api_viewsets.GeotrekViewSet):
     queryset = trekking_models.WebLinkCategory.objects.all()
 
 
-class TrekViewSet(api_viewsets.GeotrekGeometricViewset):
+class TrekViewSet(ListCacheResponseMixin, api_viewsets.GeotrekGeometricViewset):
     filter_backends = api_viewsets.GeotrekGeometricViewset.filter_backends + (
         api_filters.GeotrekTrekQueryParamsFilter,
         api_filters.NearbyContentFilter,
@@ -30,6 +32,7 @@ class TrekViewSet(api_viewsets.GeotrekGeometricViewset):
         api_filters.GeotrekNetworksFilter
     )
     serializer_class = api_serializers.TrekSerializer
+    list_cache_related_models = (Attachment, City, District)
 
     def get_queryset(self):
         with translation.override(self.request.GET.get('language'), deactivate=True):
@@ -43,7 +46,8 @@ class TrekViewSet(api_viewsets.GeotrekGeometricViewset):
                                   Prefetch('web_links',
                                            queryset=trekking_models.WebLink.objects.select_related('category')),
                                   Prefetch('view_points',
-                                           queryset=HDViewPoint.objects.select_related('content_type', 'license').annotate(geom_transformed=Transform(F('geom'), settings.API_SRID)))) \
+                                           queryset=HDViewPoint.objects.select_related('content_type', 'license').annotate(geom_transformed=Transform(F('geom'), settings.API_SRID))),
+                                  *trekking_models.Trek.zoning_prefetches('city_memberships', 'district_memberships')) \
                 .annotate(geom3d_transformed=Transform(F('geom_3d'), settings.API_SRID),
                           length_3d_m=Length3D('geom_3d')) \
                 .order_by("name")  # Required for reliable pagination
@@ -175,13 +179,14 @@ class DifficultyViewSet(api_viewsets.GeotrekViewSet):
         return Response(serializer.data)
 
 
-class POIViewSet(api_viewsets.GeotrekGeometricViewset):
+class POIViewSet(ListCacheResponseMixin, api_viewsets.GeotrekGeometricViewset):
     filter_backends = api_viewsets.GeotrekGeometricViewset.filter_backends + (
         api_filters.GeotrekPOIFilter,
         api_filters.NearbyContentFilter,
         api_filters.UpdateOrCreateDateFilter
     )
     serializer_class = api_serializers.POISerializer
+    list_cache_related_models = (Attachment, )
     queryset = trekking_models.POI.objects.existing() \
         .select_related('topo_object', 'type', ) \
         .prefetch_related('topo_object__aggregations',
@@ -1,9 +1,11 @@
+from datetime import date
 from hashlib import md5
 
 from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
 from django_filters.rest_framework.backends import DjangoFilterBackend
 from mapentity.renderers import GeoJSONRenderer
-from rest_framework import viewsets, renderers
+from rest_framework import viewsets, renderers, serializers
 from rest_framework.authentication import BasicAuthentication, SessionAuthentication
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
@@ -11,6 +13,7 @@ from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticate
 from geotrek.api.v2 import pagination as api_pagination, filters as api_filters
 from geotrek.api.v2.cache import RetrieveCacheResponseMixin
 from geotrek.api.v2.serializers import override_serializer
+from geotrek.common.mixins.models import last_updates_and_counts
 
 
 class GeotrekViewSet(RetrieveCacheResponseMixin, viewsets.ReadOnlyModelViewSet):
@@ -24,6 +27,8 @@ class GeotrekViewSet(RetrieveCacheResponseMixin, viewsets.ReadOnlyModelViewSet):
     authentication_classes = [BasicAuthentication, SessionAuthentication]
     renderer_classes = [renderers.JSONRenderer, renderers.BrowsableAPIRenderer, ] if settings.DEBUG else [renderers.JSONRenderer, ]
     lookup_value_regex = r'\d+'
+    # Other models whose changes alter the list response, besides serialized ones (see get_serialized_models)
+    list_cache_related_models = ()
 
     def get_ordered_query_params(self):
         """ Get multi value query params sorted by key """
@@ -40,14 +45,61 @@ class GeotrekViewSet(RetrieveCacheResponseMixin, viewsets.ReadOnlyModelViewSet):
         """ return specific object cache key based on object date_update column"""
         # don't directly use get_object or get_queryset to avoid select / prefetch and annotation sql queries
         # insure object exists and doesn't raise exception
-        instance = get_object_or_404(self.get_queryset().model, pk=pk)
-        date_update = instance.date_update
+        date_update = get_object_or_404(self.get_queryset().model._default_manager.values_list('date_update', flat=True), pk=pk)
         return f"{self.get_base_cache_string()}:{date_update.isoformat()}"
 
     def object_cache_key_func(self, **kwargs):
         """ cache key md5 for retrieve viewset action """
         return md5(self.get_object_cache_key(kwargs.get('kwargs').get('pk')).encode("utf-8")).hexdigest()
 
+    @classmethod
+    def get_serialized_models(cls, serializer_class, models=None):
+        """ Model of a model serializer, of its nested serializers, and models (and many-to-many tables)
+        of relations in their fields """
+        models = [] if models is None else models
+        meta = getattr(serializer_class, 'Meta', None)
+        model = getattr(meta, 'model', None)
+        if model is None:
+            return models
+        if model not in models:
+            models.append(model)
+        for field in serializer_class._declared_fields.values():
+            nested = getattr(field, 'child', field)
+            nested_model = getattr(getattr(nested, 'Meta', None), 'model', None)
+            if isinstance(nested, serializers.BaseSerializer) and nested_model not in models:
+                cls.get_serialized_models(type(nested), models)
+        field_names = getattr(meta, 'fields', ())
+        for name in field_names if isinstance(field_names, (list, tuple)) else ():
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if field.related_model is None:
+                continue
+            through = getattr(field, 'through', None) or getattr(field.remote_field, 'through', None)
+            for related_model in (field.related_model, through):
+                if related_model is not None and related_model not in models:
+                    models.append(related_model)
+        return models
+
+    def get_list_cache_models(self):
+        models = self.get_serialized_models(self.get_serializer_class(), [self.get_queryset().model])
+        return list(dict.fromkeys([*models, *self.list_cache_related_models]))
+
+    def get_list_cache_key(self):
+        """ return list cache key based on generation (last update and count) of listed, serialized and
+        related models, so that any creation, update or deletion invalidates it """
+        generations = []
+        for generation in last_updates_and_counts(self.get_list_cache_models()):
+            last_update = generation['last_update'].isoformat() if generation['last_update'] else '0000-00-00'
+            generations.append(f"{last_update}:{generation['count']}:{generation['last_id']}")
+        # some filters depend on current date (sensitivity periods, past events)
+        return f"{self.get_base_cache_string()}:{date.today().isoformat()}:{':'.join(generations)}"
+
+    def list_cache_key_func(self, **kwargs):
+        """ cache key md5 for list viewset action """
+        return md5(self.get_list_cache_key().encode("utf-8")).hexdigest()
+
     def get_serializer_context(self):
         return {
             'request': self.request,
@@ -8,6 +8,14 @@ class Length(GeoFunc):
     output_field = FloatField()
 
 
+class DistanceKNN(GeoFunc):
+    """ PostGIS distance operator (<->), using spatial index when used in ORDER BY """
+    output_field = FloatField()
+    geom_param_pos = (0, 1)
+    arg_joiner = ' <-> '
+    template = '%(expressions)s'
+
+
 class SimplifyPreserveTopology(GeomOutputGeoFunc):
     """ ST_SimplifyPreserveTopology postgis function """
 
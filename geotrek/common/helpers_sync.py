@@ -1,6 +1,12 @@
+import hashlib
 import logging
+import os
 import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import numpy as np
 from django.conf import settings
 from landez import TilesManager
 from landez.sources import DownloadError
@@ -9,21 +15,160 @@ from landez.sources import DownloadError
 logger = logging.getLogger(__name__)
 
 
+def tile_coordinates(lng, lat, zoom):
+    """ Fractional tile coordinates (Web Mercator, y going south) of arrays of longitudes and latitudes,
+    projected as landez does.
+    """
+    size = 2 ** zoom
+    x = (np.asarray(lng, dtype=float) / 360.0 + 0.5) * size
+    sin = np.clip(np.sin(np.radians(lat)), -0.9999, 0.9999)
+    y = (0.5 - np.arctanh(sin) / (2 * np.pi)) * size
+    return x, y
+
+
+def densify(coords, step):
+    """ Points along a line every `step` degrees at most, including its vertices """
+    if not len(coords):
+        return np.empty((0, 2))
+    coords = np.asarray(coords, dtype=float)[:, :2]
+    if len(coords) < 2:
+        return coords
+    deltas = np.diff(coords, axis=0)
+    counts = np.maximum(np.ceil(np.abs(deltas).max(axis=1) / step), 1).astype(int)
+    segments = np.repeat(np.arange(len(deltas)), counts)
+    ratios = (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)) / np.repeat(counts, counts)
+    return np.vstack([coords[segments] + deltas[segments] * ratios[:, None], coords[-1:]])
+
+
+def lines_coverage(lines, radius, zoom, tile_scheme='wmts'):
+    """ Tiles (z, x, y) of a zoom level intersecting squares of `radius` degrees centered along lines,
+    i.e. lines buffered by `radius`. Lines are given as lists of (lng, lat) coordinates.
+    """
+    size = 2 ** zoom
+    # Sample lines at least once per tile and per radius, so that consecutive squares overlap
+    points = np.vstack([densify(line, min(radius, 360.0 / size)) for line in lines])
+    if not len(points):
+        return set()
+    x0, y0 = tile_coordinates(points[:, 0] - radius, points[:, 1] + radius, zoom)
+    x1, y1 = tile_coordinates(points[:, 0] + radius, points[:, 1] - radius, zoom)
+    # Bounds are inclusive, as in landez tiles lists
+    x0 = np.clip(np.floor(x0), 0, size).astype(np.int64)
+    y0 = np.clip(np.floor(y0), 0, size).astype(np.int64)
+    x1 = np.clip(np.floor(x1), -1, size - 1).astype(np.int64)
+    y1 = np.clip(np.floor(y1), -1, size - 1).astype(np.int64)
+    # Tile ranges of all squares at once, padded to the largest one and masked
+    xs = x0[:, None] + np.arange(max((x1 - x0).max() + 1, 0))
+    ys = y0[:, None] + np.arange(max((y1 - y0).max() + 1, 0))
+    mask = (xs <= x1[:, None])[:, :, None] & (ys <= y1[:, None])[:, None, :]
+    indices = np.unique((xs[:, :, None] * size + ys[:, None, :])[mask])
+    xs, ys = np.divmod(indices, size)
+    if tile_scheme == 'tms':
+        ys = size - 1 - ys
+    return set(zip([zoom] * len(indices), xs.tolist(), ys.tolist()))
+
+
+class TileStore:
+    """ Tiles of a source kept on disk between syncs, until they expire (in seconds).
+
+    Tiles contents are stored by hash, and indexed by source and tile, so that identical tiles
+    (sea, blank areas...) are stored once.
+    """
+    def __init__(self, path, source, expiry=None):
+        self.objects_dir = os.path.join(path, 'objects')
+        self.indexes_dir = os.path.join(path, 'index')
+        self.index_dir = os.path.join(self.indexes_dir, hashlib.sha256(source.encode()).hexdigest())
+        self.expiry = expiry
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def index_path(self, tile):
+        return os.path.join(self.index_dir, *[str(i) for i in tile])
+
+    def get(self, tile):
+        """ Content of a tile, or None if it is not stored or expired """
+        path = self.index_path(tile)
+        try:
+            if self.expiry is not None and time.time() - os.path.getmtime(path) >= self.expiry:
+                return None
+            with open(path) as f:
+                digest = f.read()
+            with open(self.object_path(digest), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, tile, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            self.write(path, data)
+        self.write(self.index_path(tile), digest.encode())
+
+    def purge(self):
+        """ Delete expired tiles indexes, of all sources, then contents no longer indexed.
+        Returns the number of deleted contents.
+        """
+        start = time.time()
+        indexed = set()
+        for root, dirs, names in os.walk(self.indexes_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    if self.expiry is not None and start - os.path.getmtime(path) >= self.expiry:
+                        os.remove(path)
+                        continue
+                    with open(path) as f:
+                        indexed.add(f.read())
+                except OSError:
+                    continue
+        deleted = 0
+        for root, dirs, names in os.walk(self.objects_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                # Contents written since the purge started may not be indexed yet. A content indexed
+                # again meanwhile may still be deleted, its tile is then downloaded again.
+                try:
+                    if name not in indexed and os.path.getmtime(path) < start:
+                        os.remove(path)
+                        deleted += 1
+                except OSError:
+                    continue
+        return deleted
+
+    def write(self, path, data):
+        # Tiles may be stored concurrently by several threads or processes
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as f:
+            f.write(data)
+        os.replace(f.name, path)
+
+
 class ZipTilesBuilder:
-    def __init__(self, zipfile, prefix="", **builder_args):
+    def __init__(self, zipfile, prefix="", tiles_manager=None, failed_tiles=None, store=None, workers=1,
+                 **builder_args):
+        """ Tiles manager, set of tiles which failed to download and tiles store can be shared between builders.
+        Tiles are fetched by `workers` threads.
+        """
         self.zipfile = zipfile
         self.prefix = prefix
+        self.tm = tiles_manager or self.build_tiles_manager(**builder_args)
+        self.failed_tiles = failed_tiles if failed_tiles is not None else set()
+        self.store = store
+        self.workers = workers
+        self.tiles = set()
+
+    def build_tiles_manager(self, **builder_args):
         builder_args['tile_format'] = self.format_from_url(builder_args['tiles_url'])
-        self.tm = TilesManager(**builder_args)
+        tm = TilesManager(**builder_args)
 
         if not isinstance(settings.MOBILE_TILES_URL, str) and len(settings.MOBILE_TILES_URL) > 1:
             for url in settings.MOBILE_TILES_URL[1:]:
-                args = builder_args
+                args = dict(builder_args)
                 args['tiles_url'] = url
                 args['tile_format'] = self.format_from_url(args['tiles_url'])
-                self.tm.add_layer(TilesManager(**args), opacity=1)
-
-        self.tiles = set()
+                tm.add_layer(TilesManager(**args), opacity=1)
+        return tm
 
     def format_from_url(self, url):
         """
@@ -39,16 +184,35 @@ class ZipTilesBuilder:
     def add_coverage(self, bbox, zoomlevels):
         self.tiles |= set(self.tm.tileslist(bbox, zoomlevels))
 
+    def add_lines_coverage(self, lines, radius, zoomlevels):
+        """ Add tiles covering lines (lists of (lng, lat) coordinates) buffered by `radius` degrees """
+        tile_scheme = getattr(self.tm, 'tile_scheme', 'wmts')
+        for zoom in zoomlevels:
+            self.tiles |= lines_coverage(lines, radius, zoom, tile_scheme)
+
+    def fetch(self, tile):
+        data = self.store.get(tile) if self.store else None
+        if data is None:
+            data = self.tm.tile(tile)
+            if self.store:
+                self.store.put(tile, data)
+        return data
+
     def run(self):
-        for tile in self.tiles:
-            name = '{prefix}{0}/{1}/{2}{ext}'.format(
-                *tile,
-                prefix=self.prefix,
-                ext=settings.MOBILE_TILES_EXTENSION or self.tm._tile_extension
-            )
-            try:
-                data = self.tm.tile(tile)
-            except DownloadError:
-                logger.warning("Failed to download tile %s" % name)
-            else:
-                self.zipfile.writestr(name, data)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.fetch, tile): tile for tile in self.tiles - self.failed_tiles}
+            # Zip file is written by the main thread only
+            for future in as_completed(futures):
+                tile = futures[future]
+                name = '{prefix}{0}/{1}/{2}{ext}'.format(
+                    *tile,
+                    prefix=self.prefix,
+                    ext=settings.MOBILE_TILES_EXTENSION or self.tm._tile_extension
+                )
+                try:
+                    data = future.result()
+                except DownloadError:
+                    logger.warning("Failed to download tile %s" % name)
+                    self.failed_tiles.add(tile)
+                else:
+                    self.zipfile.writestr(name, data)
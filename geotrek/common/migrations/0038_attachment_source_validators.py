@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0037_annotationcategory_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='source_etag',
+            field=models.CharField(blank=True, default='', editable=False, max_length=256),
+        ),
+        migrations.AddField(
+            model_name='attachment',
+            name='source_last_modified',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
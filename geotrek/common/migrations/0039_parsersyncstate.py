@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0038_attachment_source_validators'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParserSyncState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('parser', models.CharField(max_length=256, unique=True)),
+                ('last_sync', models.DateTimeField(blank=True, null=True)),
+                ('etags', models.JSONField(default=dict)),
+                ('row_hashes', models.JSONField(default=dict)),
+            ],
+            options={
+                'verbose_name': 'Parser synchronization state',
+                'verbose_name_plural': 'Parser synchronization states',
+            },
+        ),
+    ]
@@ -8,8 +8,7 @@ from PIL.Image import DecompressionBombError
 from django.conf import settings
 from django.core.files.storage import default_storage
 from django.core.mail import mail_managers
-from django.db import models
-from django.db.models import Max, Count
+from django.db import connection, models
 
 from django.template.defaultfilters import slugify
 from django.template.loader import render_to_string
@@ -43,6 +42,26 @@ class CheckBoxActionMixin:
         return self.checkbox
 
 
+def last_updates_and_counts(models):
+    """ Last update date and number of rows of each model, in one query, so that any creation, update or
+    deletion of rows changes them. Tables without date_update column (e.g. many-to-many relations) give
+    their last integer id instead, which changes when rows are replaced. """
+    queries = []
+    for index, model in enumerate(models):
+        columns = {field.column for field in model._meta.concrete_fields}
+        integer_pk = model._meta.pk.get_internal_type() in ('AutoField', 'BigAutoField', 'IntegerField')
+        queries.append("SELECT {index}, {last_update}, COUNT(*), {last_id} FROM {table}".format(
+            index=index,
+            last_update='MAX(date_update)' if 'date_update' in columns else 'NULL::timestamptz',
+            last_id='MAX({})'.format(connection.ops.quote_name(model._meta.pk.column)) if integer_pk else 'NULL::bigint',
+            table=connection.ops.quote_name(model._meta.db_table),
+        ))
+    with connection.cursor() as cursor:
+        cursor.execute(" UNION ALL ".join(queries) + " ORDER BY 1")
+        return [{'last_update': last_update, 'count': count, 'last_id': last_id}
+                for index, last_update, count, last_id in cursor.fetchall()]
+
+
 class TimeStampedModelMixin(models.Model):
     # Computed values (managed at DB-level with triggers)
     date_insert = models.DateTimeField(auto_now_add=True, editable=False, verbose_name=_("Insertion date"))
@@ -69,10 +88,7 @@ class TimeStampedModelMixin(models.Model):
 
     @classproperty
     def last_update_and_count(self):
-        return self._meta.model.objects.aggregate(
-            last_update=Max('date_update'),
-            count=Count('pk')
-        )
+        return last_updates_and_counts([self._meta.model])[0]
 
 
 class NoDeleteMixin(models.Model):
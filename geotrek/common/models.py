@@ -185,6 +185,24 @@ class FileType(StructureOrNoneRelated, TimeStampedModelMixin, BaseFileType):
 class Attachment(BaseAttachment):
     creation_date = models.DateField(verbose_name=_("Creation Date"), null=True, blank=True)
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    # HTTP validators of imported attachments, used to detect changes of remote files
+    source_etag = models.CharField(max_length=256, blank=True, default='', editable=False)
+    source_last_modified = models.CharField(max_length=64, blank=True, default='', editable=False)
+
+
+class ParserSyncState(models.Model):
+    """ Cursors of incremental imports, see IncrementalParserMixin """
+    parser = models.CharField(max_length=256, unique=True)
+    last_sync = models.DateTimeField(null=True, blank=True)
+    etags = models.JSONField(default=dict)
+    row_hashes = models.JSONField(default=dict)
+
+    class Meta:
+        verbose_name = _("Parser synchronization state")
+        verbose_name_plural = _("Parser synchronization states")
+
+    def __str__(self):
+        return self.parser
 
 
 class Theme(TimeStampedModelMixin, PictogramMixin):
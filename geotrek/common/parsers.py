@@ -1,3 +1,5 @@
+from datetime import timedelta
+from hashlib import md5
 from io import BytesIO
 import importlib
 import json
@@ -13,25 +15,31 @@ import textwrap
 import xlrd
 import xml.etree.ElementTree as ET
 from functools import reduce
+from collections import deque
 from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+import threading
 from time import sleep
 from PIL import Image, UnidentifiedImageError
 
-from ftplib import FTP
+from ftplib import FTP, all_errors as ftp_errors
 from os.path import dirname
 from urllib.parse import urlparse
 
 from django.contrib.gis.geos import GEOSGeometry, WKBWriter
-from django.db import models, connection
+from django.db import models, connection, transaction
+from django.db.models import prefetch_related_objects, signals
 from django.db.models.fields import NOT_PROVIDED
 from django.db.utils import DatabaseError, InternalError
 from django.contrib.auth import get_user_model
 from django.contrib.gis.gdal import DataSource, GDALException, CoordTransform
 from django.contrib.gis.geos import Point, Polygon
-from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured, ValidationError
 from django.core.files.base import ContentFile
 from django.template.loader import render_to_string
-from django.utils import translation
+from django.utils import timezone, translation
 from django.utils.translation import gettext as _
 from django.utils.encoding import force_str
 from django.conf import settings
@@ -39,7 +47,7 @@ from paperclip.models import attachment_upload, random_suffix_regexp
 from modeltranslation.utils import build_localized_fieldname
 
 from geotrek.authent.models import default_structure
-from geotrek.common.models import FileType, Attachment, License, RecordSource
+from geotrek.common.models import FileType, Attachment, License, ParserSyncState, RecordSource
 from geotrek.common.utils.parsers import add_http_prefix
 from geotrek.common.utils.translation import get_translated_fields
 
@@ -79,6 +87,11 @@ class Parser:
     provider: A label that should include the data's source, it allows using multiple Parsers for the same model without concurrency
     delete: Delete old objects that are now missing from flux (based on 'get_to_delete_kwargs' including 'provider')
     update_only: Do not delete previous objects, and should query remote API with most recent 'date_update' timestamp
+    batch_size: Parse rows by chunks of this size, fetching existing objects and related objects once per chunk,
+                and writing objects and many-to-many relations in bulk when possible
+    lookahead: Number of rows read before being parsed, to start slow work early (see prefetch_row)
+    shards: Number of Celery subtasks sharing the rows of an import launched from the web interface
+    shard_size: Rows without external id are dealt to shards by blocks of this size
     """
     label = None
     model = None
@@ -103,6 +116,11 @@ class Parser:
     natural_keys = {}
     field_options = {}
     default_language = None
+    batch_size = None
+    bulk_save = False
+    lookahead = 0
+    shards = None
+    shard_size = 100
     headers = {"User-Agent": "Geotrek-Admin"}
 
     def __init__(self, progress_cb=None, user=None, encoding='utf8'):
@@ -117,6 +135,14 @@ class Parser:
         self.structure = user and user.profile.structure or default_structure()
         self.encoding = encoding
         self.translated_fields = get_translated_fields(self.model)
+        self.existing_objects = None
+        self.eid_field = None
+        self.lookup_cache = None
+        self.pending_objects = []
+        self.pending_m2m = {}
+        self.shard_lines = None
+        self.shards_to_delete = None
+        self.rows_read = 0
 
         if self.fields is None:
             self.fields = {
@@ -210,8 +236,11 @@ class Parser:
         if isinstance(field, models.CharField):
             val = str(val)[:256]
         if isinstance(field, models.ManyToManyField):
-            fk = getattr(self.obj, dst)
-            fk.set(val)
+            if self.batch_size:
+                self.pending_m2m.setdefault(dst, {})[self.obj] = (self.line, val)
+            else:
+                fk = getattr(self.obj, dst)
+                fk.set(val)
         else:
             setattr(self.obj, dst, val)
 
@@ -335,9 +364,17 @@ class Parser:
         if operation == "created":
             if hasattr(self.model, 'provider') and self.provider is not None and not self.obj.provider:
                 self.obj.provider = self.provider
+        if self.bulk_save:
+            # Saved with other objects of the chunk, see flush_chunk()
+            self.pending_objects.append((self.line, row, self.obj, operation, update_fields))
+            return
+        if operation == "created":
             self.obj.save()
         else:
             self.obj.save(update_fields=update_fields)
+        self.parse_obj_relations(row, operation, update_fields)
+
+    def parse_obj_relations(self, row, operation, update_fields):
         update_fields += self.parse_fields(row, self.m2m_fields)
         update_fields += self.parse_fields(row, self.m2m_constant_fields)
         update_fields += self.parse_fields(row, self.non_fields, non_field=True)
@@ -364,9 +401,73 @@ class Parser:
         self.eid_val = eid_val
         return {self.eid: eid_val}
 
+    def get_existing_objects(self, eid_kwargs):
+        if self.existing_objects is not None:
+            eid_key = self.eid_key(self.eid_val)
+            if eid_key is not None:
+                return self.existing_objects.get(eid_key, [])
+        objects = self.model.objects.filter(**eid_kwargs)
+        if hasattr(self.model, 'provider') and self.provider is not None:
+            objects = objects.filter(provider__exact=self.provider)
+        return objects
+
+    def get_eid_field(self):
+        """Field storing external ids, None if rows can't be matched with prefetched objects"""
+        try:
+            field = self.model._meta.get_field(self.eid)
+        except FieldDoesNotExist:
+            return None
+        return None if field.is_relation or not field.concrete else field
+
+    def eid_key(self, eid_val):
+        """Normalize external id as stored in database, to match rows with prefetched objects"""
+        if self.eid_field is None:
+            return None
+        try:
+            eid_val = self.eid_field.to_python(eid_val)
+            hash(eid_val)
+        except (ValidationError, TypeError):
+            return None
+        return eid_val
+
+    def peek_eid_key(self, row):
+        """External id of a row, without reporting warnings (reported later by parse_row)"""
+        if self.eid_field is None:
+            return None
+        warnings, self.warnings = self.warnings, {}
+        try:
+            self.get_eid_kwargs(row)
+        except (ImportError, DatabaseError):
+            return None
+        finally:
+            self.warnings = warnings
+        return self.eid_key(self.eid_val)
+
+    def prefetch_existing_objects(self, eid_keys):
+        """Fetch existing objects of a chunk of rows with one query (plus one per many-to-many field)"""
+        objects = self.model.objects.filter(**{'{}__in'.format(self.eid): eid_keys})
+        if hasattr(self.model, 'provider') and self.provider is not None:
+            objects = objects.filter(provider__exact=self.provider)
+        if hasattr(self.model, 'structure'):
+            objects = objects.select_related('structure')
+        objects = objects.prefetch_related(*self.m2m_field_names())
+        self.existing_objects = {}
+        for obj in objects:
+            self.existing_objects.setdefault(self.eid_key(getattr(obj, self.eid)), []).append(obj)
+
+    def m2m_field_names(self):
+        return [field.name for field in self.model._meta.many_to_many
+                if field.name in chain(self.m2m_fields, self.m2m_constant_fields)]
+
+    def next_line(self):
+        """Number of the row about to be parsed, rows of other shards being skipped"""
+        if self.shard_lines:
+            return self.shard_lines.popleft()
+        return self.line + 1
+
     def parse_row(self, row):
         self.eid_val = None
-        self.line += 1
+        self.line = self.next_line()
         if self.eid is None:
             eid_kwargs = {}
             objects = self.model.objects.none()
@@ -376,9 +477,7 @@ class Parser:
             except RowImportError as warnings:
                 self.add_warning(str(warnings))
                 return
-            objects = self.model.objects.filter(**eid_kwargs)
-            if hasattr(self.model, 'provider') and self.provider is not None:
-                objects = objects.filter(provider__exact=self.provider)
+            objects = self.get_existing_objects(eid_kwargs)
         if len(objects) == 0 and self.update_only:
             if self.warn_on_missing_objects:
                 self.add_warning(_("Bad value '{eid_val}' for field '{eid_src}'. No object with this identifier").format(eid_val=self.eid_val, eid_src=self.eid_src))
@@ -409,6 +508,106 @@ class Parser:
         if self.progress_cb:
             self.progress_cb(float(self.line) / self.nb, self.line, self.eid_val)
 
+    def parse_rows_by_chunks(self, rows):
+        """Split rows in chunks of batch_size rows, without duplicated external ids in a same chunk"""
+        chunk, eid_keys = [], set()
+        for row in rows:
+            eid_key = self.peek_eid_key(row)
+            if len(chunk) >= self.batch_size or (eid_key is not None and eid_key in eid_keys):
+                self.parse_chunk(chunk, eid_keys)
+                chunk, eid_keys = [], set()
+            chunk.append(row)
+            if eid_key is not None:
+                eid_keys.add(eid_key)
+        if chunk:
+            self.parse_chunk(chunk, eid_keys)
+
+    def parse_chunk(self, rows, eid_keys):
+        if self.eid_field is not None:
+            self.prefetch_existing_objects(eid_keys)
+        for row in rows:
+            try:
+                self.parse_row(row)
+            except (DatabaseError, RowImportError, ValueImportError) as e:
+                self.add_warning(str(e))
+        self.flush_chunk()
+        self.existing_objects = None
+
+    def flush_chunk(self):
+        """Write objects and many-to-many relations parsed in current chunk"""
+        line = self.line
+        pending, self.pending_objects = self.pending_objects, []
+        if pending:
+            try:
+                with transaction.atomic():
+                    self.model.objects.bulk_create([obj for _, _, obj, operation, _ in pending if operation == "created"])
+                    updated = [(obj, fields) for _, _, obj, operation, fields in pending if operation != "created" and fields]
+                    if updated:
+                        self.model.objects.bulk_update([obj for obj, _ in updated],
+                                                       set(chain.from_iterable(fields for _, fields in updated)))
+            except DatabaseError:
+                # Save objects one by one to report faulty lines
+                pending = [item for item in pending if self.save_pending_object(*item)]
+            prefetch_related_objects([obj for _, _, obj, _, _ in pending], *self.m2m_field_names())
+            for self.line, row, self.obj, operation, update_fields in pending:
+                try:
+                    self.parse_obj_relations(row, operation, update_fields)
+                except (DatabaseError, RowImportError, ValueImportError) as e:
+                    self.add_warning(str(e))
+                self.to_delete.discard(self.obj.pk)
+            self.line = line
+        self.flush_m2m()
+
+    def save_pending_object(self, line, row, obj, operation, update_fields):
+        """Returns True if saved"""
+        try:
+            with transaction.atomic():
+                if operation == "created":
+                    obj.pk = None
+                    obj.save()
+                else:
+                    obj.save(update_fields=update_fields)
+        except DatabaseError as e:
+            self.line = line
+            self.add_warning(str(e))
+            self.nb_success -= 1
+            return False
+        return True
+
+    def flush_m2m(self):
+        """Write many-to-many relations parsed in current chunk, given as {dst: {obj: (line, val)}}"""
+        line = self.line
+        pending_m2m, self.pending_m2m = self.pending_m2m, {}
+        for dst, values in pending_m2m.items():
+            try:
+                with transaction.atomic():
+                    self.set_m2m(dst, {obj: val for obj, (obj_line, val) in values.items()})
+            except DatabaseError:
+                # Write relations object by object to report faulty lines
+                for obj, (self.line, val) in values.items():
+                    try:
+                        with transaction.atomic():
+                            self.set_m2m(dst, {obj: val})
+                    except DatabaseError as e:
+                        self.add_warning(str(e))
+        self.line = line
+
+    def set_m2m(self, dst, values):
+        field = self.model._meta.get_field(dst)
+        through = field.remote_field.through
+        # Relations are written at once unless m2m_changed signals are expected
+        if not through._meta.auto_created or signals.m2m_changed.has_listeners(through):
+            for obj, val in values.items():
+                getattr(obj, dst).set(val)
+            return
+        source_id = '{}_id'.format(field.m2m_field_name())
+        target_id = '{}_id'.format(field.m2m_reverse_field_name())
+        through.objects.filter(**{'{}__in'.format(source_id): [obj.pk for obj in values]}).delete()
+        through.objects.bulk_create([
+            through(**{source_id: obj.pk, target_id: related_pk})
+            for obj, val in values.items() for related_pk in {getattr(related, 'pk', related) for related in val}
+        ])
+
     def report(self, output_format='txt'):
         context = {
             'nb_success': self.nb_success,
@@ -452,15 +651,14 @@ class Parser:
         if fk:
             fields[fk] = getattr(self.obj, fk)
         if create:
-            val, created = model.objects.get_or_create(**fields)
+            val, created = self.get_related(model, fields, create=True)
             if created:
                 self.add_warning(_("{model} '{val}' did not exist in Geotrek-Admin and was automatically created").format(model=model._meta.verbose_name.title(), val=val))
             return val
-        try:
-            return model.objects.get(**fields)
-        except model.DoesNotExist:
+        related, created = self.get_related(model, fields)
+        if related is None:
             self.add_warning(_("{model} '{val}' does not exists in Geotrek-Admin. Please add it").format(model=model._meta.verbose_name.title(), val=val))
-            return None
+        return related
 
     def filter_m2m(self, src, val, model, field, mapping=None, partial=False, create=False, fk=None, **kwargs):
         if not val:
@@ -478,18 +676,41 @@ class Parser:
             if fk:
                 fields[fk] = getattr(self.obj, fk)
             if create:
-                subval, created = model.objects.get_or_create(**fields)
+                subval, created = self.get_related(model, fields, create=True)
                 if created:
                     self.add_warning(_("{model} '{val}' did not exist in Geotrek-Admin and was automatically created").format(model=model._meta.verbose_name.title(), val=subval))
                 dst.append(subval)
                 continue
-            try:
-                dst.append(model.objects.get(**fields))
-            except model.DoesNotExist:
+            related, created = self.get_related(model, fields)
+            if related is None:
                 self.add_warning(_("{model} '{val}' does not exists in Geotrek-Admin. Please add it").format(model=model._meta.verbose_name.title(), val=subval))
                 continue
+            dst.append(related)
         return dst
 
+    def get_related(self, model, fields, create=False):
+        """Returns related object (None if it does not exist) and whether it was created.
+        Lookups are cached for the whole import in batched mode."""
+        key = None
+        if self.lookup_cache is not None:
+            try:
+                key = (model, create, frozenset(fields.items()))
+                if key in self.lookup_cache:
+                    return self.lookup_cache[key], False
+            except TypeError:  # Unhashable lookup value
+                key = None
+        if create:
+            related, created = model.objects.get_or_create(**fields)
+        else:
+            created = False
+            try:
+                related = model.objects.get(**fields)
+            except model.DoesNotExist:
+                related = None
+        if key is not None:
+            self.lookup_cache[key] = related
+        return related, created
+
     def get_to_delete_kwargs(self):
         # FIXME: use mapping if it exists
         kwargs = {}
@@ -518,18 +739,25 @@ class Parser:
             kwargs['provider__exact'] = self.provider
         return kwargs
 
-    def start(self):
+    def get_to_delete(self):
+        """Primary keys of objects deleted at the end of the import, unless found in rows"""
         kwargs = self.get_to_delete_kwargs()
         if kwargs is None:
-            self.to_delete = set()
+            return set()
+        return set(self.model.objects.filter(**kwargs).values_list('pk', flat=True))
+
+    def start(self):
+        if self.shards_to_delete is not None:
+            # Computed once for all shards by prepare_shards()
+            self.to_delete = set(self.shards_to_delete)
         else:
-            self.to_delete = set(self.model.objects.filter(**kwargs).values_list('pk', flat=True))
+            self.to_delete = self.get_to_delete()
 
     def end(self):
         if self.delete:
             self.model.objects.filter(pk__in=self.to_delete).delete()
 
-    def parse(self, filename=None, limit=None):
+    def check_source(self, filename=None):
         if filename:
             self.filename = filename
         if not self.url and not self.filename:
@@ -537,35 +765,164 @@ class Parser:
         if self.filename and not os.path.exists(self.filename):
             raise GlobalImportError(_("File does not exists at: {filename}").format(filename=self.filename))
 
+    def get_language(self):
         if self.default_language and self.default_language in settings.MODELTRANSLATION_LANGUAGES:
-            lang = self.default_language
-        else:
-            lang = settings.MODELTRANSLATION_DEFAULT_LANGUAGE
-        with translation.override(lang, deactivate=True):
+            return self.default_language
+        return settings.MODELTRANSLATION_DEFAULT_LANGUAGE
+
+    def parse(self, filename=None, limit=None):
+        self.check_source(filename)
+        with translation.override(self.get_language(), deactivate=True):
             self.start()
-            for i, row in enumerate(self.next_row()):
-                if limit and i >= limit:
-                    break
+            rows = self.next_row()
+            if limit:
+                rows = islice(rows, limit)
+            self.parse_rows(rows)
+            self.end()
+
+    def parse_rows(self, rows):
+        if self.lookahead:
+            rows = self.read_ahead(rows)
+        if self.batch_size:
+            self.lookup_cache = {}
+            self.eid_field = self.get_eid_field() if self.eid else None
+            self.bulk_save = self.can_bulk_save()
+            self.parse_rows_by_chunks(rows)
+            self.lookup_cache = None
+        else:
+            for row in rows:
                 try:
                     self.parse_row(row)
                 except (DatabaseError, RowImportError, ValueImportError) as e:
                     self.add_warning(str(e))
                 except Exception as e:
                     raise e
+
+    def prepare_shards(self, filename=None):
+        """Returns primary keys of objects to delete at the end of a sharded import,
+        computed before any shard creates objects"""
+        self.check_source(filename)
+        with translation.override(self.get_language(), deactivate=True):
+            self.start()
+            self.end_shard()
+        return sorted(self.to_delete) if self.delete else []
+
+    def parse_shard(self, shard, shards, filename=None, limit=None, to_delete=None):
+        """Parse rows of one shard out of `shards`, without running end() (see merge_shards).
+        to_delete being the result of prepare_shards(), if known.
+        Returns the state of the shard, to be merged with the other ones"""
+        self.check_source(filename)
+        self.shards_to_delete = to_delete
+        with translation.override(self.get_language(), deactivate=True):
+            self.start()
+            to_delete = set(self.to_delete)
+            rows = self.next_row()
+            if limit:
+                rows = islice(rows, limit)
+            self.shard_lines = deque()
+            self.parse_rows(self.shard_rows(rows, shard, shards))
+            self.shard_lines = None
+            self.end_shard()
+        return self.get_shard_state(to_delete - self.to_delete)
+
+    def shard_rows(self, rows, shard, shards):
+        for self.rows_read, row in enumerate(rows, 1):
+            if self.get_row_shard(row, shards) == shard:
+                self.shard_lines.append(self.rows_read)
+                yield row
+
+    def get_row_shard(self, row, shards):
+        """Rows are dealt to shards by a stable hash of their external id, so that all rows
+        of an object are parsed by the same shard. Other rows are dealt by blocks of shard_size."""
+        eid_val = None
+        if self.eid is not None:
+            warnings, self.warnings = self.warnings, {}
+            try:
+                self.get_eid_kwargs(row)
+                eid_val = self.eid_val
+            except (ImportError, DatabaseError):
+                pass
+            finally:
+                self.warnings = warnings
+        if eid_val is None:
+            return (self.rows_read - 1) // self.shard_size % shards
+        return int(md5(str(eid_val).encode()).hexdigest(), 16) % shards
+
+    def end_shard(self):
+        """Release resources at the end of a shard, which does not run end()"""
+        pass
+
+    def get_shard_state(self, kept):
+        """JSON serializable state of a shard, kept being objects to delete found in its rows"""
+        return {
+            'line': self.rows_read,
+            'nb_success': self.nb_success,
+            'nb_created': self.nb_created,
+            'nb_updated': self.nb_updated,
+            'nb_unmodified': self.nb_unmodified,
+            'warnings': {str(key): [str(msg) for msg in msgs] for key, msgs in self.warnings.items()},
+            'kept': sorted(kept),
+        }
+
+    def merge_shard_state(self, state):
+        self.line = max(self.line, state['line'])
+        self.nb_success += state['nb_success']
+        self.nb_created += state['nb_created']
+        self.nb_updated += state['nb_updated']
+        self.nb_unmodified += state['nb_unmodified']
+        for key, msgs in state['warnings'].items():
+            self.warnings.setdefault(key, []).extend(msgs)
+        self.to_delete.difference_update(state['kept'])
+
+    def merge_shards(self, states, to_delete, filename=None):
+        """Merge states returned by parse_shard() and run end() once, to_delete being
+        the result of prepare_shards()"""
+        if filename:
+            self.filename = filename
+        self.shards_to_delete = to_delete
+        with translation.override(self.get_language(), deactivate=True):
+            self.start()
+            for state in states:
+                self.merge_shard_state(state)
             self.end()
 
-    def request_or_retry(self, url, verb='get', **kwargs):
+    def read_ahead(self, rows):
+        buffer = deque()
+        for row in rows:
+            self.prefetch_row(row)
+            buffer.append(row)
+            if len(buffer) > self.lookahead:
+                yield buffer.popleft()
+        yield from buffer
+
+    def prefetch_row(self, row):
+        """Called on rows read ahead of parsing (see lookahead). Must not write to database nor report warnings."""
+        pass
+
+    def can_bulk_save(self):
+        """Objects can be written with bulk_create/bulk_update only if nothing expects them to be saved one by one"""
+        return ((self.eid is None or self.eid_field is not None)
+                and self.model.save is models.Model.save
+                and not self.model._meta.parents
+                and not signals.pre_save.has_listeners(self.model)
+                and not signals.post_save.has_listeners(self.model)
+                and type(self).parse_obj is Parser.parse_obj)
+
+    def request_or_retry(self, url, verb='get', session=None, extra_headers=None, **kwargs):
         try_get = settings.PARSER_NUMBER_OF_TRIES
         assert try_get > 0
+        headers = {**self.headers, **extra_headers} if extra_headers else self.headers
         while try_get:
-            action = getattr(requests, verb)
-            response = action(url, headers=self.headers, allow_redirects=True, **kwargs)
+            action = getattr(session or requests, verb)
+            response = action(url, headers=headers, allow_redirects=True, **kwargs)
             if response.status_code in settings.PARSER_RETRY_HTTP_STATUS:
                 logger.info("Failed to fetch url {}. Retrying ...".format(url))
                 sleep(settings.PARSER_RETRY_SLEEP_TIME)
                 try_get -= 1
             elif response.status_code == 200:
                 return response
+            elif response.status_code == 304 and 'If-None-Match' in headers:
+                return response
             else:
                 break
         logger.warning("Failed to fetch {} after {} times. Status code : {}.".format(url, settings.PARSER_NUMBER_OF_TRIES, response.status_code))
@@ -663,16 +1020,29 @@ class AtomParser(Parser):
 
 
 class AttachmentParserMixin:
+    """
+    download_workers: Number of threads downloading attachments. If set, attachments of next rows are checked
+                      while parsing current one, and files of an object are downloaded concurrently
+    """
     download_attachments = True
     base_url = ''
     delete_attachments = True
     filetype_name = "Photographie"
+    download_workers = 0
     non_fields = {
         'attachments': _("Attachments"),
     }
 
+    @property
+    def lookahead(self):
+        return 4 * self.download_workers
+
     def start(self):
         super().start()
+        self.download_local = threading.local()
+        self.download_connections = []
+        self.downloads = {}
+        self.source_validators = {}
         if settings.PAPERCLIP_ENABLE_LINK is False and self.download_attachments is False:
             raise Exception('You need to enable PAPERCLIP_ENABLE_LINK to use this function')
         try:
@@ -684,80 +1054,202 @@ class AttachmentParserMixin:
                 raise GlobalImportError(_("FileType '{name}' does not exists in "
                                           "Geotrek-Admin. Please add it").format(name=self.filetype_name))
         self.creator, created = get_user_model().objects.get_or_create(username='import', defaults={'is_active': False})
+        if self.download_workers:
+            self.download_executor = ThreadPoolExecutor(max_workers=self.download_workers)
+
+    def parse(self, filename=None, limit=None):
+        # Download threads are released even if parsing fails, end() not being run then
+        try:
+            super().parse(filename, limit)
+        finally:
+            self.close_downloads()
+
+    def parse_shard(self, shard, shards, filename=None, limit=None, to_delete=None):
+        try:
+            return super().parse_shard(shard, shards, filename, limit, to_delete)
+        finally:
+            self.close_downloads()
 
     def filter_attachments(self, src, val):
         if not val:
             return []
         return [(subval.strip(), '', '') for subval in val.split(self.separator) if subval.strip()]
 
-    def has_size_changed(self, url, attachment):
+    def get_download_local(self):
+        """Sessions and connections of current thread"""
+        if not hasattr(self, 'download_local'):
+            self.download_local = threading.local()
+            self.download_connections = []
+        return self.download_local
+
+    def get_download_session(self):
+        """Keep-alive HTTP session of current thread"""
+        local = self.get_download_local()
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+            self.download_connections.append(local.session)
+        return local.session
+
+    def get_ftp_connection(self, parsed_url):
+        """FTP connection of current thread to this host, opened once"""
+        local = self.get_download_local()
+        if not hasattr(local, 'ftp'):
+            local.ftp = {}
+        key = (parsed_url.hostname, parsed_url.port, parsed_url.username)
+        if key not in local.ftp:
+            ftp = FTP()
+            ftp.connect(parsed_url.hostname, parsed_url.port or 21)
+            ftp.login(user=parsed_url.username, passwd=parsed_url.password)
+            local.ftp[key] = ftp
+            self.download_connections.append(ftp)
+        return local.ftp[key]
+
+    def ftp_request(self, parsed_url, action):
+        """Run action(ftp, filename) in the directory of the file, reconnecting once if connection was lost"""
+        for retry in (True, False):
+            ftp = self.get_ftp_connection(parsed_url)
+            try:
+                ftp.cwd(dirname(parsed_url.path) or '/')
+                return action(ftp, parsed_url.path.split('/')[-1])
+            except ftp_errors as e:
+                self.get_download_local().ftp.pop((parsed_url.hostname, parsed_url.port, parsed_url.username))
+                if not retry:
+                    raise ValueImportError('Failed to load attachment: {exc}'.format(exc=e))
+
+    def fetch_headers(self, url, session=None):
+        """Returns remote file headers (size only for FTP)"""
         parsed_url = urlparse(url)
         if parsed_url.scheme == 'ftp':
-            directory = dirname(parsed_url.path)
+            return {'content-length': self.ftp_request(parsed_url, lambda ftp, filename: ftp.size(filename))}
+        try:
+            response = self.request_or_retry(url, verb='head', session=session)
+        except (requests.exceptions.ConnectionError, DownloadImportError) as e:
+            raise ValueImportError('Failed to load attachment: {exc}'.format(exc=e))
+        return response.headers
 
-            ftp = FTP(parsed_url.hostname)
-            ftp.login(user=parsed_url.username, passwd=parsed_url.password)
-            ftp.cwd(directory)
-            size = ftp.size(parsed_url.path.split('/')[-1:][0])
-            return size != attachment.attachment_file.size
+    def fetch_content(self, url):
+        """Returns remote file content and its headers, in a download thread"""
+        parsed_url = urlparse(url)
+        if parsed_url.scheme == 'ftp':
+            content = BytesIO()
+            self.ftp_request(parsed_url, lambda ftp, filename: ftp.retrbinary('RETR ' + filename, content.write))
+            return content.getvalue(), {}
+        try:
+            response = self.request_or_retry(url, session=self.get_download_session())
+        except (DownloadImportError, requests.exceptions.ConnectionError) as e:
+            raise ValueImportError('Failed to load attachment: {exc}'.format(exc=e))
+        return response.content, response.headers
+
+    def prefetch_download(self, verb, url):
+        if (verb, url) not in self.downloads:
+            if verb == 'head':
+                future = self.download_executor.submit(lambda: self.fetch_headers(url, self.get_download_session()))
+            else:
+                future = self.download_executor.submit(self.fetch_content, url)
+            self.downloads[(verb, url)] = future
+
+    def get_download(self, verb, url):
+        self.prefetch_download(verb, url)
+        return self.downloads[(verb, url)].result()
+
+    def get_source_validators(self, headers):
+        """ETag and Last-Modified headers, stored with attachments to detect changes of remote files"""
+        validators = {
+            'source_etag': headers.get('etag'),
+            'source_last_modified': headers.get('last-modified'),
+        }
+        return {key: value for key, value in validators.items() if isinstance(value, str)}
+
+    def has_source_changed(self, headers, attachment):
+        validators = self.get_source_validators(headers)
+        for field in ('source_etag', 'source_last_modified'):
+            if validators.get(field) and getattr(attachment, field, ''):
+                return validators[field] != getattr(attachment, field)
+        size = headers.get('content-length')
+        try:
+            return size is not None and int(size) != attachment.attachment_file.size
+        except FileNotFoundError:
+            return True
 
-        if parsed_url.scheme == 'http' or parsed_url.scheme == 'https':
-            try:
-                response = self.request_or_retry(url, verb='head')
-            except (requests.exceptions.ConnectionError, DownloadImportError) as e:
-                raise ValueImportError('Failed to load attachment: {exc}'.format(exc=e))
-            size = response.headers.get('content-length')
-            try:
-                return size is not None and int(size) != attachment.attachment_file.size
-            except FileNotFoundError:
-                pass
+    def get_source_changes(self, url, attachment):
+        """Returns whether the remote file of an attachment changed and, if not, its validators
+        differing from the stored ones (e.g. attachments imported before they were recorded)"""
+        parsed_url = urlparse(url)
+        if parsed_url.scheme not in ('ftp', 'http', 'https'):
+            return True, {}
+        if self.download_workers:
+            headers = self.get_download('head', url)
+        else:
+            headers = self.fetch_headers(url)
+        if self.has_source_changed(headers, attachment):
+            return True, {}
+        validators = self.get_source_validators(headers)
+        return False, {field: value for field, value in validators.items() if getattr(attachment, field) != value}
 
-        return True
+    def has_size_changed(self, url, attachment):
+        return self.get_source_changes(url, attachment)[0]
 
     def download_attachment(self, url):
         parsed_url = urlparse(url)
+        if parsed_url.scheme != 'ftp' and not self.download_attachments:
+            return None
+        if self.download_workers:
+            content, headers = self.get_download('get', url)
+            self.source_validators = self.get_source_validators(headers)
+            return content
         if parsed_url.scheme == 'ftp':
             try:
                 response = self.request_or_retry(url)
             except (DownloadImportError, requests.exceptions.ConnectionError) as e:
                 raise ValueImportError('Failed to load attachment: {exc}'.format(exc=e))
             return response.read()
-        else:
-            if self.download_attachments:
-                try:
-                    response = self.request_or_retry(url)
-                except (DownloadImportError, requests.exceptions.ConnectionError) as e:
-                    raise ValueImportError('Failed to load attachment: {exc}'.format(exc=e))
-                if response.status_code != requests.codes.ok:
-                    self.add_warning(_("Failed to download '{url}'").format(url=url))
-                    return None
-                return response.content
+        try:
+            response = self.request_or_retry(url)
+        except (DownloadImportError, requests.exceptions.ConnectionError) as e:
+            raise ValueImportError('Failed to load attachment: {exc}'.format(exc=e))
+        if response.status_code != requests.codes.ok:
+            self.add_warning(_("Failed to download '{url}'").format(url=url))
             return None
+        self.source_validators = self.get_source_validators(response.headers)
+        return response.content
+
+    def is_same_attachment(self, attachment, name):
+        """Whether an existing attachment was imported from a file with this name"""
+        upload_name, ext = os.path.splitext(attachment_upload(attachment, name))
+        existing_name = attachment.attachment_file.name
+        regexp = f"{upload_name}({random_suffix_regexp()})?(_[a-zA-Z0-9]{{7}})?{ext}"
+        return bool(re.search(r"^{regexp}$".format(regexp=regexp), existing_name))
 
     def check_attachment_updated(self, attachments_to_delete, updated, **kwargs):
         found = False
         for attachment in attachments_to_delete:
-            upload_name, ext = os.path.splitext(attachment_upload(attachment, kwargs.get('name')))
-            existing_name = attachment.attachment_file.name
-            regexp = f"{upload_name}({random_suffix_regexp()})?(_[a-zA-Z0-9]{{7}})?{ext}"
-            if re.search(r"^{regexp}$".format(regexp=regexp), existing_name) and not self.has_size_changed(kwargs.get('url'), attachment):
-                found = True
-                attachments_to_delete.remove(attachment)
-                if (
-                        kwargs.get('author') != attachment.author
-                        or kwargs.get('legend') != attachment.legend
-                        or kwargs.get('title') != attachment.title
-                ):
-                    attachment.author = kwargs.get('author')
-                    attachment.legend = textwrap.shorten(kwargs.get('legend'), width=127)
-                    attachment.title = textwrap.shorten(kwargs.get('title', ''), width=127)
-                    attachment.save(**{'skip_file_save': True})
-                    updated = True
-                break
+            if not self.is_same_attachment(attachment, kwargs.get('name')):
+                continue
+            changed, validators = self.get_source_changes(kwargs.get('url'), attachment)
+            if changed:
+                continue
+            found = True
+            attachments_to_delete.remove(attachment)
+            metadata_changed = (
+                kwargs.get('author') != attachment.author
+                or kwargs.get('legend') != attachment.legend
+                or kwargs.get('title') != attachment.title
+            )
+            if metadata_changed:
+                attachment.author = kwargs.get('author')
+                attachment.legend = textwrap.shorten(kwargs.get('legend'), width=127)
+                attachment.title = textwrap.shorten(kwargs.get('title', ''), width=127)
+                updated = True
+            for field, value in validators.items():
+                setattr(attachment, field, value)
+            if metadata_changed or validators:
+                attachment.save(**{'skip_file_save': True})
+            break
         return found, updated
 
     def generate_content_attachment(self, attachment, parsed_url, url, updated, name):
         if (parsed_url.scheme in ('http', 'https') and self.download_attachments) or parsed_url.scheme == 'ftp':
+            self.source_validators = {}
             content = self.download_attachment(url)
             if content is None:
                 return False, updated
@@ -805,6 +1297,8 @@ class AttachmentParserMixin:
                 return False, updated
             attachment.attachment_file.save(name, f, save=False)
             attachment.is_image = attachment.is_an_image()
+            for field, value in self.source_validators.items():
+                setattr(attachment, field, value)
         else:
             attachment.attachment_link = url
         return True, updated
@@ -824,6 +1318,25 @@ class AttachmentParserMixin:
         attachment.title = textwrap.shorten(kwargs.get('title'), width=127)
         return attachment
 
+    def close_downloads(self):
+        executor, self.download_executor = getattr(self, 'download_executor', None), None
+        if executor:
+            executor.shutdown(cancel_futures=True)
+        opened_connections, self.download_connections = getattr(self, 'download_connections', []), []
+        for opened in opened_connections:
+            try:
+                opened.close()
+            except ftp_errors:
+                pass
+
+    def end_shard(self):
+        self.close_downloads()
+        super().end_shard()
+
+    def end(self):
+        self.close_downloads()
+        super().end()
+
     def generate_attachments(self, src, val, attachments_to_delete, updated):
         attachments = []
         for attachment_data in self.filter_attachments(src, val):
@@ -847,10 +1360,57 @@ class AttachmentParserMixin:
             updated = True
         return updated, attachments
 
+    def prefetch_row(self, row):
+        """Check attachments of a row in download threads"""
+        super().prefetch_row(row)
+        if not self.download_workers or 'attachments' not in self.non_fields:
+            return
+        warnings, self.warnings = self.warnings, {}
+        try:
+            src = self.normalize_src(self.non_fields['attachments'])
+            val = self.get_val(row, 'attachments', src)
+            for attachment_data in self.filter_attachments(src, val):
+                url = self.base_url + attachment_data[0]
+                if urlparse(url).scheme in ('ftp', 'http', 'https'):
+                    self.prefetch_download('head', url)
+        except (RowImportError, ValueImportError, requests.exceptions.RequestException, OSError):
+            pass  # Errors are reported when parsing the row
+        finally:
+            self.warnings = warnings
+
+    def prefetch_attachments(self, src, val, attachments_to_delete):
+        """Start downloads of new or modified attachments of current object, returns their urls"""
+        urls = []
+        for attachment_data in self.filter_attachments(src, val):
+            url = self.base_url + attachment_data[0]
+            urls.append(url)
+            scheme = urlparse(url).scheme
+            if not (scheme == 'ftp' or scheme in ('http', 'https') and self.download_attachments):
+                continue
+            basename, ext = os.path.splitext(os.path.basename(url))
+            name = '%s%s' % (basename[:128], ext)
+            try:
+                if any(self.is_same_attachment(attachment, name) and not self.has_size_changed(url, attachment)
+                       for attachment in attachments_to_delete):
+                    continue
+            except ValueImportError:
+                continue  # Reported when generating attachments
+            self.prefetch_download('get', url)
+        return urls
+
     def save_attachments(self, src, val):
         updated = False
         attachments_to_delete = list(Attachment.objects.attachments_for_object(self.obj))
-        updated, attachments = self.generate_attachments(src, val, attachments_to_delete, updated)
+        if self.download_workers:
+            urls = self.prefetch_attachments(src, val, attachments_to_delete)
+            try:
+                updated, attachments = self.generate_attachments(src, val, attachments_to_delete, updated)
+            finally:
+                for url in urls:
+                    self.downloads.pop(('head', url), None)
+                    self.downloads.pop(('get', url), None)
+        else:
+            updated, attachments = self.generate_attachments(src, val, attachments_to_delete, updated)
         Attachment.objects.bulk_create(attachments)
         # TODO : attachments from parsers should be resized
         #  See https://github.com/makinacorpus/django-paperclip/blob/master/paperclip/models.py#L124
@@ -859,7 +1419,161 @@ class AttachmentParserMixin:
         return updated
 
 
-class TourInSoftParser(AttachmentParserMixin, Parser):
+class IncrementalParserMixin:
+    """
+    incremental: Remember a hash of imported rows, and skip rows unchanged since last import before any
+                 database work. Pages are requested with the ETag of their last version, and next page
+                 is fetched while parsing current one.
+    """
+    incremental = False
+
+    def get_sync_state_key(self):
+        return '{}.{}:{}'.format(type(self).__module__, type(self).__name__, self.provider or '')
+
+    def start(self):
+        super().start()
+        if not self.incremental:
+            return
+        self.sync_started = timezone.now()
+        self.sync_state, created = ParserSyncState.objects.get_or_create(parser=self.get_sync_state_key())
+        self.row_hashes = {}
+        self.pending_row_hashes = []
+        self.eid_field = self.get_eid_field() if self.eid else None
+        objects = self.model.objects.all()
+        if hasattr(self.model, 'provider') and self.provider is not None:
+            objects = objects.filter(provider__exact=self.provider)
+        self.existing_pks = set(objects.values_list('pk', flat=True))
+        # Parser configuration is part of rows hashes, so that changing it imports everything again
+        configuration = (self.fields, self.m2m_fields, self.constant_fields, self.m2m_constant_fields,
+                         self.non_fields, self.field_options)
+        self.configuration_hash = md5(repr(configuration).encode()).hexdigest()
+
+    def get_row_hash(self, row):
+        payload = json.dumps(row, sort_keys=True, default=str)
+        return md5((self.configuration_hash + payload).encode()).hexdigest()
+
+    def get_sync_key(self, eid_val):
+        eid_key = self.eid_key(eid_val)
+        return None if eid_key is None else str(eid_key)
+
+    def skip_unchanged_row(self, row):
+        """Returns True (and counts the row as unmodified) if row is the same as in last import"""
+        warnings, self.warnings = self.warnings, {}
+        try:
+            self.get_eid_kwargs(row)
+        except (RowImportError, ValueImportError):
+            return False
+        finally:
+            self.warnings = warnings
+        key = self.get_sync_key(self.eid_val)
+        entry = self.sync_state.row_hashes.get(key) if key is not None else None
+        if not entry or entry[0] != self.get_row_hash(row) or not entry[1] or not self.existing_pks.issuperset(entry[1]):
+            return False
+        self.line = self.next_line()
+        self.row_hashes[key] = entry
+        for pk in entry[1]:
+            self.to_delete.discard(pk)
+        self.nb_unmodified += len(entry[1])
+        self.nb_success += 1
+        if self.progress_cb:
+            self.progress_cb(float(self.line) / self.nb, self.line, self.eid_val)
+        return True
+
+    def parse_row(self, row):
+        if self.incremental and self.eid_field is not None and self.skip_unchanged_row(row):
+            return
+        super().parse_row(row)
+
+    def parse_obj_relations(self, row, operation, update_fields):
+        super().parse_obj_relations(row, operation, update_fields)
+        if not self.incremental or self.eid_field is None or not self.obj.pk:
+            return
+        key = self.get_sync_key(getattr(self.obj, self.eid))
+        if key is None:
+            return
+        if self.batch_size:
+            # Many-to-many relations of the chunk are not written yet
+            self.pending_row_hashes.append((self.line, key, self.get_row_hash(row), self.obj.pk))
+        else:
+            self.record_row_hash(self.line, key, self.get_row_hash(row), self.obj.pk)
+
+    def flush_m2m(self):
+        super().flush_m2m()
+        if not self.incremental:
+            return
+        pending_row_hashes, self.pending_row_hashes = self.pending_row_hashes, []
+        for line, key, row_hash, pk in pending_row_hashes:
+            self.record_row_hash(line, key, row_hash, pk)
+
+    def record_row_hash(self, line, key, row_hash, pk):
+        # Rows with warnings are parsed again next time
+        if _("Line {line}".format(line=line)) not in self.warnings:
+            self.row_hashes.setdefault(key, [row_hash, []])[1].append(pk)
+
+    def fetch_page(self, url, params=None):
+        """Returns decoded JSON page. In incremental mode, a page unchanged since last import is read from cache."""
+        kwargs = {'params': params} if params is not None else {}
+        if not self.incremental:
+            return self.request_or_retry(url, **kwargs).json()
+        cache_key = 'parser_page_{}'.format(md5((url + json.dumps(params, sort_keys=True)).encode()).hexdigest())
+        etag = self.sync_state.etags.get(cache_key)
+        cached = caches['fat'].get(cache_key) if etag else None
+        if cached is not None:
+            kwargs['extra_headers'] = {'If-None-Match': etag}
+        response = self.request_or_retry(url, **kwargs)
+        if response.status_code == 304:
+            return cached
+        root = response.json()
+        etag = response.headers.get('etag')
+        if isinstance(etag, str):
+            caches['fat'].set(cache_key, root)
+            self.sync_state.etags[cache_key] = etag
+        else:
+            self.sync_state.etags.pop(cache_key, None)
+        return root
+
+    def iter_pages(self, url, params, next_page):
+        """Yields decoded JSON pages, next_page(page) returns url and params of the following one (or None).
+        In incremental mode, next page is fetched in background while current one is parsed."""
+        if not self.incremental:
+            request = (url, params)
+            while request:
+                page = self.fetch_page(*request)
+                request = next_page(page)
+                yield page
+            return
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(self.fetch_page, url, params)
+            while future is not None:
+                page = future.result()
+                request = next_page(page)
+                future = executor.submit(self.fetch_page, *request) if request else None
+                yield page
+
+    def get_shard_state(self, kept):
+        state = super().get_shard_state(kept)
+        if self.incremental:
+            state['row_hashes'] = self.row_hashes
+        return state
+
+    def merge_shard_state(self, state):
+        super().merge_shard_state(state)
+        if self.incremental:
+            self.row_hashes.update(state['row_hashes'])
+
+    def end(self):
+        super().end()
+        if not self.incremental:
+            return
+        deleted = self.to_delete if self.delete else set()
+        row_hashes = {key: entry for key, entry in self.sync_state.row_hashes.items() if deleted.isdisjoint(entry[1])}
+        row_hashes.update(self.row_hashes)
+        self.sync_state.row_hashes = row_hashes
+        self.sync_state.last_sync = self.sync_started
+        self.sync_state.save()
+
+
+class TourInSoftParser(IncrementalParserMixin, AttachmentParserMixin, Parser):
     version_tourinsoft = 2
     separator = '#'
     separator2 = '|'
@@ -875,23 +1589,27 @@ class TourInSoftParser(AttachmentParserMixin, Parser):
             return int(self.root['odata.count'])
         return int(self.root['d']['__count'])
 
+    def get_page_params(self, skip):
+        return {
+            '$format': 'json',
+            '$inlinecount': 'allpages',
+            '$top': 1000,
+            '$skip': skip,
+        }
+
     def next_row(self):
         skip = 0
-        while True:
-            params = {
-                '$format': 'json',
-                '$inlinecount': 'allpages',
-                '$top': 1000,
-                '$skip': skip,
-            }
-            response = self.request_or_retry(self.url, params=params)
-            self.root = response.json()
+
+        def next_page(root):
+            nonlocal skip
+            self.root = root
+            skip += 1000
+            return (self.url, self.get_page_params(skip)) if skip < self.get_nb() else None
+
+        for self.root in self.iter_pages(self.url, self.get_page_params(0), next_page):
             self.nb = self.get_nb()
             for row in self.items:
                 yield {self.normalize_field_name(src): val for src, val in row.items()}
-            skip += 1000
-            if skip >= self.nb:
-                return
 
     def filter_attachments(self, src, val):
         if not val:
@@ -1085,10 +1803,9 @@ class LEIParser(AttachmentParserMixin, XmlParser):
             f'NOMENCLATURE/CRIT[@CLEF="{crit.attrib["CLEF_CRITERE"]}"]/MODAL[@CLEF="{crit.attrib["CLEF_MODA"]}"]'
         )
 
-    def start(self):
-        super().start()
+    def get_to_delete(self):
         lei = set(self.model.objects.filter(eid__startswith='LEI').values_list('pk', flat=True))
-        self.to_delete = self.to_delete & lei
+        return super().get_to_delete() & lei
 
     def filter_eid(self, src, val):
         return 'LEI' + val
@@ -1267,7 +1984,7 @@ class GeotrekAggregatorParser:
         return render_to_string('common/parser_report_aggregator.{output_format}'.format(output_format=output_format), context)
 
 
-class GeotrekParser(AttachmentParserMixin, Parser):
+class GeotrekParser(IncrementalParserMixin, AttachmentParserMixin, Parser):
     """
     url_categories: url of the categories in api v2 (example: 'category': '/api/v2/touristiccontent_category/')
     replace_fields: Replace fields which have not the same name in the api v2 compare to models (geom => geometry in api v2)
@@ -1394,8 +2111,7 @@ class GeotrekParser(AttachmentParserMixin, Parser):
         attachment.license = kwargs.get('license')
         return attachment
 
-    def start(self):
-        super().start()
+    def get_to_delete(self):
         kwargs = self.get_to_delete_kwargs()
         json_id_key = self.replace_fields.get('eid', 'id')
         params = {
@@ -1404,7 +2120,7 @@ class GeotrekParser(AttachmentParserMixin, Parser):
         }
         response = self.request_or_retry(self.next_url, params=params)
         ids = [f"{element[json_id_key]}" for element in response.json().get('results', [])]
-        self.to_delete = set(self.model.objects.filter(**kwargs).exclude(eid__in=ids).values_list('pk', flat=True))
+        return set(self.model.objects.filter(**kwargs).exclude(eid__in=ids).values_list('pk', flat=True))
 
     def filter_attachments(self, src, val):
         return [(subval.get('url'), subval.get('legend'), subval.get('author'), subval.get('license')) for subval in val]
@@ -1456,7 +2172,12 @@ class GeotrekParser(AttachmentParserMixin, Parser):
         updated_after = None
 
         available_fields = [field.name for field in self.model._meta.get_fields()]
-        if not self.all_datas and self.model.objects.filter(provider__exact=self.provider).exists() and 'date_update' in available_fields:
+        if self.all_datas:
+            pass
+        elif self.incremental and self.sync_state.last_sync:
+            # API filter is a date: overlap one day to not miss objects updated during last import
+            updated_after = (self.sync_state.last_sync - timedelta(days=1)).strftime('%Y-%m-%d')
+        elif self.model.objects.filter(provider__exact=self.provider).exists() and 'date_update' in available_fields:
             updated_after = self.model.objects.filter(provider__exact=self.provider).latest('date_update').date_update.strftime('%Y-%m-%d')
         params = {
             'in_bbox': ','.join([str(coord) for coord in self.bbox.extent]),
@@ -1464,17 +2185,11 @@ class GeotrekParser(AttachmentParserMixin, Parser):
             'updated_after': updated_after
         }
         self.params_used = params
-        response = self.request_or_retry(self.next_url, params=params)
-        self.root = response.json()
-        self.nb = int(self.root['count'])
 
-        for row in self.items:
-            yield row
-        self.next_url = self.root['next']
+        def next_page(root):
+            return (root['next'], None) if root['next'] else None
 
-        while self.next_url:
-            response = self.request_or_retry(self.next_url)
-            self.root = response.json()
+        for self.root in self.iter_pages(self.next_url, params, next_page):
             self.nb = int(self.root['count'])
 
             for row in self.items:
@@ -1511,7 +2226,7 @@ class GeotrekParser(AttachmentParserMixin, Parser):
                             source.pictogram.save(pictogram_filename, pictogram_file)
 
 
-class ApidaeBaseParser(Parser):
+class ApidaeBaseParser(IncrementalParserMixin, Parser):
     """Parser to import "anything" from APIDAE"""
     separator = None
     api_key = None
@@ -1530,26 +2245,28 @@ class ApidaeBaseParser(Parser):
             return []
         return self.root['objetsTouristiques']
 
+    def get_page_params(self):
+        params = {
+            'apiKey': self.api_key,
+            'projetId': self.project_id,
+            'selectionIds': [self.selection_id],
+            'count': self.size,
+            'first': self.skip,
+            'responseFields': self.responseFields
+        }
+        if self.locales:
+            params['locales'] = self.locales
+        return {'query': json.dumps(params)}
+
     def next_row(self):
-        while True:
-            params = {
-                'apiKey': self.api_key,
-                'projetId': self.project_id,
-                'selectionIds': [self.selection_id],
-                'count': self.size,
-                'first': self.skip,
-                'responseFields': self.responseFields
-            }
-            if self.locales:
-                params['locales'] = self.locales
-            response = self.request_or_retry(self.url, params={'query': json.dumps(params)})
-            self.root = response.json()
+        def next_page(root):
+            self.skip += self.size
+            return (self.url, self.get_page_params()) if self.skip < int(root['numFound']) else None
+
+        for self.root in self.iter_pages(self.url, self.get_page_params(), next_page):
             self.nb = int(self.root['numFound'])
             for row in self.items:
                 yield row
-            self.skip += self.size
-            if self.skip >= self.nb:
-                return
 
     def normalize_field_name(self, name):
         return name
@@ -2,7 +2,7 @@ import importlib
 
 from os.path import join
 import sys
-from celery import Task, shared_task, current_task
+from celery import Task, chord, shared_task, current_task
 from django.contrib.auth.models import User
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
@@ -26,7 +26,8 @@ class GeotrekImportTask(Task):
                 'exc_message': str(exc),
                 'filename': filename.split('/').pop(-1),
                 'parser': class_name,
-                'name': self.name
+                'name': self.name,
+                'parent': kwargs.get('parent'),
             }
         )
 
@@ -43,6 +44,91 @@ def get_parser_class(module_name, class_name):
     return getattr(module, class_name)
 
 
+def get_parser(kwargs, progress_cb=None):
+    Parser = get_parser_class(kwargs.get('module'), kwargs.get('name'))
+    user_pk = kwargs.get('user', None)
+    user = user_pk and User.objects.get(pk=user_pk)
+    if 'encoding' in kwargs:
+        return Parser(progress_cb=progress_cb, user=user, encoding=kwargs['encoding'])
+    return Parser(progress_cb=progress_cb, user=user)
+
+
+def get_source_name(kwargs):
+    filename = kwargs.get('filename')
+    return filename.split('/').pop(-1) if filename else _("Import from web.")
+
+
+def import_by_shards(parser, kwargs):
+    """
+    Split the import between parser.shards subtasks, then merge their results
+    and end the import in a last one.
+    """
+    to_delete = parser.prepare_shards(kwargs.get('filename'))
+    parent = current_task.request.id
+    kwargs = dict(kwargs, shards=parser.shards, parent=parent)
+    chord(import_shard.s(shard=shard, to_delete=to_delete, **kwargs) for shard in range(parser.shards))(
+        import_merge.s(to_delete=to_delete, **kwargs))
+    return {
+        'current': 0,
+        'total': 100,
+        'filename': get_source_name(kwargs),
+        'parser': kwargs.get('name'),
+        'name': current_task.name,
+        'shards': parser.shards,
+    }
+
+
+@shared_task(base=GeotrekImportTask, name='geotrek.common.import-shard')
+def import_shard(**kwargs):
+    shard = kwargs.get('shard')
+    shards = kwargs.get('shards')
+    parent = kwargs.get('parent')
+
+    def progress_cb(progress, line, eid):
+        current_task.update_state(
+            state='PROGRESS',
+            meta={
+                'current': int(100 * progress),
+                'total': 100,
+                'filename': get_source_name(kwargs),
+                'parser': kwargs.get('name'),
+                'name': current_task.name,
+                'parent': parent,
+                'shards': shards,
+            }
+        )
+
+    parser = get_parser(kwargs, progress_cb)
+    state = parser.parse_shard(shard, shards, kwargs.get('filename'), to_delete=kwargs.get('to_delete'))
+
+    return {
+        'current': 100,
+        'total': 100,
+        'filename': get_source_name(kwargs),
+        'parser': kwargs.get('name'),
+        'name': current_task.name,
+        'parent': parent,
+        'shards': shards,
+        'state': state,
+    }
+
+
+@shared_task(base=GeotrekImportTask, name='geotrek.common.import-merge')
+def import_merge(results, **kwargs):
+    parser = get_parser(kwargs)
+    parser.merge_shards([result['state'] for result in results], kwargs.get('to_delete'), kwargs.get('filename'))
+
+    return {
+        'current': 100,
+        'total': 100,
+        'filename': get_source_name(kwargs),
+        'parser': kwargs.get('name'),
+        'report': parser.report(output_format='html').replace('$celery_id', kwargs.get('parent')),
+        'name': current_task.name,
+        'parent': kwargs.get('parent'),
+    }
+
+
 @shared_task(base=GeotrekImportTask, name='geotrek.common.import-file')
 def import_datas(**kwargs):
     class_name = kwargs.get('name')
@@ -71,6 +157,8 @@ def import_datas(**kwargs):
 
     try:
         parser = Parser(progress_cb=progress_cb, user=user, encoding=encoding)
+        if parser.shards and parser.shards > 1:
+            return import_by_shards(parser, kwargs)
         parser.parse(filename)
     except Exception as e:
         raise e
@@ -111,6 +199,8 @@ def import_datas_from_web(**kwargs):
 
     try:
         parser = Parser(progress_cb=progress_cb, user=user)
+        if parser.shards and parser.shards > 1:
+            return import_by_shards(parser, kwargs)
         parser.parse()
     except Exception as e:
         raise e
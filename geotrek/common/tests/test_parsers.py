@@ -9,15 +9,17 @@ from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.core.management import call_command
 from django.core.management.base import CommandError
+from django.db.models.signals import m2m_changed
 from django.db.utils import DatabaseError
 from django.template.exceptions import TemplateDoesNotExist
 from django.test import TestCase
 from django.test.utils import override_settings
 from requests import Response
 
+from geotrek.authent.models import Structure
 from geotrek.authent.tests.factories import StructureFactory
-from geotrek.common.models import Attachment, FileType, Organism, RecordSource, Theme
-from geotrek.common.parsers import (AttachmentParserMixin, DownloadImportError,
+from geotrek.common.models import Attachment, FileType, Organism, ParserSyncState, RecordSource, Theme
+from geotrek.common.parsers import (ApidaeBaseParser, AttachmentParserMixin, DownloadImportError,
                                     ExcelParser, GeotrekAggregatorParser,
                                     GeotrekParser, OpenSystemParser,
                                     TourInSoftParser, TourismSystemParser,
@@ -25,8 +27,8 @@ from geotrek.common.parsers import (AttachmentParserMixin, DownloadImportError,
 from geotrek.common.tests.factories import ThemeFactory
 from geotrek.common.tests.mixins import GeotrekParserTestMixin
 from geotrek.common.utils.testdata import SVG_FILE, get_dummy_img
-from geotrek.trekking.models import POI, Trek
-from geotrek.trekking.parsers import GeotrekTrekParser
+from geotrek.trekking.models import POI, DifficultyLevel, Route, Trek
+from geotrek.trekking.parsers import GeotrekTrekParser, TrekParser
 from geotrek.trekking.tests.factories import TrekFactory
 
 
@@ -41,6 +43,14 @@ class OrganismEidParser(ExcelParser):
     eid = 'organism'
 
 
+class OrganismBatchedParser(OrganismEidParser):
+    batch_size = 10
+
+
+class TrekBatchedParser(TrekParser):
+    batch_size = 10
+
+
 class StructureExcelParser(ExcelParser):
     model = Organism
     fields = {
@@ -80,6 +90,10 @@ class WarnAttachmentParser(AttachmentParser):
     warn_on_missing_fields = True
 
 
+class ConcurrentAttachmentParser(AttachmentParser):
+    download_workers = 2
+
+
 class AttachmentLegendParser(AttachmentParser):
 
     def filter_attachments(self, src, val):
@@ -144,6 +158,29 @@ class ParserTests(TestCase):
         self.assertEqual(organisms[0].organism, "2.0")
         self.assertEqual(organisms[1].organism, "Comité Hippolyte")
 
+    def test_updated_with_eid_batched(self):
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        filename2 = os.path.join(os.path.dirname(__file__), 'data', 'organism2.xls')
+        parser = OrganismBatchedParser()
+        parser.parse(filename)
+        self.assertEqual((parser.nb_created, parser.nb_updated, parser.nb_unmodified), (1, 0, 0))
+        parser = OrganismBatchedParser()
+        parser.parse(filename2)
+        self.assertEqual(parser.nb_created, 1)
+        self.assertEqual(parser.nb_success, parser.nb_created + parser.nb_updated + parser.nb_unmodified)
+        organisms = Organism.objects.order_by('pk')
+        self.assertEqual(organisms[0].organism, "2.0")
+        self.assertEqual(organisms[1].organism, "Comité Hippolyte")
+
+    def test_batched_lookups_cached(self):
+        structure = StructureFactory.create(name="Foo")
+        parser = OrganismBatchedParser()
+        parser.lookup_cache = {}
+        with self.assertNumQueries(2):
+            for i in range(3):
+                self.assertEqual(parser.get_related(Structure, {'name': "Foo"}), (structure, False))
+                self.assertEqual(parser.get_related(Structure, {'name': "Bar"}), (None, False))
+
     def test_report_format_text(self):
         parser = OrganismParser()
         self.assertRegex(parser.report(), '0/0 lines imported.')
@@ -186,6 +223,46 @@ class ParserTests(TestCase):
         self.assertIn("Bad value 'Structure' for field STRUCTURE. Should contain ['foo']", output.getvalue())
 
 
+class BatchedM2MParserTests(TestCase):
+    filename = os.path.join('geotrek', 'trekking', 'tests', 'data', 'trek.shp')
+
+    @classmethod
+    def setUpTestData(cls):
+        DifficultyLevel.objects.create(difficulty="Facile")
+        Route.objects.create(route="Boucle")
+        cls.themes = (
+            Theme.objects.create(label="Littoral"),
+            Theme.objects.create(label="Marais"),
+        )
+        FileType.objects.create(type="Photographie")
+
+    def test_m2m_written_at_chunk_end(self):
+        TrekBatchedParser().parse(self.filename)
+        trek = Trek.objects.get(name="Balade")
+        self.assertQuerySetEqual(trek.themes.order_by('pk'), self.themes)
+
+    @mock.patch('geotrek.common.parsers.Parser.set_m2m')
+    def test_m2m_databaseerror_reported_on_object_line(self, mocked_set_m2m):
+        mocked_set_m2m.side_effect = DatabaseError('foo bar')
+        parser = TrekBatchedParser()
+        parser.parse(self.filename)
+        self.assertIn('foo bar', parser.warnings['Line 1'])
+        trek = Trek.objects.get(name="Balade")
+        self.assertFalse(trek.themes.exists())
+
+    def test_m2m_changed_sent_to_receivers(self):
+        actions = []
+
+        def receiver(sender, action, **kwargs):
+            actions.append(action)
+
+        m2m_changed.connect(receiver, sender=Trek.themes.through)
+        self.addCleanup(m2m_changed.disconnect, receiver, sender=Trek.themes.through)
+        TrekBatchedParser().parse(self.filename)
+        self.assertIn('post_add', actions)
+        self.assertQuerySetEqual(Trek.objects.get(name="Balade").themes.order_by('pk'), self.themes)
+
+
 class ThemeParser(ExcelParser):
     """Parser used in MultilangParserTests, using Theme because it has a translated field"""
     model = Theme
@@ -383,6 +460,63 @@ class AttachmentParserTests(TestCase):
         self.assertEqual(attachment.filetype.structure, None)
         self.assertTrue(os.path.exists(attachment.attachment_file.path), True)
 
+    @mock.patch('requests.Session.get')
+    @mock.patch('requests.Session.head')
+    def test_attachment_concurrent_download(self, mocked_head, mocked_get):
+        mocked_get.return_value.status_code = 200
+        mocked_get.return_value.content = get_dummy_img()
+        mocked_get.return_value.headers = {'etag': '"v1"'}
+        mocked_head.return_value.status_code = 200
+        mocked_head.return_value.headers = {'etag': '"v1"', 'content-length': '1'}
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        call_command('import', 'geotrek.common.tests.test_parsers.ConcurrentAttachmentParser', filename, verbosity=0)
+        attachment = Attachment.objects.get()
+        self.assertEqual(attachment.source_etag, '"v1"')
+        self.assertEqual(mocked_get.call_count, 1)
+        # Same ETag: not downloaded again, even if size differs
+        call_command('import', 'geotrek.common.tests.test_parsers.ConcurrentAttachmentParser', filename, verbosity=0)
+        self.assertEqual(mocked_get.call_count, 1)
+        self.assertEqual(Attachment.objects.get().pk, attachment.pk)
+        # New ETag: downloaded again
+        mocked_get.return_value.headers = mocked_head.return_value.headers = {'etag': '"v2"'}
+        call_command('import', 'geotrek.common.tests.test_parsers.ConcurrentAttachmentParser', filename, verbosity=0)
+        self.assertEqual(mocked_get.call_count, 2)
+        self.assertEqual(Attachment.objects.get().source_etag, '"v2"')
+
+    @mock.patch('requests.Session.get')
+    @mock.patch('requests.Session.head')
+    def test_attachment_validators_stored_without_download(self, mocked_head, mocked_get):
+        content = get_dummy_img()
+        mocked_get.return_value.status_code = 200
+        mocked_get.return_value.content = content
+        mocked_get.return_value.headers = {}
+        mocked_head.return_value.status_code = 200
+        mocked_head.return_value.headers = {'content-length': str(len(content))}
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        call_command('import', 'geotrek.common.tests.test_parsers.ConcurrentAttachmentParser', filename, verbosity=0)
+        self.assertEqual(Attachment.objects.get().source_etag, '')
+        # Same size, the ETag now sent by the server is stored with the attachment
+        mocked_head.return_value.headers = {'etag': '"v1"', 'content-length': str(len(content))}
+        call_command('import', 'geotrek.common.tests.test_parsers.ConcurrentAttachmentParser', filename, verbosity=0)
+        self.assertEqual(mocked_get.call_count, 1)
+        self.assertEqual(Attachment.objects.get().source_etag, '"v1"')
+
+    @mock.patch('geotrek.common.parsers.Parser.parse_row')
+    @mock.patch('geotrek.common.tests.test_parsers.ConcurrentAttachmentParser.filter_attachments')
+    def test_prefetch_does_not_hide_programming_errors(self, mocked_filter_attachments, mocked_parse_row):
+        mocked_filter_attachments.side_effect = TypeError('foo bar')
+        with self.assertRaisesMessage(TypeError, 'foo bar'):
+            ConcurrentAttachmentParser().parse(os.path.join(os.path.dirname(__file__), 'data', 'organism.xls'))
+
+    @mock.patch('geotrek.common.parsers.Parser.parse_rows')
+    def test_download_threads_released_when_parse_fails(self, mocked_parse_rows):
+        mocked_parse_rows.side_effect = RuntimeError('foo bar')
+        parser = ConcurrentAttachmentParser()
+        with mock.patch('geotrek.common.parsers.ThreadPoolExecutor') as mocked_executor:
+            with self.assertRaisesMessage(RuntimeError, 'foo bar'):
+                parser.parse(os.path.join(os.path.dirname(__file__), 'data', 'organism.xls'))
+        mocked_executor.return_value.shutdown.assert_called_once_with(cancel_futures=True)
+
     @mock.patch('requests.get')
     def test_attachment_with_no_filetype_photographie(self, mocked):
         self.filetype.delete()
@@ -561,6 +695,129 @@ class XMLParserTests(TestCase):
         self.assertEqual(Organism.objects.count(), 0)
 
 
+class OrganismApidaeParser(ApidaeBaseParser):
+    model = Organism
+    eid = 'organism'
+    fields = {'organism': 'nom'}
+    responseFields = ['nom']
+
+
+class OrganismApidaeIncrementalParser(OrganismApidaeParser):
+    incremental = True
+
+
+class OrganismApidaeIncrementalBatchedParser(OrganismApidaeIncrementalParser):
+    batch_size = 10
+
+
+class OrganismApidaeShardedParser(OrganismApidaeParser):
+    delete = True
+    shards = 2
+    shard_size = 1
+
+
+def mock_apidae_get(names):
+    def side_effect(url, headers=None, **kwargs):
+        response = Response()
+        if headers.get('If-None-Match') == '"{}"'.format(len(names)):
+            response.status_code = 304
+            return response
+        response.status_code = 200
+        response.headers['ETag'] = '"{}"'.format(len(names))
+        response._content = json.dumps({
+            'numFound': len(names),
+            'objetsTouristiques': [{'nom': name} for name in names],
+        }).encode()
+        return response
+    return side_effect
+
+
+class IncrementalParserTests(TestCase):
+    @mock.patch('requests.get')
+    def test_unchanged_rows_skipped(self, mocked_get):
+        mocked_get.side_effect = mock_apidae_get(["Foo", "Bar"])
+        parser = OrganismApidaeIncrementalParser()
+        parser.parse()
+        self.assertEqual(parser.nb_created, 2)
+        self.assertIsNotNone(ParserSyncState.objects.get().last_sync)
+        parser = OrganismApidaeIncrementalParser()
+        with mock.patch('geotrek.common.parsers.Parser.parse_obj') as mocked_parse_obj:
+            parser.parse()
+        mocked_parse_obj.assert_not_called()
+        self.assertEqual((parser.nb_success, parser.nb_unmodified), (2, 2))
+        self.assertEqual(mocked_get.call_args.kwargs['headers']['If-None-Match'], '"2"')
+        self.assertEqual(Organism.objects.count(), 2)
+
+    @mock.patch('requests.get')
+    def test_changed_rows_parsed(self, mocked_get):
+        mocked_get.side_effect = mock_apidae_get(["Foo"])
+        OrganismApidaeIncrementalParser().parse()
+        mocked_get.side_effect = mock_apidae_get(["Foo", "Bar"])
+        parser = OrganismApidaeIncrementalParser()
+        parser.parse()
+        self.assertEqual((parser.nb_created, parser.nb_unmodified), (1, 1))
+        self.assertEqual(len(ParserSyncState.objects.get().row_hashes), 2)
+
+    @mock.patch('requests.get')
+    def test_rows_parsed_again_when_chunk_m2m_fail(self, mocked_get):
+        def flush_m2m_failing_on_first_line(parser):
+            parser.line = 1
+            parser.add_warning("Cannot write relations")
+
+        mocked_get.side_effect = mock_apidae_get(["Foo", "Bar"])
+        with mock.patch('geotrek.common.parsers.Parser.flush_m2m', autospec=True,
+                        side_effect=flush_m2m_failing_on_first_line):
+            OrganismApidaeIncrementalBatchedParser().parse()
+        self.assertEqual(len(ParserSyncState.objects.get().row_hashes), 1)
+        parser = OrganismApidaeIncrementalBatchedParser()
+        parser.parse()
+        self.assertEqual((parser.nb_success, parser.nb_unmodified), (2, 2))
+        self.assertEqual(len(ParserSyncState.objects.get().row_hashes), 2)
+
+
+class ShardedParserTests(TestCase):
+    @mock.patch('requests.get')
+    def test_shards_merged(self, mocked_get):
+        mocked_get.side_effect = mock_apidae_get(["Foo", "Bar", "Baz"])
+        deleted = Organism.objects.create(organism="Old")
+        kept = Organism.objects.create(organism="Bar")
+        to_delete = OrganismApidaeShardedParser().prepare_shards()
+        self.assertEqual(to_delete, sorted([deleted.pk, kept.pk]))
+        states = []
+        for shard in range(2):
+            parser = OrganismApidaeShardedParser()
+            states.append(json.loads(json.dumps(parser.parse_shard(shard, 2, to_delete=to_delete))))
+        self.assertEqual(sum(state['nb_success'] for state in states), 3)
+        self.assertEqual(sorted(pk for state in states for pk in state['kept']), [kept.pk])
+        self.assertTrue(Organism.objects.filter(pk=deleted.pk).exists())
+        parser = OrganismApidaeShardedParser()
+        parser.merge_shards(states, to_delete)
+        self.assertEqual((parser.line, parser.nb_success, parser.nb_created), (3, 3, 2))
+        self.assertFalse(Organism.objects.filter(pk=deleted.pk).exists())
+        self.assertEqual(list(Organism.objects.order_by('organism').values_list('organism', flat=True)),
+                         ["Bar", "Baz", "Foo"])
+
+    @mock.patch('requests.get')
+    def test_rows_of_same_object_in_one_shard(self, mocked_get):
+        mocked_get.side_effect = mock_apidae_get(["Foo", "Foo", "Bar", "Baz"])
+        states = []
+        for shard in range(2):
+            parser = OrganismApidaeShardedParser()
+            states.append(parser.parse_shard(shard, 2))
+        self.assertEqual(sum(state['nb_success'] for state in states), 4)
+        self.assertEqual(Organism.objects.filter(organism="Foo").count(), 1)
+
+    @mock.patch('requests.get')
+    def test_merge_does_not_compute_objects_to_delete_again(self, mocked_get):
+        mocked_get.side_effect = mock_apidae_get(["Foo"])
+        deleted = Organism.objects.create(organism="Old")
+        parser = OrganismApidaeShardedParser()
+        with mock.patch.object(OrganismApidaeShardedParser, 'get_to_delete') as mocked_get_to_delete:
+            parser.merge_shards([], [deleted.pk])
+        mocked_get_to_delete.assert_not_called()
+        self.assertFalse(Organism.objects.filter(pk=deleted.pk).exists())
+
+
 class TourInSoftParserTests(TestCase):
 
     def test_attachment(self):
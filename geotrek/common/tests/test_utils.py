@@ -1,11 +1,16 @@
 import os
+import zipfile
 from shutil import copy as copyfile
+from tempfile import TemporaryDirectory
 
 from django.conf import settings
 from django.contrib.gis.geos import Point
 from django.test import SimpleTestCase, TestCase
 from django.test.utils import override_settings
 
+from landez.sources import DownloadError
+
+from ..helpers_sync import TileStore, ZipTilesBuilder, lines_coverage
 from ..parsers import Parser
 from ..utils import (format_coordinates, simplify_coords, spatial_reference,
                      uniquify)
@@ -99,6 +104,101 @@ class SimplifyCoordsTest(TestCase):
             simplify_coords(arg_value)
 
 
+class LinesCoverageTest(SimpleTestCase):
+    def test_point_covers_tiles_around(self):
+        self.assertSetEqual(lines_coverage([((0.0, 0.0, 100.0), )], 0.01, 10),
+                            {(10, 511, 511), (10, 511, 512), (10, 512, 511), (10, 512, 512)})
+
+    def test_tiles_between_distant_vertices(self):
+        self.assertSetEqual(lines_coverage([((0.01, 45.0), (1.0, 45.0))], 0.001, 10),
+                            {(10, 512, 368), (10, 513, 368), (10, 514, 368)})
+
+    def test_all_lines_covered(self):
+        self.assertSetEqual(lines_coverage([((0.01, 45.0), ), ((1.0, 45.0), )], 0.001, 10),
+                            {(10, 512, 368), (10, 514, 368)})
+
+    def test_tms_scheme(self):
+        self.assertSetEqual(lines_coverage([((0.01, 45.0), )], 0.001, 10, 'tms'), {(10, 512, 655)})
+
+
+class FileTilesSource:
+    """ Tiles read from a local {z}/{x}/{y}.png tree """
+    _tile_extension = '.png'
+
+    def __init__(self, path):
+        self.path = path
+        self.fetched = []
+
+    def tile(self, tile):
+        self.fetched.append(tile)
+        try:
+            with open(os.path.join(self.path, '{}/{}/{}.png'.format(*tile)), 'rb') as f:
+                return f.read()
+        except OSError:
+            raise DownloadError()
+
+
+@override_settings(MOBILE_TILES_EXTENSION=None)
+class ZipTilesBuilderTest(SimpleTestCase):
+    def setUp(self):
+        self.source_dir = TemporaryDirectory()
+        self.store_dir = TemporaryDirectory()
+        for tile, content in (((1, 0, 0), b'land'), ((1, 0, 1), b'sea'), ((1, 1, 1), b'sea')):
+            os.makedirs(os.path.join(self.source_dir.name, '{}/{}'.format(*tile)), exist_ok=True)
+            with open(os.path.join(self.source_dir.name, '{}/{}/{}.png'.format(*tile)), 'wb') as f:
+                f.write(content)
+        self.source = FileTilesSource(self.source_dir.name)
+
+    def tearDown(self):
+        self.source_dir.cleanup()
+        self.store_dir.cleanup()
+
+    def build_zip(self, store, tiles):
+        with TemporaryDirectory() as zip_dir:
+            with zipfile.ZipFile(os.path.join(zip_dir, 'tiles.zip'), 'w') as zfile:
+                builder = ZipTilesBuilder(zfile, prefix='tiles/', tiles_manager=self.source, store=store, workers=2)
+                builder.tiles = set(tiles)
+                builder.run()
+                return {name: zfile.read(name) for name in zfile.namelist()}, builder.failed_tiles
+
+    def test_tiles_fetched_once(self):
+        store = TileStore(self.store_dir.name, source='file')
+        files, failed = self.build_zip(store, [(1, 0, 0), (1, 0, 1), (1, 1, 0)])
+        self.assertDictEqual(files, {'tiles/1/0/0.png': b'land', 'tiles/1/0/1.png': b'sea'})
+        self.assertSetEqual(failed, {(1, 1, 0)})
+        files, failed = self.build_zip(TileStore(self.store_dir.name, source='file'), [(1, 0, 1), (1, 1, 1)])
+        self.assertDictEqual(files, {'tiles/1/0/1.png': b'sea', 'tiles/1/1/1.png': b'sea'})
+        self.assertCountEqual(self.source.fetched, [(1, 0, 0), (1, 0, 1), (1, 1, 0), (1, 1, 1)])
+        # Identical tiles are stored once
+        self.assertEqual(sum(len(names) for root, dirs, names in os.walk(os.path.join(self.store_dir.name, 'objects'))), 2)
+
+    def test_expired_tiles_fetched_again(self):
+        self.build_zip(TileStore(self.store_dir.name, source='file', expiry=0), [(1, 0, 0)])
+        files, failed = self.build_zip(TileStore(self.store_dir.name, source='file', expiry=0), [(1, 0, 0)])
+        self.assertDictEqual(files, {'tiles/1/0/0.png': b'land'})
+        self.assertEqual(self.source.fetched, [(1, 0, 0), (1, 0, 0)])
+
+    def test_stores_by_source(self):
+        self.build_zip(TileStore(self.store_dir.name, source='file'), [(1, 0, 0)])
+        self.assertIsNone(TileStore(self.store_dir.name, source='other').get((1, 0, 0)))
+        self.assertEqual(TileStore(self.store_dir.name, source='file').get((1, 0, 0)), b'land')
+
+    def test_purge_deletes_unindexed_contents(self):
+        self.build_zip(TileStore(self.store_dir.name, source='file'), [(1, 0, 0), (1, 0, 1)])
+        self.build_zip(TileStore(self.store_dir.name, source='other'), [(1, 1, 1)])
+        store = TileStore(self.store_dir.name, source='file', expiry=3600)
+        os.utime(store.index_path((1, 0, 0)), (0, 0))
+        for root, dirs, names in os.walk(store.objects_dir):
+            for name in names:
+                os.utime(os.path.join(root, name), (0, 0))
+        # Land is only indexed by the expired tile, sea is still indexed by both sources
+        self.assertEqual(store.purge(), 1)
+        self.assertIsNone(store.get((1, 0, 0)))
+        self.assertEqual(store.get((1, 0, 1)), b'sea')
+        self.assertEqual(TileStore(self.store_dir.name, source='other').get((1, 1, 1)), b'sea')
+        self.assertEqual(sum(len(names) for root, dirs, names in os.walk(store.objects_dir)), 1)
+
+
 class UtilsParsersTest(SimpleTestCase):
     def test_add_http_prefix_without_prefix(self):
         self.assertEqual('http://test.com', add_http_prefix('test.com'))
@@ -1,3 +1,4 @@
+import json
 import os
 import shutil
 import tempfile
@@ -14,6 +15,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
 from django.test.utils import override_settings
 from django.urls import reverse
+from django_celery_results.models import TaskResult
 from mapentity.tests import SuperUserFactory
 from mapentity.tests.factories import UserFactory
 from mapentity.views.generic import MapEntityList
@@ -176,6 +178,24 @@ class ViewsImportTest(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
 
+    @mock.patch('geotrek.common.views.celery_app.control.inspect')
+    def test_import_update_shards_progress(self, mocked_inspect):
+        mocked_inspect.return_value.reserved.return_value = None
+        meta = {'total': 100, 'filename': 'organism.xls', 'parser': 'OrganismParser', 'parent': 'parent-id', 'shards': 2}
+        TaskResult.objects.create(task_id='parent-id', status='SUCCESS', result=json.dumps(
+            dict(meta, current=0, name='geotrek.common.import-file', parent=None)))
+        TaskResult.objects.create(task_id='shard-1', status='PROGRESS', result=json.dumps(
+            dict(meta, current=50, name='geotrek.common.import-shard')))
+        TaskResult.objects.create(task_id='shard-2', status='SUCCESS', result=json.dumps(
+            dict(meta, current=100, name='geotrek.common.import-shard')))
+        response = self.client.get(reverse('common:import_update_json'))
+        self.assertEqual(response.json(), [{
+            'id': 'parent-id',
+            'result': {'current': 75, 'total': 100, 'filename': 'organism.xls', 'parser': 'OrganismParser',
+                       'name': 'geotrek.common.import-shard'},
+            'status': 'PROGRESS',
+        }])
+
     def test_import_from_file_good_zip_file(self):
         self.client.force_login(user=self.super_user)
 
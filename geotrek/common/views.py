@@ -247,20 +247,44 @@ def import_view(request):
     return render(request, 'common/import_dataset.html', render_dict)
 
 
+def merge_import_shards(shards):
+    """Progress of an import split between shards, from the results of its subtasks"""
+    for task, json_results in shards:
+        if task.status == 'FAILURE' or json_results['name'].endswith('import-merge'):
+            return {'result': json_results, 'status': task.status}
+    json_results = shards[0][1]
+    progress = sum(json_results['current'] for task, json_results in shards) // json_results['shards']
+    return {
+        'result': {
+            'current': progress,
+            'total': 100,
+            'filename': json_results['filename'],
+            'parser': json_results['parser'],
+            'name': json_results['name'],
+        },
+        'status': 'PROGRESS',
+    }
+
+
 @login_required
 def import_update_json(request):
-    results = []
+    results = {}
+    shards = {}
     threshold = timezone.now() - timedelta(seconds=60)
     for task in TaskResult.objects.filter(date_done__gte=threshold).order_by('date_done'):
         json_results = json.loads(task.result)
         if json_results.get('name', '').startswith('geotrek.common'):
-            results.append(
-                {
-                    'id': task.task_id,
-                    'result': json_results or {'current': 0, 'total': 0},
-                    'status': task.status
-                }
-            )
+            if json_results.get('parent'):
+                shards.setdefault(json_results['parent'], []).append((task, json_results))
+                continue
+            results[task.task_id] = {
+                'id': task.task_id,
+                'result': json_results or {'current': 0, 'total': 0},
+                'status': task.status
+            }
+    for parent, tasks in shards.items():
+        results[parent] = dict(merge_import_shards(tasks), id=parent)
+    results = list(results.values())
     i = celery_app.control.inspect(['celery@geotrek'])
     try:
         reserved = i.reserved()
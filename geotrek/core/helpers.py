@@ -0,0 +1,60 @@
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+
+
+class TopologyHelper:
+    @classmethod
+    def update_flagged_geometries(cls):
+        """ Recompute geometry of topologies flagged with geom_need_update,
+        returns the number of updated topologies.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT update_geometry_of_flagged_topologies()")
+            return cursor.fetchone()[0]
+
+    @classmethod
+    @contextmanager
+    def deferred_geometries(cls):
+        """ Within this block, path and path aggregation triggers only flag
+        impacted topologies, and each of them is recomputed once when leaving it
+        (instead of once per modified path or aggregation row).
+        """
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT current_setting('geotrek.deferred_topology_geom', true)")
+                previous = cursor.fetchone()[0] or 'off'
+                cursor.execute("SELECT set_config('geotrek.deferred_topology_geom', 'on', true)")
+            yield
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT set_config('geotrek.deferred_topology_geom', %s, true)", [previous])
+            if previous != 'on':
+                cls.update_flagged_geometries()
+
+
+class PathHelper:
+    @classmethod
+    def update_flagged_elevations(cls):
+        """ Drape paths flagged with an empty geom_3d, returns the number of updated paths.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT update_elevation_of_flagged_paths()")
+            return cursor.fetchone()[0]
+
+    @classmethod
+    @contextmanager
+    def deferred_elevations(cls):
+        """ Within this block, inserted or modified paths are not draped, and all of them
+        are draped once when leaving it. Topologies use the elevation of their paths, so
+        their geometries should be deferred too (see TopologyHelper.deferred_geometries()).
+        """
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT current_setting('geotrek.deferred_path_elevation', true)")
+                previous = cursor.fetchone()[0] or 'off'
+                cursor.execute("SELECT set_config('geotrek.deferred_path_elevation', 'on', true)")
+            yield
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT set_config('geotrek.deferred_path_elevation', %s, true)", [previous])
+            if previous != 'on':
+                cls.update_flagged_elevations()
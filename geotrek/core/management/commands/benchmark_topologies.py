@@ -0,0 +1,81 @@
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.contrib.gis.geos import LineString
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from geotrek.core.helpers import TopologyHelper
+from geotrek.core.models import Path, PathAggregation, Topology
+
+
+class Command(BaseCommand):
+    help = """
+    Measure path split and path update costs on a synthetic dense network,
+    with topologies geometries updated immediately and deferred.
+    Nothing is kept in database.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=10,
+                            help="Number of rows and columns of the paths grid (default 10)")
+        parser.add_argument('--step', type=float, default=100,
+                            help="Length of each path of the grid, in meters (default 100)")
+
+    def create_network(self, size, step):
+        """ Noded grid of paths, and one topology along each row of the grid """
+        xmin, ymin = settings.SPATIAL_EXTENT[:2]
+        rows = []
+        for i in range(size):
+            row = []
+            for j in range(size - 1):
+                row.append(Path.objects.create(geom=LineString(
+                    (xmin + j * step, ymin + i * step), (xmin + (j + 1) * step, ymin + i * step), srid=settings.SRID)))
+                Path.objects.create(geom=LineString(
+                    (xmin + i * step, ymin + j * step), (xmin + i * step, ymin + (j + 1) * step), srid=settings.SRID))
+            rows.append(row)
+        for row in rows:
+            topology = Topology.objects.create(kind='TOPOLOGY')
+            PathAggregation.objects.bulk_create([
+                PathAggregation(topo_object=topology, path=path, start_position=0, end_position=1, order=order)
+                for order, path in enumerate(row)
+            ])
+        return rows
+
+    def split_paths(self, size, step):
+        """ Insert a path crossing every row, splitting one path per topology """
+        xmin, ymin = settings.SPATIAL_EXTENT[:2]
+        Path.objects.create(geom=LineString(
+            (xmin + step / 2, ymin - step / 2), (xmin + step / 2, ymin + (size - 1) * step + step / 2), srid=settings.SRID))
+
+    def update_paths(self, rows, step):
+        """ Update geometry of all paths of a topology with one statement """
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE core_path SET geom = ST_Segmentize(geom, %s) WHERE id = ANY(%s)",
+                           [step / 4, [path.pk for path in rows[0]]])
+
+    def measure(self, operation, deferred):
+        sid = transaction.savepoint()
+        start = time.perf_counter()
+        with TopologyHelper.deferred_geometries() if deferred else nullcontext():
+            operation()
+        duration = time.perf_counter() - start
+        transaction.savepoint_rollback(sid)
+        return duration
+
+    def handle(self, *args, **options):
+        size, step = options['size'], options['step']
+        verbosity = options['verbosity']
+        with transaction.atomic():
+            start = time.perf_counter()
+            rows = self.create_network(size, step)
+            if verbosity >= 1:
+                self.stdout.write("Network of {} paths and {} topologies created in {:.2f}s".format(
+                    2 * size * (size - 1), size, time.perf_counter() - start))
+            for label, operation in (("Path split", lambda: self.split_paths(size, step)),
+                                     ("Path update", lambda: self.update_paths(rows, step))):
+                immediate = self.measure(operation, deferred=False)
+                deferred = self.measure(operation, deferred=True)
+                self.stdout.write("{}: {:.3f}s immediate, {:.3f}s deferred".format(label, immediate, deferred))
+            transaction.set_rollback(True)
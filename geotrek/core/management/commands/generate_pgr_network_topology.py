@@ -10,4 +10,4 @@ class Command(BaseCommand):
     """
 
     def handle(self, *args, **options):
-        PathRouter()  # PathRouter's init method builds the network topology
+        PathRouter().set_path_network_topology()
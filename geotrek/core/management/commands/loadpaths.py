@@ -1,11 +1,12 @@
 from django.contrib.gis.gdal import DataSource, GDALException
+from geotrek.core.helpers import PathHelper, TopologyHelper
 from geotrek.core.models import Path
 from geotrek.authent.models import Structure
 from django.contrib.gis.geos.collections import Polygon, LineString
 from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
 from django.db.utils import IntegrityError, InternalError
-from django.db import transaction
+from django.db import connection, transaction
 
 
 class Command(BaseCommand):
@@ -29,6 +30,9 @@ class Command(BaseCommand):
         parser.add_argument('--dry', '-d', action='store_true', dest='dry', default=False,
                             help="Do not change the database, dry run. Show the number of fail"
                                  " and objects potentially created")
+        parser.add_argument('--bulk', '-b', action='store_true', dest='bulk', default=False,
+                            help="Send all paths to the database at once, and compute their elevation and"
+                                 " the geometries of impacted topologies once for all of them")
 
     def handle(self, *args, **options):
         verbosity = options.get('verbosity')
@@ -41,6 +45,7 @@ class Command(BaseCommand):
         comments_columns = options.get('comment')
         fail = options.get('fail')
         dry = options.get('dry')
+        bulk = options.get('bulk')
 
         if dry:
             fail = True
@@ -69,6 +74,7 @@ class Command(BaseCommand):
 
         sid = transaction.savepoint()
 
+        paths = []
         for layer in ds:
             for feat in layer:
                 name = feat.get(name_column) if name_column in layer.fields else ''
@@ -85,24 +91,19 @@ class Command(BaseCommand):
                 self.check_srid(srid, geom)
                 geom.dim = 2
                 if self.should_import(feat, geom):
-                    try:
-                        with transaction.atomic():
-                            comment_final = '</br>'.join(comment_final_tab)
-                            path = Path.objects.create(name=name,
-                                                       structure=structure,
-                                                       geom=geom,
-                                                       comments=comment_final)
-                        counter += 1
-                        if verbosity > 0:
-                            self.stdout.write('Create path with pk : {}'.format(path.pk))
-                        if verbosity > 1:
-                            self.stdout.write("The comment %s was added on %s" % (comment_final, name))
-                    except (IntegrityError, InternalError):
-                        if fail:
-                            counter_fail += 1
-                            self.stdout.write('Integrity Error on path : {}, {}'.format(name, geom))
-                        else:
-                            raise
+                    paths.append((name, '</br>'.join(comment_final_tab), geom))
+
+        create_paths = self.create_paths_in_bulk if bulk else self.create_paths
+        for (name, comment_final, geom), pk in zip(paths, create_paths(paths, structure, fail)):
+            if pk is not None:
+                counter += 1
+                if verbosity > 0:
+                    self.stdout.write('Create path with pk : {}'.format(pk))
+                if verbosity > 1:
+                    self.stdout.write("The comment %s was added on %s" % (comment_final, name))
+            else:
+                counter_fail += 1
+                self.stdout.write('Integrity Error on path : {}, {}'.format(name, geom))
         if not dry:
             transaction.savepoint_commit(sid)
             if verbosity >= 2:
@@ -113,6 +114,36 @@ class Command(BaseCommand):
             self.stdout.write(self.style.NOTICE(
                 "{0} objects will be create, {1} objects failed;".format(counter, counter_fail)))
 
+    def create_paths(self, paths, structure, fail):
+        """ Create paths one by one, yield their pk, or None if they failed and fail is True """
+        for name, comment_final, geom in paths:
+            try:
+                with transaction.atomic():
+                    path = Path.objects.create(name=name,
+                                               structure=structure,
+                                               geom=geom,
+                                               comments=comment_final)
+            except (IntegrityError, InternalError):
+                if not fail:
+                    raise
+                path = None
+            yield path and path.pk
+
+    def create_paths_in_bulk(self, paths, structure, fail):
+        """ Create paths with one query, return their pk, or None if they failed and fail is True.
+        Paths are still snapped and split one after the other, in the same order, so that
+        the resulting network is the same as with create_paths().
+        """
+        if not paths:
+            return []
+        names, comments, geoms = zip(*paths)
+        with TopologyHelper.deferred_geometries(), PathHelper.deferred_elevations():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT ft_load_paths(%s, %s::text[], %s::text[], %s::geometry[], %s)",
+                               [structure.pk, [name if name is None else str(name) for name in names],
+                                list(comments), [geom.hexewkb.decode() for geom in geoms], fail])
+                return cursor.fetchone()[0]
+
     def check_srid(self, srid, geom):
         if not geom.srid:
             geom.srid = srid
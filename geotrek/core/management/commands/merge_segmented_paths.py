@@ -1,6 +1,7 @@
 from datetime import datetime
 from time import sleep
 
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.db import connection, transaction
 
@@ -11,125 +12,103 @@ class Command(BaseCommand):
     help = 'Find and merge Paths that are splitted in several segments\n'
 
     def add_arguments(self, parser):
-        parser.add_argument('--sleeptime', '-d', action='store', dest='sleeptime', default=0.25,
-                            help="Time to wait between merges (SQL triggers take time)")
-
-    def extract_neighbourgs_graph(self, number_of_neighbourgs, extremities=[]):
-        # Get all neighbours for each path
-        neighbours = dict()
+        parser.add_argument('--sleeptime', '-d', action='store', dest='sleeptime', type=float, default=0,
+                            help="Time to wait between merges of two chains of paths")
+
+    def extract_path_nodes(self):
+        """ Return start and end nodes of each path, endpoints closer than snapping distances
+        being grouped as one node.
+        """
+        distance = max(settings.PATH_SNAPPING_DISTANCE, settings.PATH_MERGE_SNAPPING_DISTANCE)
+        path_nodes = dict()
         with connection.cursor() as cursor:
-            cursor.execute('''select id1, array_agg(id2) from
-                        (select p1.id as id1, p2.id as id2
-                        from core_path p1, core_path p2
-                        where st_touches(p1.geom, p2.geom) and (p1.id != p2.id)
-                        group by p1.id, p2.id
-                        order by p1.id) a
-                        group by id1;''')
-
-            for path_id, path_neighbours_ids in cursor.fetchall():
-                if path_id not in extremities and len(path_neighbours_ids) == number_of_neighbourgs:
-                    neighbours[path_id] = path_neighbours_ids
-        return neighbours
-
-    def try_merge(self, a, b):
-        if {a, b} in self.discarded:
-            self.stdout.write(f"├ Already discarded {a} and {b}")
-            return False
-        success = 2
+            cursor.execute('''select id, side, st_clusterdbscan(point, eps := %s, minpoints := 1) over () from
+                        (select id, 0 as side, st_startpoint(geom) as point from core_path
+                        union all
+                        select id, 1 as side, st_endpoint(geom) as point from core_path) endpoints;''',
+                           [distance])
+            for path_id, side, node in cursor.fetchall():
+                path_nodes.setdefault(path_id, [None, None])[side] = node
+        return path_nodes
+
+    def extract_chains(self):
+        """ Return chains of paths linked by nodes shared by exactly two paths, each chain being
+        a list of (path id, reversed) in chain order, its lowest path id not reversed.
+        """
+        path_nodes = self.extract_path_nodes()
+        node_endpoints = dict()
+        for path_id, nodes in path_nodes.items():
+            for side, node in enumerate(nodes):
+                node_endpoints.setdefault(node, []).append((path_id, side))
+
+        def next_endpoint(path_id, side):
+            """ Endpoint of the path linked to the given endpoint, if their node is a simple link """
+            endpoints = node_endpoints[path_nodes[path_id][side]]
+            if len(endpoints) != 2 or endpoints[0][0] == endpoints[1][0]:
+                return None
+            return endpoints[1] if endpoints[0] == (path_id, side) else endpoints[0]
+
+        chains = []
+        visited = set()
+        for path_id in sorted(path_nodes):
+            if path_id in visited:
+                continue
+            # Walk backward to the beginning of the chain, entering each path by its start (side 0)
+            # or its end (side 1)
+            first, entry = path_id, 0
+            previous = next_endpoint(first, entry)
+            while previous and previous[0] != path_id:
+                first, entry = previous[0], 1 - previous[1]
+                previous = next_endpoint(first, entry)
+            if previous:
+                # Ring made of segments, start it with its lowest path
+                first, entry = path_id, 0
+            # Walk forward to the end of the chain
+            chain = []
+            current = (first, entry)
+            while current and current[0] not in visited:
+                visited.add(current[0])
+                chain.append((current[0], current[1] == 1))
+                current = next_endpoint(current[0], 1 - current[1])
+            if len(chain) < 2:
+                continue
+            kept, kept_reversed = min(chain)
+            if kept_reversed:
+                chain = [(pk, not reverse) for pk, reverse in reversed(chain)]
+            chains.append(chain)
+        return chains
+
+    def merge_chain(self, chain):
+        """ Merge a chain of paths into its lowest path id, return the number of merged paths """
+        ids = [pk for pk, reverse in chain]
+        kept = min(ids)
+        others = ', '.join(str(pk) for pk in ids if pk != kept)
         try:
-            patha = Path.include_invisible.get(pk=a)
-            pathb = Path.include_invisible.get(pk=b)
-            with transaction.atomic():
-                success = patha.merge_path(pathb)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("SELECT ft_merge_path_chain(%s, %s);", [ids, [reverse for pk, reverse in chain]])
+                merges = cursor.fetchone()[0]
         except Exception:
-            self.stdout.write(f"├ Cannot merge {a} and {b}")
-            self.discarded.append({a, b})
-            return False
-        if success == 2 or success == 0:
-            self.stdout.write(f"├ Cannot merge {a} and {b}")
-            self.discarded.append({a, b})
-            return False
-        else:
-            self.stdout.write(f"├ Merged {b} into {a}")
-            sleep(self.sleeptime)
-            return True
-
-    def merge_paths_with_one_neighbour(self):
-        self.stdout.write("┌ STEP 1")
-        neighbours_graph = self.extract_neighbourgs_graph(1)
-        successes = 0
-        fails = 0
-        while len(neighbours_graph) > fails:
-            fails = 0
-            for path, neighbours in neighbours_graph.items():
-                success = self.try_merge(path, neighbours[0])
-                if success:
-                    successes += 1
-                else:
-                    fails += 1
-            neighbours_graph = self.extract_neighbourgs_graph(1)
-        return successes
-
-    def merge_paths_with_two_neighbours(self):
-        self.stdout.write("┌ STEP 2")
-        successes = 0
-        neighbours_graph = self.extract_neighbourgs_graph(2)
-        mergeables = list(neighbours_graph.keys())
-        fails = 0
-        while len(mergeables) > fails:
-            fails = 0
-            for (a, neighbours) in neighbours_graph.items():
-                b = neighbours[0]
-                success = self.try_merge(a, b)
-                if success:
-                    successes += 1
-                else:
-                    fails += 1
-            neighbours_graph = self.extract_neighbourgs_graph(2)
-            mergeables = neighbours_graph.keys()
-        return successes
-
-    def merge_paths_with_three_neighbours(self):
-        self.stdout.write("┌ STEP 3")
-        successes = 0
-        neighbours_graph = self.extract_neighbourgs_graph(3)
-        mergeables = list(neighbours_graph.keys())
-        extremities = []
-        while len(mergeables) > len(extremities):
-            for (a, neighbours) in neighbours_graph.items():
-                failed_neighbours = 0
-                for n in neighbours:
-                    success = self.try_merge(a, n)
-                    if success:
-                        successes += 1
-                    else:
-                        failed_neighbours += 1
-                    if failed_neighbours == 3:
-                        extremities.append(a)
-            neighbours_graph = self.extract_neighbourgs_graph(3, extremities=extremities)
-            mergeables = list(neighbours_graph.keys())
-        return successes
+            merges = 0
+        if not merges:
+            self.stdout.write(f"├ Cannot merge {others} into {kept}")
+            return 0
+        self.stdout.write(f"├ Merged {others} into {kept}")
+        sleep(self.sleeptime)
+        return merges
 
     def handle(self, *args, **options):
         self.sleeptime = options.get('sleeptime')
         total_successes = 0
-        self.discarded = []
         paths_before = Path.include_invisible.count()
 
         self.stdout.write("\n")
         self.stdout.write(str(datetime.now()))
 
-        first_step_successes = self.merge_paths_with_one_neighbour()
-        self.stdout.write(f"└ {first_step_successes} merges")
-        total_successes += first_step_successes
-
-        second_step_successes = self.merge_paths_with_two_neighbours()
-        self.stdout.write(f"└ {second_step_successes} merges")
-        total_successes += second_step_successes
-
-        third_step_successes = self.merge_paths_with_three_neighbours()
-        self.stdout.write(f"└ {third_step_successes} merges")
-        total_successes += third_step_successes
+        chains = self.extract_chains()
+        self.stdout.write(f"┌ {len(chains)} chains of segmented paths")
+        for chain in chains:
+            total_successes += self.merge_chain(chain)
+        self.stdout.write(f"└ {total_successes} merges")
 
         paths_after = Path.include_invisible.count()
         self.stdout.write(f"\n--- RAN {total_successes} MERGES - FROM {paths_before} TO {paths_after} PATHS ---\n")
@@ -6,12 +6,11 @@ import simplekml
 import uuid
 from django.conf import settings
 from django.contrib.gis.db import models
-from django.contrib.gis.db.models.functions import Distance
 from django.contrib.gis.geos import Point, fromstr, LineString, GEOSGeometry
 from django.contrib.postgres.indexes import GistIndex
 from django.core.mail import mail_managers
 from django.db import connection, connections, DEFAULT_DB_ALIAS
-from django.db.models import ProtectedError
+from django.db.models import ProtectedError, Q
 from django.db.models.query import QuerySet
 from django.db.models.signals import pre_delete
 from django.dispatch import receiver
@@ -26,8 +25,9 @@ from geotrek.core.managers import PathManager, PathInvisibleManager, TopologyMan
     TrailManager
 from geotrek.common.mixins.models import (TimeStampedModelMixin, NoDeleteMixin, AddPropertyMixin,
                                           CheckBoxActionMixin, GeotrekMapEntityMixin)
+from geotrek.common.functions import DistanceKNN
 from geotrek.common.utils import classproperty, simplify_coords, sqlfunction, uniquify
-from geotrek.zoning.mixins import ZoningPropertiesMixin
+from geotrek.zoning.mixins import TopologyZoningPropertiesMixin, ZoningPropertiesMixin
 from mapentity.serializers import plain_text
 
 logger = logging.getLogger(__name__)
@@ -153,7 +153,58 @@ class Path(CheckBoxActionMixin, ZoningPropertiesMixin, AddPropertyMixin, Geotrek
         qs = cls.objects.exclude(draft=True)
         if exclude:
             qs = qs.exclude(pk=exclude.pk)
-        return qs.exclude(visible=False).annotate(distance=Distance('geom', point)).order_by('distance')[0]
+        return qs.exclude(visible=False).annotate(distance=DistanceKNN('geom', point)).order_by('distance')[0]
+
+    @classmethod
+    def snap_many(cls, points, snaps=None):
+        """
+        Returns the closest path, the position ([0.0-1.0]) and the offset (distance)
+        along this path of each point, as a list of (path, position, offset).
+        All points are snapped with one KNN query.
+        ``snaps`` optionally gives for each point the pk of the path it must
+        be snapped on (the offset is then 0).
+        Will fail if no path in database.
+        """
+        if not points:
+            return []
+        if snaps is None:
+            snaps = [None] * len(points)
+        values = []
+        params = []
+        for i, (point, snap) in enumerate(zip(points, snaps)):
+            if point.srid != settings.SRID:
+                point = point.transform(settings.SRID, clone=True)
+            values.append('(%s, %s::geometry, %s::integer)')
+            params.extend([i, point.ewkt, snap])
+        sql = """
+        SELECT point.index, closest.id, interpolated.position, interpolated.distance
+        FROM (VALUES {values}) AS point (index, geom, snap)
+        CROSS JOIN LATERAL (
+            (SELECT id, geom FROM {table} WHERE id = point.snap)
+            UNION ALL
+            (SELECT id, geom FROM {table}
+             WHERE point.snap IS NULL AND draft = FALSE AND visible = TRUE
+             ORDER BY geom <-> point.geom
+             LIMIT 1)
+        ) AS closest
+        CROSS JOIN LATERAL ST_InterpolateAlong(closest.geom, point.geom)
+             AS interpolated (position FLOAT, distance FLOAT)
+        """.format(values=', '.join(values), table=cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            snapped = {index: (pk, position, distance) for index, pk, position, distance in cursor.fetchall()}
+        paths = cls.objects.in_bulk({pk for pk, position, distance in snapped.values()})
+        result = []
+        for i, snap in enumerate(snaps):
+            if i not in snapped:
+                if snap is not None:
+                    raise cls.DoesNotExist("Path %s does not exist" % snap)
+                raise IndexError("No path to snap on")
+            pk, position, offset = snapped[i]
+            if pk not in paths:
+                raise cls.DoesNotExist("Path %s does not exist" % pk)
+            result.append((paths[pk], position, 0 if snap is not None else offset))
+        return result
 
     @classmethod
     def check_path_not_overlap(cls, geom, pk):
@@ -370,7 +421,7 @@ class Path(CheckBoxActionMixin, ZoningPropertiesMixin, AddPropertyMixin, Geotrek
         return None
 
 
-class Topology(ZoningPropertiesMixin, AddPropertyMixin, AltimetryMixin,
+class Topology(TopologyZoningPropertiesMixin, AddPropertyMixin, AltimetryMixin,
                TimeStampedModelMixin, NoDeleteMixin, ClusterableModel):
     paths = models.ManyToManyField(Path, through='PathAggregation', verbose_name=_("Path"))
     offset = models.FloatField(default=0.0, verbose_name=_("Offset"))  # in SRID units
@@ -394,6 +445,8 @@ class Topology(ZoningPropertiesMixin, AddPropertyMixin, AltimetryMixin,
         indexes = [
             GistIndex(name='topology_geom_gist_idx', fields=['geom']),
             GistIndex(name='topology_geom_3d_gist_idx', fields=['geom_3d']),
+            # flagged topologies are looked up by update_geometry_of_flagged_topologies()
+            models.Index(name='topology_geom_need_update_idx', fields=['id'], condition=Q(geom_need_update=True)),
         ]
 
     def __init__(self, *args, **kwargs):
@@ -627,29 +680,47 @@ class Topology(ZoningPropertiesMixin, AddPropertyMixin, AltimetryMixin,
         Receives a point (lng, lat) with API_SRID, and returns
         a topology objects with a computed path aggregation.
         """
-        # Find closest path
         point = Point(lng, lat, srid=settings.API_SRID)
-        point.transform(settings.SRID)
-        if snap is None:
-            closest = Path.closest(point)
-            position, offset = closest.interpolate(point)
-        else:
-            closest = Path.objects.get(pk=snap)
-            position, offset = closest.interpolate(point)
-            offset = 0
-        # We can now instantiante a Topology object
-        topology = Topology(kind=kind, offset=offset)
-        aggr = PathAggregation(
-            topo_object=topology,
-            path=closest,
-            start_position=position,
-            end_position=position
-        )
-        topology.aggregations = [aggr]
-        closest.aggregations.add(aggr)
-        point = Point(point.x, point.y, srid=settings.SRID)
-        topology.geom = point
-        return topology
+        return cls._topologypoints([point], kind, snaps=[snap])[0]
+
+    @classmethod
+    def _topologypoints(cls, points, kind=None, snaps=None):
+        """
+        Receives a list of points, and returns for each one a topology
+        object with a computed path aggregation.
+        All points are snapped on their closest path at once.
+        """
+        points = [point.transform(settings.SRID, clone=True) for point in points]
+        topologies = []
+        for point, (closest, position, offset) in zip(points, Path.snap_many(points, snaps)):
+            # We can now instantiante a Topology object
+            topology = Topology(kind=kind, offset=offset)
+            aggr = PathAggregation(
+                topo_object=topology,
+                path=closest,
+                start_position=position,
+                end_position=position
+            )
+            topology.aggregations = [aggr]
+            closest.aggregations.add(aggr)
+            topology.geom = Point(point.x, point.y, srid=settings.SRID)
+            topologies.append(topology)
+        return topologies
+
+    @classmethod
+    def deserialize_points(cls, geometries):
+        """
+        Returns a point topology for each Point of ``geometries``
+        (``None`` for other geometry types), snapping them all with one query.
+        Used to import many point objects at once.
+        """
+        points = {}
+        for i, geometry in enumerate(geometries):
+            if geometry is not None and geometry.geom_type == 'Point':
+                geometry = getattr(geometry, 'geos', geometry)  # OGR geometries
+                points[i] = Point(geometry.x, geometry.y, srid=geometry.srid)
+        topologies = dict(zip(points.keys(), cls._topologypoints(list(points.values()))))
+        return [topologies.get(i) for i in range(len(geometries))]
 
     @classmethod
     def deserialize(cls, serialized):
@@ -728,6 +799,11 @@ class Topology(ZoningPropertiesMixin, AddPropertyMixin, AltimetryMixin,
         offset = objdict[0].get('offset', 0.0)
         topology = Topology(kind='TMP', offset=offset)
         try:
+            # Fetch all paths at once
+            pks = {int(pk) for subtopology in objdict for pk in subtopology['paths']}
+            paths_by_pk = Path.objects.in_bulk(pks)
+            if len(paths_by_pk) != len(pks):
+                raise Path.DoesNotExist("Paths %s do not exist" % sorted(pks - set(paths_by_pk)))
             counter = 0
             for j, subtopology in enumerate(objdict):
                 last_topo = j == len(objdict) - 1
@@ -740,7 +816,8 @@ class Topology(ZoningPropertiesMixin, AddPropertyMixin, AltimetryMixin,
                     # Javascript hash keys are parsed as a string
                     idx = str(i)
                     start_position, end_position = positions.get(idx, (0.0, 1.0))
-                    path = Path.objects.get(pk=path)
+                    start_position, end_position = float(start_position), float(end_position)
+                    path = paths_by_pk[int(path)]
                     aggr = PathAggregation(
                         path=path,
                         topo_object=topology,
@@ -782,7 +859,7 @@ class Topology(ZoningPropertiesMixin, AddPropertyMixin, AltimetryMixin,
                         path.aggregations.add(aggr)
                     counter += 1
                 topology.aggregations.add(*aggrs)
-        except (AssertionError, ValueError, KeyError, Path.DoesNotExist) as e:
+        except (AssertionError, ValueError, KeyError, TypeError, Path.DoesNotExist) as e:
             raise ValueError("Invalid serialized topology : %s" % e)
         return topology
 
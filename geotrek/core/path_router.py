@@ -1,17 +1,233 @@
+import heapq
 import json
+import math
+import threading
 
 from django.db import connection
 from django.conf import settings
-from django.contrib.gis.geos import GEOSGeometry, Point, LineString, MultiLineString, GeometryCollection
+from django.contrib.gis.geos import GEOSGeometry, Point, MultiLineString, GeometryCollection
 
-from geotrek.common.utils import sqlfunction
-from .models import Path
 
+class PathGraph:
+    """
+    In-memory routing graph of the paths network.
+
+    Vertices are the paths ends, merged when they are closer than
+    ``PATH_SNAPPING_DISTANCE``, and edges are the routable paths (not draft
+    and visible), weighted by their length. The graph is loaded once per
+    worker and refreshed incrementally when paths are created, updated or
+    deleted (see ``PathGraph.get()``). The graph being shared by the threads
+    of a worker, it is only read or modified under ``_lock``.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    edges_sql = """
+        SELECT
+            id,
+            ST_Length(geom),
+            ST_X(ST_StartPoint(geom)),
+            ST_Y(ST_StartPoint(geom)),
+            ST_X(ST_EndPoint(geom)),
+            ST_Y(ST_EndPoint(geom)),
+            draft = false AND visible = true,
+            date_update
+        FROM core_path
+    """
 
-class PathRouter:
     def __init__(self):
-        self.set_path_network_topology()
+        self.edges = {}  # path id -> (source vertex, target vertex, length)
+        self.vertices = []  # vertex id -> (x, y)
+        self.adjacency = {}  # vertex id -> {path id: (neighbour vertex, length)}
+        self.vertex_ids = {}  # grid cell -> vertex ids
+        self.updates = {}  # path id -> date_update of the loaded path
+        self.state = None
+        self.tolerance = settings.PATH_SNAPPING_DISTANCE or 1e-6
+
+    @classmethod
+    def get(cls):
+        """ Returns the worker's graph, loaded or refreshed if paths changed """
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+                cls._instance.load()
+            else:
+                cls._instance.refresh()
+            return cls._instance
+
+    def _state(self):
+        """ Summary of the paths table, which changes whenever a path is created, updated or deleted,
+        whatever the order in which transactions are committed.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*), MAX(date_update), SUM(EXTRACT(EPOCH FROM date_update)) FROM core_path")
+            return cursor.fetchone()
+
+    def load(self):
+        """ Loads the whole paths network """
+        self.__init__()
+        self.state = self._state()
+        with connection.cursor() as cursor:
+            cursor.execute(self.edges_sql)
+            for row in cursor.fetchall():
+                self._set_edge(*row)
+
+    def refresh(self):
+        """ Reloads only the paths modified since the last (re)load """
+        state = self._state()
+        if state == self.state:
+            return
+        with connection.cursor() as cursor:
+            # A path committed late can have an older date_update than the latest loaded one,
+            # so paths are compared one by one rather than with the latest date_update.
+            cursor.execute("SELECT id, date_update FROM core_path")
+            updates = dict(cursor.fetchall())
+            for edge_id in set(self.updates) - set(updates):
+                self._remove_edge(edge_id)
+                del self.updates[edge_id]
+            changed_ids = [edge_id for edge_id, date_update in updates.items()
+                           if self.updates.get(edge_id) != date_update]
+            if changed_ids:
+                cursor.execute(self.edges_sql + " WHERE id = ANY(%s)", [changed_ids])
+                for row in cursor.fetchall():
+                    self._set_edge(*row)
+        self.state = state
+
+    def vertex(self, x, y):
+        """ Returns the id of the vertex at (x, y), creating it if needed.
+        Vertices are stored in a grid of tolerance sized cells, so that the closest vertex
+        within the tolerance is found in the cell of (x, y) or in one of its neighbours.
+        """
+        cell_x, cell_y = math.floor(x / self.tolerance), math.floor(y / self.tolerance)
+        closest_id, closest_distance = None, self.tolerance
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for vertex_id in self.vertex_ids.get((cell_x + dx, cell_y + dy), ()):
+                    vertex_x, vertex_y = self.vertices[vertex_id]
+                    distance = math.hypot(vertex_x - x, vertex_y - y)
+                    if distance <= closest_distance:
+                        closest_id, closest_distance = vertex_id, distance
+        if closest_id is None:
+            closest_id = len(self.vertices)
+            self.vertex_ids.setdefault((cell_x, cell_y), []).append(closest_id)
+            self.vertices.append((x, y))
+            self.adjacency[closest_id] = {}
+        return closest_id
+
+    def _set_edge(self, edge_id, length, x1, y1, x2, y2, routable=True, date_update=None):
+        self._remove_edge(edge_id)
+        self.updates[edge_id] = date_update
+        if not routable:
+            return
+        source, target = self.vertex(x1, y1), self.vertex(x2, y2)
+        self.edges[edge_id] = (source, target, length)
+        self.adjacency[source][edge_id] = (target, length)
+        self.adjacency[target][edge_id] = (source, length)
+
+    def _remove_edge(self, edge_id):
+        edge = self.edges.pop(edge_id, None)
+        if edge is not None:
+            source, target, length = edge
+            self.adjacency[source].pop(edge_id, None)
+            self.adjacency[target].pop(edge_id, None)
+
+    def edge(self, edge_id):
+        """
+        Returns (source vertex, target vertex, length) of a path, even if it is
+        not routable (e.g. a draft path used as a route step), or None if the
+        path does not exist anymore.
+        """
+        edge = self.edges.get(edge_id)
+        if edge is None:
+            with connection.cursor() as cursor:
+                cursor.execute(self.edges_sql + " WHERE id = %s", [edge_id])
+                row = cursor.fetchone()
+            if row is None:
+                # Deleted since the last refresh
+                self._remove_edge(edge_id)
+                self.updates.pop(edge_id, None)
+                return None
+            edge_id, length, x1, y1, x2, y2, routable, date_update = row
+            edge = (self.vertex(x1, y1), self.vertex(x2, y2), length)
+        return edge
+
+    def shortest_path(self, from_step, to_step):
+        """
+        A* search between two points located on paths.
+        Parameters:
+            from_step: {edge_id: int, fraction: float}
+            to_step: {edge_id: int, fraction: float}
+        Returns a list of (edge_id, start fraction, end fraction), or None if
+        there is no route between the two points.
+        """
+        with self._lock:
+            return self._shortest_path(from_step, to_step)
+
+    def _shortest_path(self, from_step, to_step):
+        start_edge, end_edge = from_step['edge_id'], to_step['edge_id']
+        fraction_start, fraction_end = float(from_step['fraction']), float(to_step['fraction'])
+        start, end = self.edge(start_edge), self.edge(end_edge)
+        if start is None or end is None:
+            return None
+        start_source, start_target, start_length = start
+        end_source, end_target, end_length = end
+
+        # The start point is linked to both ends of its edge, and the end point
+        # can be reached from both ends of its edge.
+        initial = {
+            start_source: (fraction_start * start_length, 0.0),
+            start_target: ((1 - fraction_start) * start_length, 1.0),
+        }
+        final = {
+            end_source: (fraction_end * end_length, 0.0),
+            end_target: ((1 - fraction_end) * end_length, 1.0),
+        }
+        goals = [(self.vertices[vertex], cost) for vertex, (cost, fraction) in final.items()]
+
+        def heuristic(vertex):
+            # Straight distance to an end vertex never exceeds the remaining route length
+            x, y = self.vertices[vertex]
+            return min(math.hypot(goal_x - x, goal_y - y) + cost for (goal_x, goal_y), cost in goals)
+
+        costs = {}
+        previous = {}  # vertex -> (previous vertex, edge id, start fraction, end fraction)
+        queue = []
+        for vertex, (cost, fraction) in initial.items():
+            if cost < costs.get(vertex, math.inf):
+                costs[vertex] = cost
+                previous[vertex] = (None, start_edge, fraction_start, fraction)
+                heapq.heappush(queue, (cost + heuristic(vertex), cost, vertex))
+
+        best_cost, best_vertex = math.inf, None
+        while queue:
+            estimate, cost, vertex = heapq.heappop(queue)
+            if estimate >= best_cost:
+                break
+            if cost > costs[vertex]:
+                continue
+            if vertex in final and cost + final[vertex][0] < best_cost:
+                best_cost, best_vertex = cost + final[vertex][0], vertex
+            for edge_id, (neighbour, length) in self.adjacency[vertex].items():
+                new_cost = cost + length
+                if new_cost < costs.get(neighbour, math.inf):
+                    costs[neighbour] = new_cost
+                    source = self.edges[edge_id][0]
+                    fractions = (0.0, 1.0) if source == vertex and neighbour != vertex else (1.0, 0.0)
+                    previous[neighbour] = (vertex, edge_id) + fractions
+                    heapq.heappush(queue, (new_cost + heuristic(neighbour), new_cost, neighbour))
+
+        if best_vertex is None:
+            return None
+        route = [(end_edge, final[best_vertex][1], fraction_end)]
+        vertex = best_vertex
+        while vertex is not None:
+            vertex, edge_id, fraction_from, fraction_to = previous[vertex]
+            route.append((edge_id, fraction_from, fraction_to))
+        route.reverse()
+        return route
+
 
+class PathRouter:
     def set_path_network_topology(self):
         """ Builds or updates the paths graph (pgRouting network topology) """
         cursor = connection.cursor()
@@ -37,9 +253,9 @@ class PathRouter:
         self.steps_topo = [
             {
                 'edge_id': step.get('path_id'),
-                'fraction': self.get_step_fraction(step)
+                'fraction': fraction
             }
-            for step in steps
+            for step, fraction in zip(steps, self.get_steps_fractions(steps))
         ]
         line_strings, serialized_topology = self.compute_all_steps_routes()
         if line_strings == []:
@@ -51,261 +267,97 @@ class PathRouter:
 
         return {'geojson': geojson, 'serialized': serialized_topology}
 
-    def get_step_fraction(self, step):
+    def get_steps_fractions(self, steps):
         """
-        For one step on a path, returns its position on the path.
+        For all steps on a path, returns their positions on their path, in one query.
         """
-        # Transform the point to the right SRID
-        point = Point(step.get('lng'), step.get('lat'), srid=settings.API_SRID)
-        point.transform(settings.SRID)
-        # Get the closest path
-        closest_path = Path.objects.get(pk=step.get('path_id'))
-        # Get which fraction of the Path this point is on
-        closest_path_geom = f"'{closest_path.geom}'"
-        point_geom = f"'{point.ewkt}'"
-        fraction_of_distance = sqlfunction('SELECT ST_LineLocatePoint',
-                                           closest_path_geom, point_geom)[0]
-        return fraction_of_distance
+        values = []
+        params = []
+        for i, step in enumerate(steps):
+            # Transform the point to the right SRID
+            point = Point(step.get('lng'), step.get('lat'), srid=settings.API_SRID)
+            point.transform(settings.SRID)
+            values.append('(%s, %s, %s::geometry)')
+            params.extend([i, step.get('path_id'), point.ewkt])
+        # Get which fraction of the Path each point is on
+        query = """
+            SELECT ST_LineLocatePoint(core_path.geom, step.geom)
+            FROM (VALUES {}) AS step (index, path_id, geom)
+            JOIN core_path ON core_path.id = step.path_id
+            ORDER BY step.index
+        """.format(', '.join(values))
+        with connection.cursor() as cursor:
+            cursor.execute(query, params)
+            return [fraction for fraction, in cursor.fetchall()]
 
     def compute_all_steps_routes(self):
         """
         Returns the whole route's geometries and topology. Both of them is an array
         with each element being a sub-route from one step to another.
+        All sub-routes are computed in one pass on the paths graph, then all their
+        geometries are fetched with one query.
         """
-        all_steps_geometries = []  # Each elem is a linestring from one step to another
-        all_steps_topologies = []  # Each elem is the topology from one step to another
+        graph = PathGraph.get()
+        all_steps_routes = []  # Each elem is the list of (edge_id, start, end) from one step to another
         # Compute the shortest path for each pair of adjacent steps
         for i in range(len(self.steps_topo) - 1):
             from_step = self.steps_topo[i]
             to_step = self.steps_topo[i + 1]
+            if from_step.get('edge_id') == to_step.get('edge_id'):
+                # If both points are on same edge, split it from the 1st to the 2nd
+                route = [(from_step.get('edge_id'), from_step.get('fraction'), to_step.get('fraction'))]
+            else:
+                route = graph.shortest_path(
+                    dict(from_step, fraction=self._fix_fraction(from_step.get('fraction'))),
+                    dict(to_step, fraction=self._fix_fraction(to_step.get('fraction')))
+                )
+                if route is None:
+                    return [], []
+            all_steps_routes.append(route)
+
+        line_strings = iter(self.get_route_geometries([piece for route in all_steps_routes for piece in route]))
+        all_steps_geometries = []  # Each elem is a linestring from one step to another
+        all_steps_topologies = []  # Each elem is the topology from one step to another
+        for route in all_steps_routes:
             # Get the linestrings (segments of paths) between those two steps,
             # then merge them into one
-            one_step_geometry, topology = self.get_two_steps_route(from_step, to_step)
-            all_steps_topologies.append(topology)
-            if one_step_geometry is None:
-                return [], []
-            all_steps_geometries.append(one_step_geometry)
+            all_steps_geometries.append(self.merge_line_strings([next(line_strings) for piece in route]))
+            edge_ids, fraction_starts, fraction_ends = list(zip(*route))
+            all_steps_topologies.append({
+                'positions': dict([
+                    (str(i), [fraction_starts[i], fraction_ends[i]])
+                    for i in range(len(fraction_starts))
+                ]),
+                'paths': list(edge_ids),
+            })
         return all_steps_geometries, all_steps_topologies
 
-    def get_two_steps_route(self, from_step, to_step):
-        """
-        Returns the geometry (as a LineString) and the topology of a subroute.
-        Parameters:
-            from_step: {edge_id: int, fraction: float}
-            to_step: {edge_id: int, fraction: float}
-        """
-        from_edge_id = from_step.get('edge_id')
-        to_edge_id = to_step.get('edge_id')
-
-        if from_edge_id == to_edge_id:
-            from_fraction = from_step.get('fraction')
-            to_fraction = to_step.get('fraction')
-            # If both points are on same edge, split it from the 1st to the 2nd
-            path_substring = self.create_path_substring(
-                from_edge_id,
-                from_fraction,
-                to_fraction
-            )
-            line_strings = [path_substring]
-            topology = {
-                'positions': {'0': [from_fraction, to_fraction]},
-                'paths': [from_edge_id],
-            }
-        else:
-            # Compute the shortest path between the two points
-            line_strings, topology = self.compute_two_steps_route(from_step, to_step)
-            if line_strings == []:
-                return None, None
-
-        step_geometry = self.merge_line_strings(line_strings)
-        return step_geometry, topology
-
-    def compute_two_steps_route(self, from_step, to_step):
+    def get_route_geometries(self, route):
         """
-        Computes the geometry (as an array of LineStrings) and the topology of
-        a subroute by using pgRouting.
-        Parameters:
-            from_step: {edge_id: int, fraction: float}
-            to_step: {edge_id: int, fraction: float}
+        Returns the LineStrings of a route given as a list of
+        (edge_id, start fraction, end fraction), in one query.
         """
-        start_edge = from_step.get('edge_id')
-        end_edge = to_step.get('edge_id')
-        fraction_start = self._fix_fraction(from_step.get('fraction'))
-        fraction_end = self._fix_fraction(to_step.get('fraction'))
-
+        values = ', '.join(['(%s, %s, %s::float, %s::float)'] * len(route))
+        params = [param for i, (edge_id, start, end) in enumerate(route) for param in (i, edge_id, start, end)]
         query = """
-            DO $$
-            DECLARE
-                max_edge_id integer;
-                max_vertex_id integer;
-
-            BEGIN
-
-                SELECT MAX(id) FROM core_path INTO max_edge_id;
-                SELECT MAX(vid) FROM (
-                    SELECT source AS vid FROM core_path
-                    UNION
-                    SELECT target AS vid FROM core_path
-                ) AS vids INTO max_vertex_id;
-
-                DROP TABLE IF EXISTS temporary_edges_info;
-                CREATE TEMPORARY TABLE temporary_edges_info AS
-                    -- This info will be added to the A* inner query edges_sql.
-                    -- It represents the temporary edges created by adding the start
-                    -- and end steps as nodes onto the graph (aka pgr network topology)
-                    WITH graph_temporary_edges AS (
-                        SELECT
-                            core_path.id AS path_id,
-                            max_edge_id + index AS edge_id,
-                            ST_SmartLineSubstring(
-                                core_path.geom,
-                                fraction_start,
-                                fraction_end
-                            ) as edge_geom,
-                            CASE
-                                WHEN (index % 2) != 0
-                                    THEN core_path.source
-                                    ELSE max_vertex_id + (index > 2)::int + 1
-                                END AS source_id,
-                            CASE
-                                WHEN (index % 2) = 0
-                                    THEN core_path.target
-                                    ELSE max_vertex_id + (index > 2)::int + 1
-                                END AS target_id,
-                            CASE
-                                WHEN (index % 2) != 0
-                                    THEN ST_StartPoint(geom)
-                                    ELSE ST_LineInterpolatePoint(core_path.geom, fraction_start)
-                                END AS source_geom,
-                            CASE
-                                WHEN (index % 2) = 0
-                                    THEN ST_EndPoint(geom)
-                                    ELSE ST_LineInterpolatePoint(core_path.geom, fraction_end)
-                                END AS target_geom
-                        FROM (
-                            VALUES
-                                (1, '{}'::int, 0, '{}'::float),
-                                (2, '{}'::int, '{}'::float, 1),
-                                (3, '{}'::int, 0, '{}'::float),
-                                (4, '{}'::int, '{}'::float, 1)
-                        ) AS tmp_edges_info (index, path_id, fraction_start, fraction_end)
-                        JOIN core_path ON core_path.id = tmp_edges_info.path_id
-                    )
-                    SELECT
-                        path_id,
-                        edge_id AS id,
-                        source_id AS source,
-                        target_id AS target,
-                        ST_Length(edge_geom) AS cost,
-                        ST_Length(edge_geom) AS reverse_cost,
-                        ST_X(source_geom) AS x1,
-                        ST_Y(source_geom) AS y1,
-                        ST_X(target_geom) AS x2,
-                        ST_Y(target_geom) AS y2,
-                        edge_geom as geom
-                    FROM graph_temporary_edges;
-
-                DROP TABLE IF EXISTS route;
-                CREATE TEMPORARY TABLE route AS
-                WITH pgr AS (
-                    SELECT
-                        pgr.path_seq,
-                        pgr.node,
-                        (LEAD(pgr.node) OVER (ORDER BY path_seq)) AS next_node,
-                        COALESCE(core_path.source, temporary_edges_info.source) as source,
-                        COALESCE(core_path.target, temporary_edges_info.target) as target,
-                        COALESCE(core_path.geom, temporary_edges_info.geom) as edge_geom,
-                        CASE
-                            WHEN pgr.edge > max_edge_id
-                                THEN temporary_edges_info.path_id
-                                ELSE pgr.edge
-                            END AS edge
-                    FROM
-                        pgr_aStar(
-                            'SELECT
-                                id,
-                                source,
-                                target,
-                                length AS cost,
-                                length AS reverse_cost,
-                                ST_X(ST_StartPoint(geom)) AS x1,
-                                ST_Y(ST_StartPoint(geom)) AS y1,
-                                ST_X(ST_EndPoint(geom)) AS x2,
-                                ST_Y(ST_EndPoint(geom)) AS y2
-                            FROM core_path
-                            WHERE draft = false AND visible = true
-                            UNION ALL SELECT
-                                id, source, target, cost, reverse_cost, x1, y1, x2, y2
-                            FROM temporary_edges_info
-                            ORDER by id',
-                            max_vertex_id + 1, max_vertex_id + 2
-                        ) AS pgr
-                        LEFT JOIN core_path ON id = pgr.edge
-                        LEFT JOIN temporary_edges_info ON temporary_edges_info.id = pgr.edge
-                        WHERE edge != -1
-                )
-                SELECT
-                    CASE
-                        WHEN source = next_node THEN ST_Reverse(edge_geom)
-                        ELSE edge_geom
-                        END AS edge_geom,
-                    edge,
-                    CASE
-                        WHEN node = max_vertex_id + 1 THEN '{}'::float
-                        WHEN node = source THEN 0
-                        ELSE 1  -- node = target
-                        END AS fraction_start,
-                    CASE
-                        WHEN next_node IS NULL THEN '{}'::float
-                        WHEN next_node = source THEN 0
-                        ELSE 1  -- next_node = target
-                        END AS fraction_end
-                FROM pgr;
-
-            END $$;
-
-            SELECT
-                edge_geom,
-                edge,
-                fraction_start,
-                fraction_end
-            FROM route
-        """.format(
-            start_edge, fraction_start,
-            start_edge, fraction_start,
-            end_edge, fraction_end,
-            end_edge, fraction_end,
-            fraction_start, fraction_end
-        )
-
+            SELECT ST_SmartLineSubstring(core_path.geom, route.fraction_start, route.fraction_end)
+            FROM (VALUES {}) AS route (index, path_id, fraction_start, fraction_end)
+            JOIN core_path ON core_path.id = route.path_id
+            ORDER BY route.index
+        """.format(values)
         with connection.cursor() as cursor:
-            cursor.execute(query)
-
-            query_result = cursor.fetchall()
-            if query_result == []:
-                return [], None
-
-            geometries, edge_ids, fraction_starts, fraction_ends = list(zip(*query_result))
-            return (
-                [
-                    # Convert each geometry to a LineString
-                    MultiLineString(*[GEOSGeometry(geometry)]).merged
-                    for geometry in geometries
-                ],
-                {
-                    'positions': dict([
-                        (str(i), [fraction_starts[i], fraction_ends[i]])
-                        for i in range(len(fraction_starts))
-                    ]),
-                    'paths': list(edge_ids),
-                }
-            )
+            cursor.execute(query, params)
+            return [
+                # Convert each geometry to a LineString
+                MultiLineString(*[GEOSGeometry(geometry)]).merged
+                for geometry, in cursor.fetchall()
+            ]
 
     def _fix_fraction(self, fraction):
-        """ This function is used to fix an issue with pgRouting where a point's
+        """ This function was used to fix an issue with pgRouting where a point's
         position on an edge being 0.0 or 1.0 create a routing topology problem.
         See https://github.com/pgRouting/pgrouting/issues/760
-        So we create a fake fraction near the vertices of the edge.
+        It is kept so that serialized topologies are the same as before.
         """
         if float(fraction) == 1.0:
             return 0.99999
@@ -313,28 +365,6 @@ class PathRouter:
             return 0.00001
         return fraction
 
-    def create_path_substring(self, path_id, start_fraction, end_fraction):
-        """
-        Returns a path's substring for which start_fraction can be bigger than
-        end_fraction.
-        """
-        path = Path.objects.get(pk=path_id)
-        sql = """
-        SELECT ST_AsText(ST_SmartLineSubstring('{}'::geometry, {}, {}))
-        """.format(path.geom, start_fraction, end_fraction)
-
-        cursor = connection.cursor()
-        cursor.execute(sql)
-        result = cursor.fetchone()[0]
-
-        # Convert the string into an array of arrays of floats
-        coords_str = result.split('(')[1].split(')')[0]
-        str_points_array = [elem.split(' ') for elem in coords_str.split(',')]
-        arr = [[float(nb) for nb in sub_array] for sub_array in str_points_array]
-
-        line_substring = LineString(arr, srid=settings.SRID)
-        return line_substring
-
     def merge_line_strings(self, line_strings):
         multi_line_string = MultiLineString(line_strings, srid=settings.SRID)
         return multi_line_string.merged
@@ -149,6 +149,33 @@ END;
 $$ LANGUAGE plpgsql;
 
 
+-------------------------------------------------------------------------------
+-- Deferred update of topologies geometries
+-------------------------------------------------------------------------------
+-- When geotrek.deferred_topology_geom is 'on' (SET LOCAL), triggers only flag
+-- topologies with geom_need_update, and each flagged topology is recomputed
+-- once by update_geometry_of_flagged_topologies(), called explicitly or at commit.
+
+CREATE FUNCTION {{ schema_geotrek }}.ft_topologies_geom_deferred() RETURNS boolean AS $$
+BEGIN
+    RETURN COALESCE(current_setting('geotrek.deferred_topology_geom', true), '') = 'on';
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+CREATE FUNCTION {{ schema_geotrek }}.update_geometry_of_flagged_topologies() RETURNS integer AS $$
+DECLARE
+    tid integer;
+    t_count integer := 0;
+BEGIN
+    FOR tid IN SELECT id FROM core_topology WHERE geom_need_update = TRUE LOOP
+        PERFORM update_geometry_of_topology(tid);
+        t_count := t_count + 1;
+    END LOOP;
+    RETURN t_count;
+END;
+$$ LANGUAGE plpgsql;
+
+
 -------------------------------------------------------------------------------
 -- Update geometry when offset change
 -------------------------------------------------------------------------------
@@ -161,7 +188,11 @@ BEGIN
     -- Since the topology to be modified is available in NEW, we could improve
     -- performance with some refactoring.
 
-    PERFORM update_geometry_of_topology(NEW.id);
+    IF ft_topologies_geom_deferred() THEN
+        UPDATE core_topology SET geom_need_update = TRUE WHERE id = NEW.id AND geom_need_update = FALSE;
+    ELSE
+        PERFORM update_geometry_of_topology(NEW.id);
+    END IF;
 
     RETURN NULL;
 END;
@@ -47,12 +47,12 @@ $$ LANGUAGE plpgsql;
 CREATE FUNCTION {{ schema_geotrek }}.ft_topologies_paths_geometry() RETURNS trigger SECURITY DEFINER AS $$
 BEGIN
     IF TG_OP = 'INSERT' THEN
-        UPDATE core_topology SET geom_need_update = TRUE WHERE id = NEW.topo_object_id AND kind != 'TMP';
+        UPDATE core_topology SET geom_need_update = TRUE WHERE id = NEW.topo_object_id AND kind != 'TMP' AND geom_need_update = FALSE;
     ELSE
-        UPDATE core_topology SET geom_need_update = TRUE WHERE id = OLD.topo_object_id AND kind != 'TMP';
+        UPDATE core_topology SET geom_need_update = TRUE WHERE id = OLD.topo_object_id AND kind != 'TMP' AND geom_need_update = FALSE;
         IF TG_OP = 'UPDATE' THEN -- /!\ Logical ops are commutative in SQL
             IF NEW.topo_object_id != OLD.topo_object_id THEN
-                UPDATE core_topology SET geom_need_update = TRUE WHERE id = NEW.topo_object_id AND kind != 'TMP';
+                UPDATE core_topology SET geom_need_update = TRUE WHERE id = NEW.topo_object_id AND kind != 'TMP' AND geom_need_update = FALSE;
             END IF;
         END IF;
     END IF;
@@ -70,12 +70,11 @@ DROP TRIGGER IF EXISTS core_pathaggregation_geometry_statement_tgr ON core_patha
 DROP FUNCTION IF EXISTS ft_topologies_paths_geometry_statement() CASCADE;
 
 CREATE FUNCTION {{ schema_geotrek }}.ft_topologies_paths_geometry_statement() RETURNS trigger SECURITY DEFINER AS $$
-DECLARE
-    rec record;
 BEGIN
-    FOR rec IN SELECT * FROM core_topology WHERE geom_need_update = TRUE LOOP
-        PERFORM update_geometry_of_topology(rec.id);
-    END LOOP;
+    -- In deferred mode, flagged topologies are updated once later
+    IF NOT ft_topologies_geom_deferred() THEN
+        PERFORM update_geometry_of_flagged_topologies();
+    END IF;
 
     RETURN NULL;
 END;
@@ -86,6 +85,26 @@ AFTER INSERT OR UPDATE OR DELETE ON core_pathaggregation
 FOR EACH STATEMENT EXECUTE PROCEDURE ft_topologies_paths_geometry_statement();
 
 
+CREATE FUNCTION {{ schema_geotrek }}.ft_topologies_geometry_deferred() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    -- One event is queued per flagged row: the first one updates all flagged
+    -- topologies, the following ones find their flag already cleared.
+    IF EXISTS (SELECT 1 FROM core_topology WHERE id = NEW.id AND geom_need_update) THEN
+        PERFORM update_geometry_of_flagged_topologies();
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Topologies flagged in deferred mode are updated at commit time at the latest
+CREATE CONSTRAINT TRIGGER core_topology_geometry_deferred_tgr
+AFTER UPDATE OF geom_need_update ON core_topology
+DEFERRABLE INITIALLY DEFERRED
+FOR EACH ROW
+WHEN (NEW.geom_need_update AND ft_topologies_geom_deferred())
+EXECUTE PROCEDURE ft_topologies_geometry_deferred();
+
+
 -------------------------------------------------------------------------------
 -- Emulate junction points
 -------------------------------------------------------------------------------
@@ -51,7 +51,12 @@ BEGIN
                GROUP BY e.id, e."offset"
                HAVING BOOL_OR(et.start_position != et.end_position) OR e."offset" = 0.0
     LOOP
-        PERFORM update_geometry_of_topology(eid);
+        IF ft_topologies_geom_deferred() THEN
+            -- Updated once later, see update_geometry_of_flagged_topologies()
+            UPDATE core_topology SET geom_need_update = TRUE WHERE id = eid AND geom_need_update = FALSE;
+        ELSE
+            PERFORM update_geometry_of_topology(eid);
+        END IF;
     END LOOP;
 
     -- Special case of point geometries with offset != 0
@@ -94,10 +99,39 @@ ALTER TABLE core_path ADD CONSTRAINT core_path_geom_issimple CHECK (ST_IsSimple(
 -- Compute elevation and elevation-based indicators
 -------------------------------------------------------------------------------
 
+-- In deferred mode (see PathHelper.deferred_elevations()), inserted or modified paths
+-- are only flagged with an empty geom_3d, and draped once by update_elevation_of_flagged_paths().
+
+CREATE FUNCTION {{ schema_geotrek }}.ft_paths_elevation_deferred() RETURNS boolean AS $$
+BEGIN
+    RETURN COALESCE(current_setting('geotrek.deferred_path_elevation', true), '') = 'on';
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+CREATE FUNCTION {{ schema_geotrek }}.update_elevation_of_flagged_paths() RETURNS integer AS $$
+DECLARE
+    t_count integer;
+BEGIN
+    UPDATE core_path
+        SET (geom_3d, length, slope, min_elevation, max_elevation, ascent, descent) =
+            (SELECT elevation.draped, ST_3DLength(elevation.draped), elevation.slope,
+                    elevation.min_elevation, elevation.max_elevation,
+                    elevation.positive_gain, elevation.negative_gain
+             FROM ft_elevation_infos(geom, {{ ALTIMETRIC_PROFILE_STEP }}) AS elevation)
+        WHERE geom_3d IS NULL;
+    GET DIAGNOSTICS t_count = ROW_COUNT;
+    RETURN t_count;
+END;
+$$ LANGUAGE plpgsql;
+
 CREATE FUNCTION {{ schema_geotrek }}.elevation_path_iu() RETURNS trigger SECURITY DEFINER AS $$
 DECLARE
     elevation elevation_infos;
 BEGIN
+    IF ft_paths_elevation_deferred() THEN
+        NEW.geom_3d := NULL;
+        RETURN NEW;
+    END IF;
     SELECT * FROM ft_elevation_infos(NEW.geom, {{ ALTIMETRIC_PROFILE_STEP }}) INTO elevation;
     -- Update path geometry
     NEW.geom_3d := elevation.draped;
@@ -175,3 +209,35 @@ $$ LANGUAGE plpgsql;
 CREATE TRIGGER core_path_pgrouting_values_null_tgr
 AFTER UPDATE OF geom ON core_path
 FOR EACH ROW EXECUTE PROCEDURE set_pgrouting_values_to_null();
+
+
+-------------------------------------------------------------------------------
+-- Load paths in bulk
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {{ schema_geotrek }}.ft_load_paths(structure integer, path_names text[], path_comments text[],
+                                                   path_geoms geometry[], fail boolean) RETURNS integer[] AS $$
+-- Insert paths in the given order, each of them being snapped and split by triggers
+-- against the previous ones. Returns created ids, NULL for paths raising an integrity
+-- or internal error when fail is TRUE.
+DECLARE
+    path_ids integer[] := ARRAY[]::integer[];
+    path_id integer;
+BEGIN
+    FOR i IN 1..coalesce(array_length(path_geoms, 1), 0) LOOP
+        BEGIN
+            INSERT INTO core_path (structure_id, name, comments, geom, valid, visible, draft,
+                                   departure, arrival, provider, eid)
+                VALUES (structure, path_names[i], path_comments[i], ST_Transform(path_geoms[i], {{ SRID }}), TRUE, TRUE, FALSE, '', '', '', NULL)
+                RETURNING id INTO path_id;
+        EXCEPTION WHEN integrity_constraint_violation OR internal_error THEN
+            IF NOT fail THEN
+                RAISE;
+            END IF;
+            path_id := NULL;
+        END;
+        path_ids := array_append(path_ids, path_id);
+    END LOOP;
+    RETURN path_ids;
+END;
+$$ LANGUAGE plpgsql;
@@ -183,3 +183,90 @@ BEGIN
 
 END;
 $$ LANGUAGE plpgsql;
+
+
+CREATE FUNCTION {{ schema_geotrek }}.ft_merge_path_chain(ids integer[], reversed boolean[])
+  RETURNS integer AS $$
+-- Merge a chain of paths into its lowest path id, in a single operation.
+-- Paths are given in chain order, with whether each one is reversed along the chain.
+-- Topologies are carried over as in ft_merge_path.
+
+DECLARE
+    kept integer;
+    total_length float;
+    max_snap_distance float;
+
+BEGIN
+    max_snap_distance := GREATEST({{ PATH_MERGE_SNAPPING_DISTANCE }}, {{ PATH_SNAPPING_DISTANCE }});
+    kept := (SELECT MIN(id) FROM unnest(ids) AS id);
+    total_length := (SELECT SUM(ST_Length(geom)) FROM core_path WHERE id = ANY(ids));
+
+    IF array_length(ids, 1) < 2 OR total_length = 0
+    THEN
+        RETURN 0;
+    END IF;
+
+    -- each part must exist and end where the next one starts, within snapping distance
+    IF EXISTS (SELECT 1
+               FROM (SELECT CASE WHEN part.reversed THEN ST_StartPoint(tr.geom) ELSE ST_EndPoint(tr.geom) END AS end_point,
+                            LEAD(CASE WHEN part.reversed THEN ST_EndPoint(tr.geom) ELSE ST_StartPoint(tr.geom) END) OVER (ORDER BY part.n) AS next_start_point
+                     FROM unnest(ids, reversed) WITH ORDINALITY AS part(id, reversed, n)
+                     JOIN core_path tr ON tr.id = part.id) AS link
+               WHERE link.next_start_point IS NOT NULL
+                     AND ST_Distance(link.end_point, link.next_start_point) > max_snap_distance)
+       OR (SELECT COUNT(*) FROM core_path WHERE id = ANY(ids)) != array_length(ids, 1)
+    THEN
+        RETURN 0;
+    END IF;
+
+    -- reverse offsets of topologies reversed an odd number of times
+    UPDATE core_topology t
+           SET "offset" = -t."offset"
+           FROM (SELECT et.topo_object_id
+                 FROM core_pathaggregation et
+                 JOIN unnest(ids, reversed) AS chain(id, reversed) ON et.path_id = chain.id
+                 WHERE chain.reversed
+                 GROUP BY et.topo_object_id
+                 HAVING COUNT(*) % 2 = 1) AS reversed_topology
+           WHERE t.id = reversed_topology.topo_object_id;
+
+    -- update positions along the merged path
+    UPDATE core_pathaggregation et
+           SET start_position = (chain.start + CASE WHEN chain.reversed THEN 1 - et.start_position ELSE et.start_position END * chain.length) / total_length,
+               end_position = (chain.start + CASE WHEN chain.reversed THEN 1 - et.end_position ELSE et.end_position END * chain.length) / total_length
+           FROM (SELECT part.id, part.reversed, ST_Length(tr.geom) AS length,
+                        COALESCE(SUM(ST_Length(tr.geom)) OVER (ORDER BY part.n ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING), 0) AS start
+                 FROM unnest(ids, reversed) WITH ORDINALITY AS part(id, reversed, n)
+                 JOIN core_path tr ON tr.id = part.id) AS chain
+           WHERE et.path_id = chain.id;
+
+    -- fix new geom to kept path
+    UPDATE core_path
+           SET geom = (SELECT ST_MakeLine(CASE WHEN part.reversed THEN ST_Reverse(tr.geom) ELSE tr.geom END ORDER BY part.n)
+                       FROM unnest(ids, reversed) WITH ORDINALITY AS part(id, reversed, n)
+                       JOIN core_path tr ON tr.id = part.id)
+           WHERE id = kept;
+
+    -- link merged events to kept path
+    UPDATE core_pathaggregation
+           SET path_id = kept
+           WHERE path_id = ANY(ids) AND path_id != kept;
+
+    -- link networks and usages, unless already present
+    INSERT INTO core_path_networks (path_id, network_id)
+           SELECT DISTINCT kept, network_id FROM core_path_networks WHERE path_id = ANY(ids) AND path_id != kept
+           ON CONFLICT DO NOTHING;
+    DELETE FROM core_path_networks WHERE path_id = ANY(ids) AND path_id != kept;
+
+    INSERT INTO core_path_usages (path_id, usage_id)
+           SELECT DISTINCT kept, usage_id FROM core_path_usages WHERE path_id = ANY(ids) AND path_id != kept
+           ON CONFLICT DO NOTHING;
+    DELETE FROM core_path_usages WHERE path_id = ANY(ids) AND path_id != kept;
+
+    -- Delete merged Paths
+    DELETE FROM core_path WHERE id = ANY(ids) AND id != kept;
+
+    RETURN array_length(ids, 1) - 1;
+
+END;
+$$ LANGUAGE plpgsql;
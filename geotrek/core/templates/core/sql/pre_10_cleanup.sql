@@ -15,6 +15,8 @@ DROP FUNCTION IF EXISTS topology_latest_updated_d() CASCADE;
 
 DROP FUNCTION IF EXISTS update_geometry_of_evenement(integer) CASCADE;
 DROP FUNCTION IF EXISTS update_geometry_of_topology(integer) CASCADE;
+DROP FUNCTION IF EXISTS ft_topologies_geom_deferred() CASCADE;
+DROP FUNCTION IF EXISTS update_geometry_of_flagged_topologies() CASCADE;
 
 DROP FUNCTION IF EXISTS update_evenement_geom_when_offset_changes() CASCADE;
 DROP FUNCTION IF EXISTS update_topology_geom_when_offset_changes() CASCADE;
@@ -29,6 +31,7 @@ DROP FUNCTION IF EXISTS ft_path_interpolate(integer, geometry) CASCADE;
 
 DROP FUNCTION IF EXISTS ft_evenements_troncons_geometry() CASCADE;
 DROP FUNCTION IF EXISTS ft_topologies_paths_geometry() CASCADE;
+DROP FUNCTION IF EXISTS ft_topologies_geometry_deferred() CASCADE;
 
 DROP FUNCTION IF EXISTS ft_evenements_troncons_junction_point_iu() CASCADE;
 DROP FUNCTION IF EXISTS ft_topologies_paths_junction_point_iu() CASCADE;
@@ -42,6 +45,9 @@ DROP FUNCTION IF EXISTS update_topology_geom_when_path_changes() CASCADE;
 
 DROP FUNCTION IF EXISTS elevation_troncon_iu() CASCADE;
 DROP FUNCTION IF EXISTS elevation_path_iu() CASCADE;
+DROP FUNCTION IF EXISTS ft_paths_elevation_deferred() CASCADE;
+DROP FUNCTION IF EXISTS update_elevation_of_flagged_paths() CASCADE;
+DROP FUNCTION IF EXISTS ft_load_paths(integer, text[], text[], geometry[], boolean) CASCADE;
 
 DROP FUNCTION IF EXISTS troncons_related_objects_d() CASCADE;
 DROP FUNCTION IF EXISTS paths_related_objects_d() CASCADE;
@@ -66,6 +72,7 @@ DROP VIEW IF EXISTS v_trails CASCADE;
 -- 70
 
 DROP FUNCTION IF EXISTS ft_merge_path(integer,integer) CASCADE;
+DROP FUNCTION IF EXISTS ft_merge_path_chain(integer[],boolean[]) CASCADE;
 
 -- 80
 
@@ -10,7 +10,7 @@ from django.db import connection, IntegrityError
 
 from geotrek.authent.models import Structure
 from geotrek.core.models import Path, PathAggregation
-from geotrek.core.tests.factories import PathFactory, TopologyFactory
+from geotrek.core.tests.factories import PathFactory, PointTopologyFactory, TopologyFactory
 from geotrek.trekking.tests.factories import POIFactory, TrekFactory
 import os
 
@@ -222,6 +222,33 @@ class LoadPathsCommandTest(TestCase):
         with self.assertRaises(IntegrityError):
             call_command('loadpaths', filename, '-i', verbosity=2, stdout=output)
 
+    @override_settings(SRID=4326, SPATIAL_EXTENT=(-1, 0, 4, 2))
+    def test_load_paths_bulk_fail_without_dry(self):
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'bad_path.geojson')
+        with self.assertRaises(IntegrityError):
+            call_command('loadpaths', filename, '-i', bulk=True, verbosity=0)
+
+    @override_settings(SRID=4326, SPATIAL_EXTENT=(-1, -3, 5, 5))
+    def test_load_paths_bulk_same_network(self):
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'crossing_paths.geojson')
+        # Compare every stored column but the ones differing from one creation to another
+        fields = [field.attname for field in Path._meta.concrete_fields
+                  if field.attname not in ('id', 'uuid', 'date_insert', 'date_update')]
+        call_command('loadpaths', filename, fail=True, srid=4326, verbosity=0)
+        expected = sorted(tuple(map(str, row)) for row in Path.include_invisible.values_list(*fields))
+        Path.include_invisible.all().delete()
+        output = StringIO()
+        call_command('loadpaths', filename, fail=True, bulk=True, srid=4326, verbosity=2, stdout=output)
+        output = output.getvalue()
+        self.assertEqual(sorted(tuple(map(str, row)) for row in Path.include_invisible.values_list(*fields)),
+                         expected)
+        self.assertEqual(len(expected), 7)
+        self.assertIn('Integrity Error on path : lulu 3, ', output)
+        self.assertIn('3 objects created, 1 objects failed', output)
+        for name in ('lulu', 'lulu 2', 'lulu 4'):
+            path = Path.objects.filter(name=name).order_by('pk').first()
+            self.assertIn('Create path with pk : %s' % path.pk, output)
+
     @override_settings(SRID=4326, SPATIAL_EXTENT=(-1, -1, 1, 5))
     def test_load_paths_within_spatial_extent_no_srid_geom(self):
         filename = os.path.join(os.path.dirname(__file__), 'data', 'paths_no_srid.shp')
@@ -685,7 +712,7 @@ class MergePathsTest(TestCase):
         output = StringIO()
         call_command('merge_segmented_paths', stdout=output)
         # After call
-        #        p1                     p6                       p14
+        #        p1                     p3                       p8
         # +--------------+-----------------------------+---------------------+
         #                |                             |
         #                |  p4                         |  p13
@@ -699,40 +726,65 @@ class MergePathsTest(TestCase):
         #                |  p12
         #                |
         #
-        output_str = (f"┌ STEP 1\n"
+        output_str = (f"┌ 3 chains of segmented paths\n"
                       f"├ Merged {self.p2.pk} into {self.p1.pk}\n"
-                      f"├ Merged {self.p9.pk} into {self.p14.pk}\n"
-                      f"├ Cannot merge {self.p16.pk} and {self.p13.pk}\n"
-                      f"├ Merged {self.p8.pk} into {self.p14.pk}\n"
-                      f"├ Already discarded {self.p16.pk} and {self.p13.pk}\n"
-                      f"└ 3 merges\n"
-                      f"┌ STEP 2\n"
-                      f"├ Cannot merge {self.p1.pk} and {self.p3.pk}\n"
-                      f"├ Merged {self.p3.pk} into {self.p5.pk}\n"
-                      f"├ Merged {self.p5.pk} into {self.p6.pk}\n"
-                      f"├ Cannot merge {self.p14.pk} and {self.p7.pk}\n"
-                      f"└ 2 merges\n"
-                      f"┌ STEP 3\n"
-                      f"├ Cannot merge {self.p6.pk} and {self.p1.pk}\n"
-                      f"├ Cannot merge {self.p6.pk} and {self.p4.pk}\n"
-                      f"├ Merged {self.p7.pk} into {self.p6.pk}\n"
-                      f"├ Cannot merge {self.p7.pk} and {self.p6.pk}\n"
-                      f"├ Cannot merge {self.p7.pk} and {self.p13.pk}\n"
-                      f"├ Already discarded {self.p7.pk} and {self.p14.pk}\n"
-                      f"├ Cannot merge {self.p10.pk} and {self.p4.pk}\n"
-                      f"├ Cannot merge {self.p10.pk} and {self.p11.pk}\n"
-                      f"├ Cannot merge {self.p10.pk} and {self.p15.pk}\n"
-                      f"├ Cannot merge {self.p12.pk} and {self.p4.pk}\n"
-                      f"├ Cannot merge {self.p12.pk} and {self.p11.pk}\n"
-                      f"├ Cannot merge {self.p12.pk} and {self.p15.pk}\n"
-                      f"├ Already discarded {self.p13.pk} and {self.p7.pk}\n"
-                      f"├ Cannot merge {self.p13.pk} and {self.p14.pk}\n"
-                      f"├ Already discarded {self.p13.pk} and {self.p16.pk}\n"
-                      f"└ 1 merges\n"
+                      f"├ Merged {self.p5.pk}, {self.p6.pk}, {self.p7.pk} into {self.p3.pk}\n"
+                      f"├ Merged {self.p9.pk}, {self.p14.pk} into {self.p8.pk}\n"
+                      f"└ 6 merges\n"
                       f"\n"
                       f"--- RAN 6 MERGES - FROM 16 TO 10 PATHS ---\n")
         self.assertEqual(Path.objects.count(), 10)
         self.assertIn(output_str, output.getvalue())
+        self.assertEqual(Path.objects.get(pk=self.p3.pk).geom,
+                         LineString((2, 2), (3, 3), (4, 4), (5, 5), (6, 6), srid=settings.SRID))
+
+    @override_settings(PATH_SNAPPING_DISTANCE=0, PATH_MERGE_SNAPPING_DISTANCE=0)
+    def test_merge_into_lowest_path_in_middle_of_chain(self):
+        Path.objects.all().delete()
+        path_2 = Path.objects.create(geom=LineString((10, 0), (20, 0)))
+        path_1 = Path.objects.create(geom=LineString((0, 0), (10, 0)))
+        path_3 = Path.objects.create(geom=LineString((20, 0), (30, 0)))
+        output = StringIO()
+        call_command('merge_segmented_paths', stdout=output)
+        self.assertIn(f"├ Merged {path_1.pk}, {path_3.pk} into {path_2.pk}\n", output.getvalue())
+        self.assertEqual(list(Path.objects.values_list('pk', flat=True)), [path_2.pk])
+        self.assertEqual(Path.objects.get().geom, LineString((0, 0), (10, 0), (20, 0), (30, 0), srid=settings.SRID))
+
+    def test_merge_chain_of_paths_not_touching(self):
+        Path.objects.all().delete()
+        path_1 = Path.objects.create(geom=LineString((0, 0), (10, 0)))
+        path_2 = Path.objects.create(geom=LineString((10, 0), (20, 0)))
+        path_3 = Path.objects.create(geom=LineString((100, 0), (110, 0)))
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT ft_merge_path_chain(%s, %s);", [[path_1.pk, path_2.pk, path_3.pk], [False, False, False]])
+            self.assertEqual(cursor.fetchone()[0], 0)
+            cursor.execute("SELECT ft_merge_path_chain(%s, %s);", [[path_1.pk, path_2.pk], [False, True]])
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertEqual(Path.objects.count(), 3)
+        path_1.refresh_from_db()
+        self.assertEqual(path_1.geom, LineString((0, 0), (10, 0), srid=settings.SRID))
+
+    @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+    @override_settings(PATH_SNAPPING_DISTANCE=0, PATH_MERGE_SNAPPING_DISTANCE=0)
+    def test_merge_reversed_paths_keep_topologies(self):
+        Path.objects.all().delete()
+        path_1 = Path.objects.create(geom=LineString((0, 0), (10, 0)))
+        path_2 = Path.objects.create(geom=LineString((20, 0), (10, 0)))
+        Path.objects.create(geom=LineString((20, 0), (40, 0)))
+        topology = TopologyFactory.create(paths=[(path_1, 0.5, 1), (path_2, 1, 0.5)], offset=1)
+        point = PointTopologyFactory.create(paths=[(path_2, 0.5, 0.5)], offset=2)
+        call_command('merge_segmented_paths', stdout=StringIO())
+        self.assertEqual(Path.objects.count(), 1)
+        path_1.refresh_from_db()
+        self.assertEqual(path_1.geom, LineString((0, 0), (10, 0), (20, 0), (40, 0), srid=settings.SRID))
+        self.assertEqual([(aggr.path_id, aggr.start_position, aggr.end_position)
+                          for aggr in topology.aggregations.order_by('order')],
+                         [(path_1.pk, 0.125, 0.25), (path_1.pk, 0.25, 0.375)])
+        topology.refresh_from_db()
+        self.assertEqual(topology.offset, -1)
+        point.refresh_from_db()
+        self.assertEqual(point.offset, -2)
+        self.assertEqual(point.aggregations.get().start_position, 0.375)
 
 
 @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
@@ -750,3 +802,13 @@ class GeneratePgrNetworkTopologyTest(TestCase):
         self.assertIsNotNone(path_1.target_pgr)
         self.assertIsNotNone(path_2.source_pgr)
         self.assertIsNotNone(path_2.target_pgr)
+
+
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+class BenchmarkTopologiesTest(TestCase):
+    def test_benchmark_does_not_keep_anything(self):
+        output = StringIO()
+        call_command('benchmark_topologies', size=3, stdout=output, verbosity=0)
+        self.assertIn('Path split:', output.getvalue())
+        self.assertIn('Path update:', output.getvalue())
+        self.assertEqual(Path.objects.count(), 0)
@@ -0,0 +1,73 @@
+from unittest import skipIf
+
+from django.conf import settings
+from django.contrib.gis.geos import LineString
+from django.db import connection
+from django.test import TestCase
+
+from geotrek.core.helpers import PathHelper, TopologyHelper
+from geotrek.core.models import Path, Topology
+from geotrek.core.tests.factories import PathFactory, TopologyFactory
+
+
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+class DeferredGeometriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.path = PathFactory.create(geom=LineString((0, 0), (10, 0)))
+        cls.topology = TopologyFactory.create(paths=[cls.path])
+
+    def test_geometry_updated_when_leaving_block(self):
+        with TopologyHelper.deferred_geometries():
+            Path.objects.filter(pk=self.path.pk).update(geom=LineString((0, 0), (20, 0), srid=settings.SRID))
+            topology = Topology.objects.get(pk=self.topology.pk)
+            self.assertTrue(topology.geom_need_update)
+            self.assertEqual(topology.geom, LineString((0, 0), (10, 0), srid=settings.SRID))
+        topology = Topology.objects.get(pk=self.topology.pk)
+        self.assertFalse(topology.geom_need_update)
+        self.assertEqual(topology.geom, LineString((0, 0), (20, 0), srid=settings.SRID))
+
+    def test_split_same_result_as_immediate(self):
+        with TopologyHelper.deferred_geometries():
+            PathFactory.create(geom=LineString((5, -5), (5, 5)))
+            PathFactory.create(geom=LineString((7, -5), (7, 5)))
+        topology = Topology.objects.get(pk=self.topology.pk)
+        self.assertEqual(topology.aggregations.count(), 3)
+        self.assertEqual(topology.geom, LineString((0, 0), (5, 0), (7, 0), (10, 0), srid=settings.SRID))
+
+    def test_nested_blocks(self):
+        with TopologyHelper.deferred_geometries():
+            with TopologyHelper.deferred_geometries():
+                Path.objects.filter(pk=self.path.pk).update(geom=LineString((0, 0), (20, 0), srid=settings.SRID))
+            self.assertTrue(Topology.objects.get(pk=self.topology.pk).geom_need_update)
+        self.assertFalse(Topology.objects.get(pk=self.topology.pk).geom_need_update)
+
+    def test_flagged_topologies_updated_at_commit(self):
+        other = TopologyFactory.create(paths=[self.path])
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT set_config('geotrek.deferred_topology_geom', 'on', true)")
+            Path.objects.filter(pk=self.path.pk).update(geom=LineString((0, 0), (20, 0), srid=settings.SRID))
+            self.assertEqual(Topology.objects.filter(geom_need_update=True).count(), 2)
+            # Fire the deferred trigger events queued for both topologies, as at commit
+            cursor.execute("SET CONSTRAINTS core_topology_geometry_deferred_tgr IMMEDIATE")
+            cursor.execute("SELECT set_config('geotrek.deferred_topology_geom', '', true)")
+        self.assertFalse(Topology.objects.filter(geom_need_update=True).exists())
+        for pk in (self.topology.pk, other.pk):
+            self.assertEqual(Topology.objects.get(pk=pk).geom, LineString((0, 0), (20, 0), srid=settings.SRID))
+
+
+class DeferredElevationsTest(TestCase):
+    def test_elevation_updated_when_leaving_block(self):
+        with PathHelper.deferred_elevations():
+            path = PathFactory.create(geom=LineString((0, 0), (10, 0)))
+            self.assertIsNone(Path.objects.get(pk=path.pk).geom_3d)
+        path = Path.objects.get(pk=path.pk)
+        self.assertEqual(path.geom_3d, LineString((0, 0, 0), (10, 0, 0), srid=settings.SRID))
+        self.assertEqual(path.length, 10)
+
+    def test_nested_blocks(self):
+        with PathHelper.deferred_elevations():
+            with PathHelper.deferred_elevations():
+                path = PathFactory.create(geom=LineString((0, 0), (10, 0)))
+            self.assertIsNone(Path.objects.get(pk=path.pk).geom_3d)
+        self.assertIsNotNone(Path.objects.get(pk=path.pk).geom_3d)
@@ -217,6 +217,35 @@ class SnapTest(TestCase):
         self.assertEqual(snap.y, 6600000)
 
 
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+class SnapManyTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.path1 = PathFactory.create(geom=LineString((0, 0), (100, 0)))
+        cls.path2 = PathFactory.create(geom=LineString((0, 50), (100, 50)))
+
+    def test_snap_many(self):
+        points = [Point(25, 10, srid=settings.SRID), Point(75, 45, srid=settings.SRID)]
+        with self.assertNumQueries(2):
+            snapped = Path.snap_many(points)
+        self.assertEqual(snapped, [(self.path1, .25, 10), (self.path2, .75, -5)])
+
+    def test_snap_many_with_snap(self):
+        points = [Point(25, 10, srid=settings.SRID), Point(75, 45, srid=settings.SRID)]
+        snapped = Path.snap_many(points, snaps=[self.path2.pk, None])
+        self.assertEqual(snapped, [(self.path2, .25, 0), (self.path2, .75, -5)])
+
+    def test_snap_many_skip_draft(self):
+        self.path2.draft = True
+        self.path2.save()
+        snapped = Path.snap_many([Point(75, 45, srid=settings.SRID)])
+        self.assertEqual(snapped, [(self.path1, .75, 45)])
+
+    def test_snap_many_empty(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(Path.snap_many([]), [])
+
+
 @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
 class TrailTest(TestCase):
     def test_no_trail_csv(self):
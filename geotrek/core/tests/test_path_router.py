@@ -0,0 +1,130 @@
+from unittest import skipIf
+
+from django.conf import settings
+from django.contrib.gis.geos import LineString, Point
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from geotrek.core.path_router import PathGraph, PathRouter
+from geotrek.core.tests.factories import PathFactory
+
+
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+class PathGraphTest(TestCase):
+    """
+        path1
+      ────>────
+      │       │
+    path3   path4
+      │       │
+      ────>────
+        path2
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.path1 = PathFactory(geom=LineString((0, 100), (100, 100)))
+        cls.path2 = PathFactory(geom=LineString((0, 0), (100, 0)))
+        cls.path3 = PathFactory(geom=LineString((0, 0), (0, 100)))
+        cls.path4 = PathFactory(geom=LineString((100, 0), (100, 100)))
+
+    def setUp(self):
+        PathGraph._instance = None
+
+    def test_graph_vertices_are_shared(self):
+        graph = PathGraph.get()
+        self.assertEqual(len(graph.edges), 4)
+        self.assertEqual(len(graph.vertices), 4)
+        source1, target1, length1 = graph.edges[self.path1.pk]
+        source3, target3, length3 = graph.edges[self.path3.pk]
+        self.assertEqual(source1, target3)
+        self.assertAlmostEqual(length1, 100)
+
+    def test_shortest_path(self):
+        route = PathGraph.get().shortest_path({'edge_id': self.path1.pk, 'fraction': 0.1},
+                                              {'edge_id': self.path2.pk, 'fraction': 0.1})
+        self.assertEqual(route, [(self.path1.pk, 0.1, 0.0), (self.path3.pk, 1.0, 0.0), (self.path2.pk, 0.0, 0.1)])
+
+    def test_graph_is_refreshed_when_path_is_deleted(self):
+        PathGraph.get()
+        self.path3.delete()
+        graph = PathGraph.get()
+        self.assertNotIn(self.path3.pk, graph.edges)
+        route = graph.shortest_path({'edge_id': self.path1.pk, 'fraction': 0.1},
+                                    {'edge_id': self.path2.pk, 'fraction': 0.1})
+        self.assertEqual(route, [(self.path1.pk, 0.1, 1.0), (self.path4.pk, 1.0, 0.0), (self.path2.pk, 1.0, 0.1)])
+
+    def test_graph_is_refreshed_when_path_becomes_draft(self):
+        PathGraph.get()
+        self.path4.draft = True
+        self.path4.save()
+        graph = PathGraph.get()
+        self.assertNotIn(self.path4.pk, graph.edges)
+        self.assertIn(self.path3.pk, graph.edges)
+
+    def test_graph_is_refreshed_when_path_is_committed_late(self):
+        PathGraph.get()
+        # A transaction committed after a later one leaves an older date_update
+        with connection.cursor() as cursor:
+            cursor.execute("ALTER TABLE core_path DISABLE TRIGGER core_path_date_update_tgr")
+            cursor.execute("UPDATE core_path SET draft = true, date_update = '2000-01-01' WHERE id = %s",
+                           [self.path4.pk])
+            cursor.execute("ALTER TABLE core_path ENABLE TRIGGER core_path_date_update_tgr")
+        graph = PathGraph.get()
+        self.assertNotIn(self.path4.pk, graph.edges)
+        self.assertIn(self.path3.pk, graph.edges)
+
+    @override_settings(PATH_SNAPPING_DISTANCE=1)
+    def test_close_vertices_across_grid_cells_are_merged(self):
+        graph = PathGraph()
+        self.assertEqual(graph.vertex(0.45, 0.45), graph.vertex(0.55, 0.55))
+        self.assertNotEqual(graph.vertex(0.45, 0.45), graph.vertex(2, 2))
+
+    def test_no_route(self):
+        PathGraph.get()
+        self.path3.delete()
+        self.path4.delete()
+        route = PathGraph.get().shortest_path({'edge_id': self.path1.pk, 'fraction': 0.1},
+                                              {'edge_id': self.path2.pk, 'fraction': 0.1})
+        self.assertIsNone(route)
+
+    def test_no_route_from_deleted_path(self):
+        PathGraph.get()
+        self.path3.delete()
+        route = PathGraph.get().shortest_path({'edge_id': self.path3.pk, 'fraction': 0.1},
+                                              {'edge_id': self.path2.pk, 'fraction': 0.1})
+        self.assertIsNone(route)
+
+
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+class PathRouterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.path1 = PathFactory(geom=LineString((0, 100), (100, 100)))
+        cls.path2 = PathFactory(geom=LineString((0, 0), (100, 0)))
+        cls.path3 = PathFactory(geom=LineString((0, 0), (0, 100)))
+
+    def setUp(self):
+        PathGraph._instance = None
+        PathGraph.get()
+
+    def get_step(self, path, x, y):
+        point = Point(x, y, srid=settings.SRID)
+        point.transform(settings.API_SRID)
+        return {'path_id': path.pk, 'lat': point.y, 'lng': point.x}
+
+    def test_all_steps_are_routed(self):
+        steps = [self.get_step(self.path1, 50, 100), self.get_step(self.path2, 50, 0), self.get_step(self.path3, 0, 50)]
+        route = PathRouter().get_route(steps)
+        self.assertEqual(len(route['geojson']['geometries']), 2)
+        self.assertEqual(route['serialized'][0]['paths'], [self.path1.pk, self.path3.pk, self.path2.pk])
+        self.assertEqual(route['serialized'][1]['paths'], [self.path2.pk, self.path3.pk])
+
+    def test_number_of_queries_does_not_depend_on_steps(self):
+        steps = [self.get_step(self.path1, 50, 100), self.get_step(self.path2, 50, 0)]
+        with CaptureQueriesContext(connection) as context:
+            PathRouter().get_route(steps)
+        nb_queries = len(context.captured_queries)
+        steps += [self.get_step(self.path3, 0, 50), self.get_step(self.path1, 60, 100), self.get_step(self.path2, 60, 0)]
+        with self.assertNumQueries(nb_queries):
+            PathRouter().get_route(steps)
@@ -155,6 +155,18 @@ class TopologyTest(TestCase):
         Topology.deserialize('{"paths": %s, "positions": {"0": [0.3, 1.0], "2": [0.0, 0.7]}, "offset": 1}' % pks)
         self.assertEqual(Path.objects.count(), 3)
 
+    def test_topology_deserialize_fetch_paths_once(self):
+        paths = [PathFactory.create(geom=LineString((i, 0), (i + 1, 0))) for i in range(10)]
+        pks = [p.pk for p in paths]
+        with self.assertNumQueries(1):
+            topology = Topology.deserialize('[{"paths": %s, "positions": {"0": [0.3, 1.0], "9": [0.0, 0.7]}, "offset": 1}]' % pks)
+        self.assertEqual([aggr.path for aggr in topology.aggregations.all()], paths)
+
+    def test_topology_deserialize_invalid_position(self):
+        path = PathFactory.create(geom=LineString((0, 0), (2, 2)))
+        with self.assertRaises(ValueError):
+            Topology.deserialize('[{"paths": [%s], "positions": {"0": ["a", 1.0]}, "offset": 1}]' % path.pk)
+
     def test_topology_deserialize_point(self):
         PathFactory.create(geom=LineString((699999, 6600001), (700001, 6600001)))
         topology = Topology.deserialize('{"lat": 46.5, "lng": 3}')
@@ -171,6 +183,18 @@ class TopologyTest(TestCase):
         self.assertEqual(topology.aggregations.get().start_position, .5)
         self.assertEqual(topology.aggregations.get().end_position, .5)
 
+    def test_topology_deserialize_points(self):
+        path = PathFactory.create(geom=LineString((0, 0), (100, 0)))
+        geometries = [Point(25, 10, srid=settings.SRID), LineString((0, 0), (1, 1), srid=settings.SRID),
+                      Point(75, 0, srid=settings.SRID)]
+        topologies = Topology.deserialize_points(geometries)
+        self.assertIsNone(topologies[1])
+        self.assertEqual(topologies[0].offset, 10)
+        self.assertEqual(topologies[0].aggregations.get().path, path)
+        self.assertEqual(topologies[0].aggregations.get().start_position, .25)
+        self.assertEqual(topologies[2].offset, 0)
+        self.assertEqual(topologies[2].aggregations.get().end_position, .75)
+
     def test_topology_deserialize_inexistant(self):
         with self.assertRaises(Topology.DoesNotExist):
             Topology.deserialize('4012999999')
@@ -335,9 +335,11 @@ class PathViewSet(GeotrekMapentityViewSet):
                 lng = step.get('lng')
                 if not isinstance(lat, (int, float)) or not isinstance(lng, (int, float)) or lat < 0 or 90 < lat or lng < -180 or 180 < lng:
                     raise Exception("Each step should contain a valid latitude and longitude")
-                path_id = step.get('path_id')
-                if not isinstance(path_id, int) or Path.objects.filter(pk=path_id).first() is None:
+                if not isinstance(step.get('path_id'), int):
                     raise Exception("Each step should contain a valid path id")
+            path_ids = {step.get('path_id') for step in steps}
+            if Path.objects.filter(pk__in=path_ids).count() != len(path_ids):
+                raise Exception("Each step should contain a valid path id")
         except Exception as exc:
             return Response({'error': '%s' % exc, }, 400)
 
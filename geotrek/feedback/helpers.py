@@ -1,6 +1,7 @@
 import copy
 import json
 import logging
+import re
 import urllib.parse
 from hashlib import md5
 
@@ -9,6 +10,9 @@ from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+# Whitespaces and separators between JSON tokens
+JSON_SEPARATORS = re.compile(r'[\s,:]*')
+
 
 class SuricateRequestManager:
 
@@ -90,6 +94,37 @@ class SuricateRequestManager:
         response = self.get_from_suricate_no_integrity_check(endpoint, url_params)
         return self.check_response_integrity(response)
 
+    def iter_suricate(self, endpoint, key, url_params={}):
+        """
+        Yield items of list `key` from a Suricate API response one at a time,
+        instead of decoding the whole JSON document before processing them
+        """
+        response = self.get_from_suricate_no_integrity_check(endpoint, url_params)
+        if response.status_code not in [200, 201]:
+            self.check_response_integrity(response)
+        content = response.content.decode()
+        decoder = json.JSONDecoder()
+        index = JSON_SEPARATORS.match(content).end()
+        if content[index:index + 1] != '{':
+            raise Exception(f"Unexpected response from Suricate API on {endpoint}")
+        index = JSON_SEPARATORS.match(content, index + 1).end()
+        while content[index] != '}':
+            name, index = decoder.raw_decode(content, index)
+            index = JSON_SEPARATORS.match(content, index).end()
+            if name == key and content[index] == '[':
+                index = JSON_SEPARATORS.match(content, index + 1).end()
+                while content[index] != ']':
+                    item, index = decoder.raw_decode(content, index)
+                    yield item
+                    index = JSON_SEPARATORS.match(content, index).end()
+                index += 1
+            else:
+                value, index = decoder.raw_decode(content, index)
+                if name == "code_ok" and value == 'false':
+                    # Raise detailed error
+                    self.check_response_integrity(response)
+            index = JSON_SEPARATORS.match(content, index).end()
+
     def get_or_retry_from_suricate(self, endpoint, url_params={}):
         try:
             return self.get_suricate(endpoint, url_params)
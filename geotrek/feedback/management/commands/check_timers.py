@@ -1,14 +1,56 @@
 import logging
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
 from django.core.management.base import BaseCommand
-from geotrek.feedback.models import TimerEvent
+from django.db import transaction
+from django.utils import timezone
+
+from geotrek.feedback.models import STATUS_WHEN_REPORT_IS_LATE, Report, ReportStatus, TimerEvent
 
 logger = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
+    help = "Send notifications for late reports and clear obsolete timers"
+
+    def notify_late_reports(self, date):
+        """ Notify each late report once, mark its timers as notified and, in workflow mode,
+        set the late status of reports in one query per status.
+        Returns the number of notified reports.
+        """
+        late_events = TimerEvent.objects.late(date).select_related('step', 'report__assigned_user')
+        late_reports = {}
+        late_event_pks = []
+        for event in late_events:
+            late_reports.setdefault(event.report_id, (event.report, event.step.identifier))
+            late_event_pks.append(event.pk)
+        if not late_reports:
+            return 0
+        with get_connection() as connection:
+            for report, step_identifier in late_reports.values():
+                report.notify_late_report(step_identifier, connection=connection)
+        with transaction.atomic():
+            if settings.SURICATE_WORKFLOW_ENABLED:
+                late_statuses = {
+                    status.identifier: status
+                    for status in ReportStatus.objects.filter(identifier__in=STATUS_WHEN_REPORT_IS_LATE.values())
+                }
+                reports_by_status = {}
+                for report, step_identifier in late_reports.values():
+                    late_status = late_statuses[STATUS_WHEN_REPORT_IS_LATE[step_identifier]]
+                    reports_by_status.setdefault(late_status, []).append(report.pk)
+                for late_status, pks in reports_by_status.items():
+                    Report.objects.filter(pk__in=pks).update(status=late_status, date_update=timezone.now())
+            TimerEvent.objects.filter(pk__in=late_event_pks).update(notification_sent=True)
+        return len(late_reports)
 
     def handle(self, *args, **options):
-        for event in TimerEvent.objects.all():
-            event.notify_if_needed()
-            if event.is_obsolete():
-                event.delete()
+        start = time.perf_counter()
+        date = timezone.now()
+        notified = self.notify_late_reports(date)
+        deleted, _ = TimerEvent.objects.obsolete(date).delete()
+        if options['verbosity'] >= 1:
+            self.stdout.write("{} late reports notified, {} obsolete timers deleted in {:.2f}s".format(
+                notified, deleted, time.perf_counter() - start))
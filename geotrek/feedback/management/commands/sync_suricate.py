@@ -48,11 +48,18 @@ class Command(BaseCommand):
             help="Test ability to reach Suricate API",
             default=False,
         )
+        parser.add_argument(
+            "--download-workers",
+            dest="download_workers",
+            type=int,
+            help="Number of threads downloading attachments (default: 4)",
+            default=None,
+        )
 
     def handle(self, *args, **options):
         verbosity = options['verbosity']
         if settings.SURICATE_WORKFLOW_ENABLED:
-            parser = SuricateParser()
+            parser = SuricateParser(download_workers=options["download_workers"])
             has_no_params = not (options["statuses"] | options["activities"] | options["test"])
             report = options["report"]
             no_notification = options["no_notif"]
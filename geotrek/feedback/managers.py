@@ -1,4 +1,5 @@
 from django.contrib.gis.db import models
+from django.db.models import F, Q
 
 from geotrek.common.mixins.managers import NoDeleteManager, ProviderChoicesMixin, TimestampedChoicesMixin
 
@@ -11,3 +12,30 @@ class SelectableUserManager(models.Manager):
 
 class ReportManager(NoDeleteManager, TimestampedChoicesMixin, ProviderChoicesMixin):
     pass
+
+
+class TimerEventQuerySet(models.QuerySet):
+
+    def late(self, date):
+        """ Timers not notified yet, whose deadline is over while their report status still hasn't changed """
+        return self.filter(notification_sent=False, deadline__lt=date,
+                           report__status__identifier=F('step__identifier'))
+
+    def obsolete(self, date):
+        """ Timers already notified, dealt with in time (report status changed) or disabled on their report """
+        return self.filter(Q(deadline__lt=date, notification_sent=True)
+                           | Q(report__status__isnull=True)
+                           | ~Q(report__status__identifier=F('step__identifier'))
+                           | Q(report__uses_timers=False))
+
+
+class TimerEventManager(models.Manager):
+
+    def get_queryset(self):
+        return TimerEventQuerySet(self.model, using=self._db)
+
+    def late(self, date):
+        return self.get_queryset().late(date)
+
+    def obsolete(self, date):
+        return self.get_queryset().obsolete(date)
@@ -28,7 +28,7 @@ from geotrek.zoning.mixins import ZoningPropertiesMixin
 from geotrek.zoning.models import District
 
 from .helpers import SuricateMessenger
-from .managers import ReportManager, SelectableUserManager
+from .managers import ReportManager, SelectableUserManager, TimerEventManager
 
 if 'geotrek.maintenance' in settings.INSTALLED_APPS:
     from geotrek.maintenance.models import Intervention
@@ -295,10 +295,11 @@ class Report(GeotrekMapEntityMixin, PicturesMixin, TimeStampedModelMixin, NoDele
             type=type
         )
 
-    def try_send_email(self, subject, message):
+    def try_send_email(self, subject, message, connection=None):
         try:
             recipient = [self.assigned_user.email] if self.assigned_user else [x[1] for x in settings.MANAGERS]
-            success = send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, recipient, fail_silently=False)
+            success = send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, recipient, fail_silently=False,
+                                connection=connection)
         except Exception as e:
             success = 0  # 0 mails successfully sent
             logger.error("Email could not be sent to report's assigned user.")
@@ -332,14 +333,14 @@ class Report(GeotrekMapEntityMixin, PicturesMixin, TimeStampedModelMixin, NoDele
         message = render_to_string("feedback/affectation_email.txt", {"report": self, "message": message})
         self.try_send_email(subject, message)
 
-    def notify_late_report(self, status_id):
+    def notify_late_report(self, status_id, connection=None):
         trad = _('Late report processing')
         subject = f"{settings.EMAIL_SUBJECT_PREFIX}{trad}"
         if settings.SURICATE_WORKFLOW_ENABLED:
             message = render_to_string(f"feedback/late_{status_id}_email.txt", {"report": self})
         else:
             message = render_to_string("feedback/late_report_email.txt", {"report": self})
-        self.try_send_email(subject, message)
+        self.try_send_email(subject, message, connection=connection)
 
     def lock_in_suricate(self):
         self.get_suricate_messenger().lock_alert(self.formatted_external_uuid)
@@ -524,6 +525,8 @@ class TimerEvent(models.Model):
     deadline = models.DateTimeField()
     notification_sent = models.BooleanField(default=False)
 
+    objects = TimerEventManager()
+
     def save(self, *args, **kwargs):
         days_nb = self.step.timer_days
         if self.report.uses_timers and days_nb > 0:
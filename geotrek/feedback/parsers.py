@@ -1,8 +1,10 @@
 import logging
 import os
 import traceback
-
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import chain, islice
 from urllib.parse import urlparse
 
 from django.conf import settings
@@ -11,7 +13,7 @@ from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.geos import Point
 from django.contrib.gis.geos.collections import Polygon
 from django.core.files.base import ContentFile
-from django.utils.timezone import make_aware
+from django.utils.timezone import make_aware, now
 
 from geotrek.common.models import Attachment, FileType
 from geotrek.feedback.models import (AttachedMessage, Report, ReportActivity,
@@ -19,16 +21,22 @@ from geotrek.feedback.models import (AttachedMessage, Report, ReportActivity,
                                      ReportStatus, WorkflowManager)
 
 from .helpers import SuricateGestionRequestManager
-from paperclip.models import attachment_upload
 
 logger = logging.getLogger(__name__)
 
 
 class SuricateParser(SuricateGestionRequestManager):
+    # Number of alerts decoded and written to database at once
+    batch_size = 100
+    # Number of threads downloading attachments
+    download_workers = 4
 
-    def __init__(self):
+    def __init__(self, download_workers=None):
         super().__init__()
+        if download_workers is not None:
+            self.download_workers = download_workers
         self.bbox = Polygon.from_bbox(settings.SPATIAL_EXTENT)
+        self.content_type = ContentType.objects.get_for_model(Report)
         self.filetype, created = FileType.objects.get_or_create(type="Photographie", structure=None)
         self.creator, created = get_user_model().objects.get_or_create(username='import', defaults={'is_active': False})
 
@@ -72,10 +80,17 @@ class SuricateParser(SuricateGestionRequestManager):
         for manager in WorkflowManager.objects.all():
             manager.notify_new_reports(reports)
 
-    def parse_report(self, report):
+    def load_references(self):
+        """Load reference tables once, instead of querying them for each report"""
+        self.statuses = {status.identifier: status for status in ReportStatus.objects.all()}
+        self.activities = {activity.identifier: activity for activity in ReportActivity.objects.all()}
+        self.magnitudes = {magnitude.suricate_label: magnitude for magnitude in ReportProblemMagnitude.objects.all()}
+        self.categories = {category.label: category for category in ReportCategory.objects.all()}
+
+    def get_report_fields(self, report):
         """
         Parse a JSON report from Suricate API
-        :return: returns True if and only if this report is imported (it is in bbox) and is new
+        :return: returns report fields if and only if this report should be imported (it is in bbox)
         """
         # Parse geom
         rep_gps = Point(report["gpslongitude"], report["gpslatitude"], srid=4326)
@@ -83,7 +98,7 @@ class SuricateParser(SuricateGestionRequestManager):
         rep_point = Point(rep_srid.coords)
 
         # Parse status
-        rep_status = ReportStatus.objects.get(identifier=report["statut"])
+        rep_status = self.statuses.get(report["statut"]) or ReportStatus.objects.get(identifier=report["statut"])
 
         # Keep or discard
         should_import = rep_point.within(self.bbox) and rep_status.identifier != 'created'
@@ -92,67 +107,116 @@ class SuricateParser(SuricateGestionRequestManager):
             should_import = should_import and bool(report["locked"])  # In Workflow mode, only import locked reports. In Management mode, import locked or unlocked reports.
             should_update_status = rep_status.identifier != 'waiting' or report["uid"] not in self.existing_uuids  # Do not override internal statuses with Waiting status
 
-        if should_import:
-            # Parse dates
-            rep_updated = self.parse_date(report["updated"])
-            rep_creation = self.parse_date(report["datedepot"])
+        if not should_import:
+            return None
 
-            # Parse magnitude
-            rep_magnitude, created = ReportProblemMagnitude.objects.get_or_create(
-                suricate_label=report["ampleur"]
-            )
-            if created:
-                logger.info(
-                    f"Created new feedback magnitude - label: {report['ampleur']}"
-                )
+        # Parse dates
+        rep_updated = self.parse_date(report["updated"])
+        rep_creation = self.parse_date(report["datedepot"])
 
-            # Parse category
-            rep_category, created = ReportCategory.objects.get_or_create(
-                label=report["type"]
-            )
-            if created:
-                logger.info(f"Created new feedback category - label: {report['type']}")
-
-            # Parse activity
-            rep_activity = ReportActivity.objects.get(identifier=report["idactivite"])
-
-            # Create report object
-            fields = {
-                "locked": bool(report["locked"]),
-                "email": report["emaildeposant"],
-                "comment": report["commentaire"],
-                "geom": rep_point,
-                "origin": report["origin"],
-                "activity": rep_activity,
-                "category": rep_category,
-                "problem_magnitude": rep_magnitude,
-                "created_in_suricate": rep_creation,
-                "last_updated_in_suricate": rep_updated,
-                "eid": str(report["shortkeylink"]),
-                "provider": "Suricate"
-            }
-
-            if should_update_status:
-                fields["status"] = rep_status
-
-            report_obj, created = Report.objects.update_or_create(
-                external_uuid=report["uid"], defaults=fields
+        # Parse magnitude
+        rep_magnitude = self.magnitudes.get(report["ampleur"])
+        if rep_magnitude is None:
+            rep_magnitude = ReportProblemMagnitude.objects.create(suricate_label=report["ampleur"])
+            self.magnitudes[report["ampleur"]] = rep_magnitude
+            logger.info(
+                f"Created new feedback magnitude - label: {report['ampleur']}"
             )
 
-            if created:
+        # Parse category
+        rep_category = self.categories.get(report["type"])
+        if rep_category is None:
+            rep_category = ReportCategory.objects.create(label=report["type"])
+            self.categories[report["type"]] = rep_category
+            logger.info(f"Created new feedback category - label: {report['type']}")
+
+        # Parse activity
+        rep_activity = self.activities.get(report["idactivite"]) or ReportActivity.objects.get(identifier=report["idactivite"])
+
+        fields = {
+            "locked": bool(report["locked"]),
+            "email": report["emaildeposant"],
+            "comment": report["commentaire"],
+            "geom": rep_point,
+            "origin": report["origin"],
+            "activity": rep_activity,
+            "category": rep_category,
+            "problem_magnitude": rep_magnitude,
+            "created_in_suricate": rep_creation,
+            "last_updated_in_suricate": rep_updated,
+            "eid": str(report["shortkeylink"]),
+            "provider": "Suricate"
+        }
+
+        if should_update_status:
+            fields["status"] = rep_status
+        return fields
+
+    def parse_reports(self, reports):
+        """
+        Parse a batch of JSON reports from Suricate API
+        New reports are saved one by one (to notify and assign them), existing ones are updated at once.
+        :return: returns pks of imported reports (in bbox) which are new
+        """
+        alerts = []
+        for report in reports:
+            fields = self.get_report_fields(report)
+            if fields is not None:
+                alerts.append((uuid.UUID(report["uid"]), report, fields))
+        if not alerts:
+            return []
+        existing = {
+            report_obj.external_uuid: report_obj
+            for report_obj in Report.objects.filter(external_uuid__in=[external_uuid for external_uuid, report, fields in alerts])
+        }
+        created = []
+        updated = {}
+        updated_fields = {"date_update"}
+        parsed = []
+        for external_uuid, report, fields in alerts:
+            report_obj = existing.get(external_uuid)
+            if report_obj is None:
+                report_obj = Report(external_uuid=external_uuid, **fields)
+                report_obj.save()
+                existing[external_uuid] = report_obj
+                created.append(report_obj.pk)
                 logger.info(
                     f"New report - id: {report['uid']}, location: {report_obj.geom}"
                 )
             else:
+                for field, value in fields.items():
+                    setattr(report_obj, field, value)
+                updated_fields.update(fields)
+                updated[report_obj.pk] = report_obj
                 self.to_delete.discard(report_obj.pk)
+            parsed.append((report_obj, report))
 
-            # Parse documents attached to report
-            self.create_documents(report["documents"], report_obj)
+        if updated:
+            date_update = now()
+            for report_obj in updated.values():
+                report_obj.date_update = date_update
+            Report.objects.bulk_update(updated.values(), sorted(updated_fields))
 
-            # Parse messages attached to report
-            self.create_messages(report["messages"], report_obj)
+        # Parse messages attached to reports
+        self.create_messages(parsed)
 
-            return report_obj.pk if created else 0
+        # Parse documents attached to reports and to their messages
+        self.create_documents([
+            (report_obj, document)
+            for report_obj, report in parsed
+            for documents in chain([report["documents"]], (message["documents"] for message in report["messages"]))
+            for document in documents
+        ])
+
+        return created
+
+    def parse_report(self, report):
+        """
+        Parse a JSON report from Suricate API
+        :return: returns pk of the report if and only if this report is imported (it is in bbox) and is new
+        """
+        created = self.parse_reports([report])
+        return created[0] if created else 0
 
     def before_get_alerts(self, verbosity=1):
         pk_and_uuid = Report.objects.values_list('pk', 'external_uuid')
@@ -163,6 +227,7 @@ class SuricateParser(SuricateGestionRequestManager):
         else:
             self.existing_uuids = []
             self.to_delete = set()
+        self.load_references()
         if verbosity >= 1:
             logger.info("Starting reports parsing from Suricate\n")
 
@@ -176,13 +241,13 @@ class SuricateParser(SuricateGestionRequestManager):
         Get reports list from Suricate Rest API
         :return: returns True if and only if reports was imported (it is in bbox)
         """
-        data = self.get_suricate("wsGetAlerts")
+        alerts = self.iter_suricate("wsGetAlerts", "alertes")
         pk = int(pk)
         if pk:
             formatted_external_uuid = Report.objects.get(pk=pk).formatted_external_uuid
-            report = next(report for report in data["alertes"] if report["uid"] == formatted_external_uuid)
+            report = next(report for report in alerts if report["uid"] == formatted_external_uuid)
         else:
-            report = data["alertes"][0]
+            report = next(alerts)
         if verbosity >= 2:
             logger.info(f"Processing report {report['uid']}\n")
         self.before_get_alerts(verbosity)
@@ -194,30 +259,47 @@ class SuricateParser(SuricateGestionRequestManager):
     def get_alerts(self, verbosity=1, should_notify=True):
         """
         Get reports list from Suricate Rest API
+        Alerts are decoded and imported by batches of `batch_size`, while reading the response.
         :return: returns True if and only if reports was imported (it is in bbox)
         """
         self.before_get_alerts(verbosity)
-        data = self.get_suricate("wsGetAlerts")
-        total_reports = len(data["alertes"])
-        current_report = 1
+        alerts = self.iter_suricate("wsGetAlerts", "alertes")
+        total_reports = 0
         reports_created = set()
         # Parse alerts
-        for report in data["alertes"]:
+        while True:
+            reports = list(islice(alerts, self.batch_size))
+            if not reports:
+                break
             if verbosity == 2:
-                logger.info(f"Processing report {report['uid']} - {current_report}/{total_reports} \n")
-            report_created = self.parse_report(report)
-            if report_created:
-                reports_created.add(report_created)
-            current_report += 1
+                for report in reports:
+                    total_reports += 1
+                    logger.info(f"Processing report {report['uid']} - {total_reports} \n")
+            else:
+                total_reports += len(reports)
+            reports_created.update(self.parse_reports(reports))
         if verbosity >= 1:
             logger.info(f"Parsed {total_reports} reports from Suricate\n")
         if settings.SURICATE_WORKFLOW_SETTINGS.get("SKIP_MANAGER_MODERATION"):
             should_notify = False
         self.after_get_alerts(reports_created, should_notify)
 
-    def create_documents(self, documents, parent):
-        """Parse documents list from Suricate Rest API"""
-        for document in documents:
+    def create_documents(self, documents):
+        """
+        Parse documents list from Suricate Rest API, given as (report, document) pairs
+        Missing files are downloaded concurrently, and saved one by one.
+        """
+        if not documents:
+            return
+        attachments = {
+            (attachment.object_id, attachment.title): attachment
+            for attachment in Attachment.objects.filter(
+                content_type=self.content_type,
+                object_id__in={parent.pk for parent, document in documents}
+            )
+        }
+        to_download = {}
+        for parent, document in documents:
 
             file_id = document["id"]
             file_url = document["url"]
@@ -225,54 +307,75 @@ class SuricateParser(SuricateGestionRequestManager):
             uid = uid + str(file_id)
             parsed_url = urlparse(file_url)
 
-            attachment, created = Attachment.objects.get_or_create(
-                object_id=parent.pk,
-                title=uid,
-                content_type=ContentType.objects.get_for_model(parent),
-                defaults={
-                    'filetype': self.filetype,
-                    'creator': self.creator
-                }
-            )
-            attachment_final_name = attachment.prepare_file_suffix(basename=uid + ext)
-            attachment_final_path = attachment_upload(attachment, attachment_final_name)
+            attachment = attachments.get((parent.pk, uid))
+            if attachment is None:
+                attachment = Attachment.objects.create(
+                    object_id=parent.pk,
+                    title=uid,
+                    content_type=self.content_type,
+                    filetype=self.filetype,
+                    creator=self.creator
+                )
+                attachments[(parent.pk, uid)] = attachment
             # If attachment is either new or had a failed download last time => download file
             # If attachment isn't new and was downloaded before => skip this file
 
-            if attachment.attachment_file.storage.exists(attachment_final_path):
+            if attachment.attachment_file:
                 continue
 
             if parsed_url.scheme in ('http', 'https'):
-                response = self.get_attachment_from_suricate(file_url)
+                to_download[attachment.pk] = (attachment, uid + ext, file_url)
+
+        if not to_download:
+            return
+        with ThreadPoolExecutor(max_workers=max(self.download_workers, 1)) as executor:
+            responses = executor.map(self.get_attachment_from_suricate,
+                                     [file_url for attachment, basename, file_url in to_download.values()])
+            for (attachment, basename, file_url), response in zip(to_download.values(), responses):
                 try:
                     if response.status_code in [200, 201]:
                         f = ContentFile(response.content)
+                        attachment_final_name = attachment.prepare_file_suffix(basename=basename)
                         attachment.attachment_file.save(attachment_final_name, f, save=False)
                     attachment.save(**{'skip_file_save': True})
                 except Exception as e:
                     logger.error(f"Could not download image : {file_url} \n{e}\n{traceback.format_exc()}")
 
-    def create_messages(self, messages, parent):
-        """Parse messages list from Suricate Rest API"""
-        for message in messages:
-            # Parse date
-            msg_creation = self.parse_date(message["date"])
-
-            # Parse fields
-            fields = {
-                "author": message["redacteur"],
-                "content": message["texte"],
-                "type": message["type"],
-            }
-
-            # Create message object
-            message_obj, created = AttachedMessage.objects.update_or_create(
-                identifier=message["id"], date=msg_creation, report=parent, defaults=fields
-            )
-            if created:
-                logger.info(
-                    f"New Message - id: {message['id']}, parent: {parent.external_uuid}"
-                )
+    def create_messages(self, reports):
+        """Parse messages list from Suricate Rest API, given as (report, JSON report) pairs"""
+        messages = {
+            (message.identifier, message.date, message.report_id): message
+            for message in AttachedMessage.objects.filter(report__in=[parent for parent, report in reports])
+        }
+        created = []
+        updated = {}
+        for parent, report in reports:
+            for message in report["messages"]:
+                # Parse date
+                msg_creation = self.parse_date(message["date"])
+
+                # Parse fields
+                fields = {
+                    "author": message["redacteur"],
+                    "content": message["texte"],
+                    "type": message["type"],
+                }
 
-            # Parse documents attached to message
-            self.create_documents(message["documents"], parent)
+                key = (message["id"], msg_creation, parent.pk)
+                message_obj = messages.get(key)
+                if message_obj is None:
+                    message_obj = AttachedMessage(identifier=message["id"], date=msg_creation, report=parent, **fields)
+                    messages[key] = message_obj
+                    created.append(message_obj)
+                    logger.info(
+                        f"New Message - id: {message['id']}, parent: {parent.external_uuid}"
+                    )
+                elif any(getattr(message_obj, field) != value for field, value in fields.items()):
+                    for field, value in fields.items():
+                        setattr(message_obj, field, value)
+                    if message_obj.pk:
+                        updated[message_obj.pk] = message_obj
+
+        # Create message objects
+        AttachedMessage.objects.bulk_create(created)
+        AttachedMessage.objects.bulk_update(updated.values(), ["author", "content", "type"])
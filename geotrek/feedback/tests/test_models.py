@@ -2,6 +2,7 @@ import json
 import uuid
 from datetime import timedelta
 from hashlib import md5
+from io import StringIO
 from unittest import mock
 
 from django.conf import settings
@@ -9,7 +10,7 @@ from django.contrib.admin.models import DELETION, LogEntry
 from django.contrib.admin.sites import AdminSite
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.geos import Point
-from django.core import management
+from django.core import mail, management
 from django.test.testcases import TestCase
 from django.test.utils import override_settings
 from django.utils import timezone
@@ -132,6 +133,19 @@ class TestTimerEventClass(SuricateWorkflowTests):
         # Event2 deleted as well as the others because running the command makes it obsolete
         self.assertEqual(TimerEvent.objects.count(), 0)
 
+    @override_settings(SURICATE_WORKFLOW_ENABLED=True)
+    @freeze_time("2099-07-04")
+    def test_command_notifies_late_reports(self):
+        output = StringIO()
+        management.call_command("check_timers", stdout=output)
+        self.assertIn("2 late reports notified, 3 obsolete timers deleted", output.getvalue())
+        self.assertEqual(len(mail.outbox), 2)
+        self.waiting_report.refresh_from_db()
+        self.programmed_report.refresh_from_db()
+        self.assertEqual(self.waiting_report.status, self.late_intervention_status)
+        self.assertEqual(self.programmed_report.status, self.late_resolution_status)
+        self.assertEqual(TimerEvent.objects.count(), 0)
+
 
 class MockRequest:
     pass
@@ -449,6 +449,42 @@ class SuricateAPITests(SuricateTests):
         self.assertEqual(Report.objects.filter(external_uuid="742CBF16-5056-AA2B-DD1FD403F72D6B9B").count(), 0)
         self.assertEqual(Report.objects.count(), 7)
 
+    @override_settings(SURICATE_WORKFLOW_ENABLED=True)
+    @mock.patch("geotrek.feedback.parsers.SuricateParser.batch_size", 3)
+    @mock.patch("geotrek.feedback.parsers.logger")
+    @mock.patch("geotrek.feedback.helpers.requests.get")
+    def test_sync_by_batches_updates_existing_objects(self, mocked_get, mocked_logger):
+        """Test reports and messages imported by batches are updated on next sync, without duplicates"""
+        self.build_get_request_patch(mocked_get)
+        call_command("sync_suricate", verbosity=0, download_workers=2)
+        self.assertEqual(Report.objects.count(), 8)
+        self.assertEqual(AttachedMessage.objects.count(), 44)
+        self.assertEqual(Attachment.objects.count(), 6)
+        for atta in Attachment.objects.all():
+            self.assertTrue(atta.attachment_file.storage.exists(atta.attachment_file.name), atta.attachment_file.name)
+        r = Report.objects.get(external_uuid="7EE5DF25-5056-AA2B-DDBEEFA5768CD53E")
+        Report.objects.filter(pk=r.pk).update(comment="I was changed")
+        message = AttachedMessage.objects.filter(report=r).first()
+        AttachedMessage.objects.filter(pk=message.pk).update(content="I was changed")
+        call_command("sync_suricate", verbosity=0, download_workers=2)
+        self.assertEqual(Report.objects.count(), 8)
+        self.assertEqual(AttachedMessage.objects.count(), 44)
+        self.assertEqual(Attachment.objects.count(), 6)
+        r.refresh_from_db()
+        message.refresh_from_db()
+        self.assertEqual(r.comment, "Lames cassées")
+        self.assertNotEqual(message.content, "I was changed")
+
+    @mock.patch("geotrek.feedback.helpers.requests.get")
+    def test_iter_suricate_yields_items(self, mocked_get):
+        self.build_get_request_patch(mocked_get)
+        alerts = list(SuricateRequestManager().iter_suricate("wsGetAlerts", "alertes"))
+        self.assertEqual(len(alerts), 10)
+        self.assertEqual(alerts[0]["uid"], "7EE5DF25-5056-AA2B-DDBEEFA5768CD53E")
+        self.build_failed_request_patch(mocked_get)
+        with self.assertRaises(Exception):
+            list(SuricateRequestManager().iter_suricate("wsGetAlerts", "alertes"))
+
 
 class SuricateInterfaceTests(SuricateTests):
 
@@ -155,7 +155,15 @@ class Command(BaseCommand):
                         "Change your --eid-field option"))
                     break
 
-                for feature in layer:
+                try:
+                    # Snap all points of the layer on paths at once
+                    topologies = Topology.deserialize_points([feature.geom for feature in layer]) \
+                        if settings.TREKKING_TOPOLOGY_ENABLED else [None] * len(layer)
+                except IndexError:
+                    # No path to snap on, error will be raised for each feature
+                    topologies = [None] * len(layer)
+
+                for feature, topology in zip(layer, topologies):
                     feature_geom = feature.geom
                     name = feature.get(field_name) if field_name in available_fields else options.get('name_default')
                     if feature_geom.geom_type == 'MultiPoint':
@@ -185,7 +193,7 @@ class Command(BaseCommand):
                     eid = feature.get(field_eid) if field_eid in available_fields else None
 
                     self.create_infrastructure(feature_geom, name, type, category, use_structure,
-                                               condition, structure, description, year, verbosity, eid)
+                                               condition, structure, description, year, verbosity, eid, topology)
 
             transaction.savepoint_commit(sid)
             if verbosity >= 2:
@@ -197,7 +205,7 @@ class Command(BaseCommand):
             raise
 
     def create_infrastructure(self, geometry, name, type, category, use_structure,
-                              condition, structure, description, year, verbosity, eid):
+                              condition, structure, description, year, verbosity, eid, topology=None):
 
         infra_type, created = InfrastructureType.objects.get_or_create(label=type, type=category,
                                                                        structure=structure if use_structure else None)
@@ -236,10 +244,11 @@ class Command(BaseCommand):
                     infra.conditions.add(condition_type)
         if settings.TREKKING_TOPOLOGY_ENABLED:
             try:
-                geometry.coord_dim = 2
-                geometry = geometry.transform(settings.API_SRID, clone=True)
-                serialized = '{"lng": %s, "lat": %s}' % (geometry.x, geometry.y)
-                topology = Topology.deserialize(serialized)
+                if topology is None:
+                    geometry.coord_dim = 2
+                    geometry = geometry.transform(settings.API_SRID, clone=True)
+                    serialized = '{"lng": %s, "lat": %s}' % (geometry.x, geometry.y)
+                    topology = Topology.deserialize(serialized)
                 infra.mutate(topology)
             except IndexError:
                 raise GEOSException('Invalid Geometry type. You need 1 path')
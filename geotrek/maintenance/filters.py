@@ -1,6 +1,8 @@
+from functools import reduce
+from operator import or_
+
 from django.db.models import Q
 from django.conf import settings
-from django.contrib.gis.geos import GeometryCollection
 from django.utils.translation import gettext_lazy as _
 from django.utils.text import format_lazy
 from django_filters import ChoiceFilter, MultipleChoiceFilter, DateFromToRangeFilter, ModelMultipleChoiceFilter
@@ -33,19 +35,25 @@ class PolygonInterventionFilterMixin:
         return value
 
     def filter(self, qs, values):
+        """ Interventions whose target intersects one of the geometries, has no geometry or does not exist anymore,
+        with one spatial subquery per type of target """
         if not values:
             return qs
-        geom_intersect = GeometryCollection([self.get_geom(value) for value in values])
-        interventions = []
-        for element in qs:
-            if element.target:
-                if not element.target.geom or element.target.geom.intersects(geom_intersect):
-                    interventions.append(element.pk)
-            elif element.target_type:
-                interventions.append(element.pk)
-
-        qs = qs.filter(pk__in=interventions).existing()
-        return qs
+        geoms = [self.get_geom(value) for value in values]
+        condition = Q(pk__in=[])
+        for target_type, model in qs.target_models():
+            geom_field = qs.get_target_geom_field(model)
+            if geom_field is None:
+                condition |= Q(target_type=target_type)
+                continue
+            targets = model._base_manager.all()
+            intersecting = targets.filter(
+                reduce(or_, [Q(**{'{}__intersects'.format(geom_field): geom}) for geom in geoms])
+                | Q(**{'{}__isnull'.format(geom_field): True})
+            )
+            missing = ~Q(target_id__in=targets.values('pk'))
+            condition |= Q(target_type=target_type) & (Q(target_id__in=intersecting.values('pk')) | missing)
+        return qs.filter(condition).existing()
 
 
 class PolygonProjectFilterMixin(PolygonInterventionFilterMixin):
@@ -56,7 +64,7 @@ class PolygonProjectFilterMixin(PolygonInterventionFilterMixin):
         if not values:
             return qs
         interventions = Intervention.objects.all()
-        return qs.filter(interventions__in=super().filter(interventions, values).values_list('id', flat=True))
+        return qs.filter(interventions__in=super().filter(interventions, values).values('pk'))
 
 
 class InterventionIntersectionFilterRestrictedAreaType(PolygonInterventionFilterMixin,
@@ -1,10 +1,80 @@
-from django.db.models import Min, Max, Func, Case, When, IntegerField
-from django.db.models.functions import ExtractYear, Cast
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.gis.db.models import GeometryField
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import (Min, Max, Func, Case, When, IntegerField, FloatField, F, OuterRef, Q, Subquery,
+                              Sum, Value)
+from django.db.models.functions import ExtractYear, Cast, Coalesce
 
-from geotrek.common.mixins.managers import NoDeleteManager
+from geotrek.common.mixins.managers import NoDeleteManager, NoDeleteQuerySet
+
+
+class InterventionQuerySet(NoDeleteQuerySet):
+    # Targets whose geometry is the one of a related object
+    target_geom_fields = {'signage.blade': 'signage__geom'}
+
+    @classmethod
+    def get_target_geom_field(cls, model):
+        """ Lookup of the geometry of interventions targets, None if they have none """
+        if model._meta.label_lower in cls.target_geom_fields:
+            return cls.target_geom_fields[model._meta.label_lower]
+        try:
+            model._meta.get_field('geom')
+        except FieldDoesNotExist:
+            return None
+        return 'geom'
+
+    def target_models(self):
+        """ Content types and models of all interventions targets """
+        target_types = ContentType.objects.filter(pk__in=self.model.objects.values('target_type'))
+        return [(target_type, target_type.model_class()) for target_type in target_types
+                if target_type.model_class() is not None]
+
+    def annotate_costs(self):
+        """ Mandays and costs of interventions computed by the database,
+        used by total_manday, total_cost_mandays and total_cost properties """
+        from geotrek.maintenance.models import ManDay
+        mandays = ManDay.objects.filter(intervention=OuterRef('pk')).order_by().values('intervention')
+        nb_days = mandays.annotate(total=Sum('nb_days')).values('total')
+        cost = mandays.annotate(total=Sum(F('nb_days') * F('job__cost'))).values('total')
+        return self.annotate(
+            annotated_total_manday=Coalesce(Cast(Subquery(nb_days), FloatField()), Value(0.0)),
+            annotated_total_cost_mandays=Coalesce(Cast(Subquery(cost), FloatField()), Value(0.0)),
+        ).annotate(
+            annotated_total_cost=F('annotated_total_cost_mandays')
+            + Coalesce('material_cost', Value(0.0)) + Coalesce('heliport_cost', Value(0.0))
+            + Coalesce('contractor_cost', Value(0.0)),
+        )
+
+    def annotate_target_geom(self):
+        """ Geometry of interventions targets, used by geom property """
+        cases = []
+        for target_type, model in self.target_models():
+            geom_field = self.get_target_geom_field(model)
+            if geom_field is not None:
+                geoms = model._base_manager.filter(pk=OuterRef('target_id')).values(geom_field)[:1]
+                cases.append(When(target_type=target_type, then=Subquery(geoms)))
+        if not cases:
+            return self.annotate(annotated_target_geom=Value(None, output_field=GeometryField(srid=settings.SRID)))
+        return self.annotate(annotated_target_geom=Case(*cases, output_field=GeometryField(srid=settings.SRID)))
+
+    def target_paths(self):
+        """ Paths of interventions targets (of their signage for blades) """
+        from geotrek.core.models import Path, Topology
+        topologies = Q(pk__in=[])
+        for target_type, model in self.target_models():
+            target_ids = self.filter(target_type=target_type).values('target_id')
+            if issubclass(model, Topology):
+                topologies |= Q(pk__in=target_ids)
+            elif model._meta.label_lower == 'signage.blade':
+                topologies |= Q(pk__in=model.objects.filter(pk__in=target_ids).values('signage'))
+        return Path.objects.filter(aggregations__topo_object__in=Topology.objects.filter(topologies)).distinct()
 
 
 class InterventionManager(NoDeleteManager):
+    def get_queryset(self):
+        return InterventionQuerySet(self.model, using=self._db)
+
     def year_choices(self):
         """ Get all range years between begin_date and end_date and concatenates distinct years """
         qs = (self.existing().all().annotate(
@@ -19,7 +89,29 @@ class InterventionManager(NoDeleteManager):
         return [(year, year) for year in values]
 
 
+class ProjectQuerySet(NoDeleteQuerySet):
+    def annotate_interventions_total_cost(self):
+        """ Total cost of existing interventions of projects computed by the database,
+        used by interventions_total_cost property """
+        from geotrek.maintenance.models import Intervention, ManDay
+        interventions = Intervention.objects.existing().filter(project=OuterRef('pk')).order_by().values('project')
+        costs = interventions.annotate(total=Sum(
+            Coalesce('material_cost', Value(0.0)) + Coalesce('heliport_cost', Value(0.0))
+            + Coalesce('contractor_cost', Value(0.0))
+        )).values('total')
+        mandays = ManDay.objects.filter(intervention__project=OuterRef('pk'), intervention__deleted=False) \
+            .order_by().values('intervention__project')
+        mandays_costs = mandays.annotate(total=Sum(F('nb_days') * F('job__cost'))).values('total')
+        return self.annotate(
+            annotated_interventions_total_cost=Coalesce(Subquery(costs), Value(0.0))
+            + Coalesce(Cast(Subquery(mandays_costs), FloatField()), Value(0.0))
+        )
+
+
 class ProjectManager(NoDeleteManager):
+    def get_queryset(self):
+        return ProjectQuerySet(self.model, using=self._db)
+
     def year_choices(self):
         bounds = self.existing().aggregate(min=Min('begin_year'), max=Max('end_year'))
         if not bounds['min'] or not bounds['max']:
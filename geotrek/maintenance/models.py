@@ -199,6 +199,8 @@ class Intervention(ZoningPropertiesMixin, AddPropertyMixin, GeotrekMapEntityMixi
 
     @property
     def total_manday(self):
+        if hasattr(self, 'annotated_total_manday'):
+            return self.annotated_total_manday
         total = 0.0
         for md in self.manday_set.all():
             total += float(md.nb_days)
@@ -210,6 +212,8 @@ class Intervention(ZoningPropertiesMixin, AddPropertyMixin, GeotrekMapEntityMixi
 
     @property
     def total_cost_mandays(self):
+        if hasattr(self, 'annotated_total_cost_mandays'):
+            return self.annotated_total_cost_mandays
         total = 0.0
         for md in self.manday_set.all():
             total += md.cost
@@ -221,6 +225,8 @@ class Intervention(ZoningPropertiesMixin, AddPropertyMixin, GeotrekMapEntityMixi
 
     @property
     def total_cost(self):
+        if hasattr(self, 'annotated_total_cost'):
+            return self.annotated_total_cost
         return self.total_cost_mandays + \
             (self.material_cost or 0) + \
             (self.heliport_cost or 0) + \
@@ -237,7 +243,9 @@ class Intervention(ZoningPropertiesMixin, AddPropertyMixin, GeotrekMapEntityMixi
     @property
     def geom(self):
         if self._geom is None:
-            if self.target:
+            if hasattr(self, 'annotated_target_geom'):
+                self._geom = self.annotated_target_geom
+            elif self.target:
                 self._geom = self.target.geom
         return self._geom
 
@@ -469,22 +477,12 @@ class Project(ZoningPropertiesMixin, AddPropertyMixin, GeotrekMapEntityMixin, Ti
 
     @property
     def paths(self):
-        s = []
-        for i in self.interventions.existing():
-            if hasattr(i, 'paths'):
-                s += i.paths
-        return Path.objects.filter(pk__in=[p.pk for p in set(s)])
+        return self.interventions.existing().target_paths()
 
     @property
     def trails(self):
-        s = []
-        for i in self.interventions.existing():
-            if i.target and hasattr(i.target, 'paths'):
-                for p in i.target.paths.all():
-                    for t in p.trails.all():
-                        s.append(t.pk)
-
-        return Trail.objects.filter(pk__in=s)
+        paths = self.interventions.existing().target_paths()
+        return Trail.objects.filter(pk__in=Trail.objects.existing().filter(aggregations__path__in=paths).values('pk'))
 
     @property
     def signages(self):
@@ -511,7 +509,7 @@ class Project(ZoningPropertiesMixin, AddPropertyMixin, GeotrekMapEntityMixin, Ti
         """ Merge all interventions geometry into a collection
         """
         if self._geom is None:
-            interventions = Intervention.objects.existing().filter(project=self)
+            interventions = Intervention.objects.existing().filter(project=self).annotate_target_geom()
             geoms = []
             for i in interventions:
                 geom = i.geom
@@ -579,11 +577,12 @@ class Project(ZoningPropertiesMixin, AddPropertyMixin, GeotrekMapEntityMixin, Ti
 
     @property
     def interventions_total_cost(self):
-        total = 0
-        qs = self.interventions.existing()
-        for i in qs.prefetch_related('manday_set', 'manday_set__job'):
-            total += i.total_cost
-        return total
+        if hasattr(self, 'annotated_interventions_total_cost'):
+            return self.annotated_interventions_total_cost
+        if self.pk is None:
+            return 0
+        return Project.objects.filter(pk=self.pk).annotate_interventions_total_cost() \
+            .values_list('annotated_interventions_total_cost', flat=True).get()
 
     @classproperty
     def interventions_total_cost_verbose_name(cls):
@@ -493,6 +493,18 @@ class InterventionIntersectionFilterZoningTest(TestCase):
         self.assertTrue(filter.is_valid())
         self.assertEqual(len(filter.qs), 2)
 
+    def test_filter_city_queries_do_not_depend_on_interventions_count(self):
+        city = CityFactory.create(geom=self.geom_in_1)
+        filter = InterventionFilterSet(data={'city': [city]})
+        self.assertTrue(filter.is_valid())
+        with self.assertNumQueries(2):  # target content types, filtered interventions
+            self.assertEqual(len(filter.qs), 7)
+        InterventionFactory.create_batch(5, target=self.topo_in_2)
+        filter = InterventionFilterSet(data={'city': [city]})
+        self.assertTrue(filter.is_valid())
+        with self.assertNumQueries(2):
+            self.assertEqual(len(filter.qs), 7)
+
     def test_filter_in_1_district(self):
         """
         We should have 1 interventions on topologies, 1 intervention on sites, 1 intervention on courses,
@@ -10,7 +10,7 @@ from geotrek.core.tests.factories import (PathFactory, StakeFactory,
                                           TopologyFactory, TrailFactory)
 from geotrek.infrastructure.models import Infrastructure
 from geotrek.infrastructure.tests.factories import InfrastructureFactory
-from geotrek.maintenance.models import Funding, Intervention, ManDay
+from geotrek.maintenance.models import Funding, Intervention, ManDay, Project
 from geotrek.maintenance.tests.factories import (
     FundingFactory, InfrastructureInterventionFactory,
     InfrastructurePointInterventionFactory, InterventionDisorderFactory,
@@ -294,6 +294,35 @@ class InterventionTest(TestCase):
         )
         self.assertEqual(interv.total_cost, 507)
 
+    def test_costs_annotated(self):
+        interv = InfrastructureInterventionFactory.create(material_cost=1, heliport_cost=2, contractor_cost=4)
+        ManDayFactory.create(nb_days=2, job=InterventionJobFactory.create(cost=10), intervention=interv)
+        interv = Intervention.objects.get(pk=interv.pk)
+        annotated = Intervention.objects.annotate_costs().get(pk=interv.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(annotated.total_manday, 3)
+            self.assertEqual(annotated.total_cost_mandays, 520)
+            self.assertEqual(annotated.total_cost, 527)
+        self.assertEqual((interv.total_manday, interv.total_cost_mandays, interv.total_cost), (3, 520, 527))
+
+    def test_target_geom_annotated(self):
+        interv = InfrastructureInterventionFactory.create()
+        blade_interv = InterventionFactory.create(target=BladeFactory.create())
+        interventions = Intervention.objects.annotate_target_geom().in_bulk([interv.pk, blade_interv.pk])
+        with self.assertNumQueries(0):
+            self.assertEqual(interventions[interv.pk].geom, interv.target.geom)
+            self.assertEqual(interventions[blade_interv.pk].geom, blade_interv.target.signage.geom)
+
+    def test_project_interventions_total_cost(self):
+        project = ProjectFactory.create()
+        InfrastructureInterventionFactory.create(project=project, material_cost=1, heliport_cost=2, contractor_cost=4)
+        InfrastructureInterventionFactory.create(project=project, material_cost=10, deleted=True)
+        with self.assertNumQueries(1):
+            self.assertEqual(project.interventions_total_cost, 507)
+        annotated = Project.objects.annotate_interventions_total_cost().get(pk=project.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(annotated.interventions_total_cost, 507)
+
     def test_disorders_display(self):
         interv = InterventionFactory.create()
         interv.disorders.add(InterventionDisorderFactory.create(disorder="foobar"))
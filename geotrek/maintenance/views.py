@@ -55,7 +55,7 @@ class InterventionFormatList(MapEntityFormat, InterventionList):
     def get_queryset(self):
         """Returns all interventions joined with a new column for each job, to record the total cost of each job in each intervention"""
 
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().annotate_costs().annotate_target_geom()
 
         if settings.ENABLE_JOBS_COSTS_DETAILED_EXPORT:
 
@@ -187,7 +187,7 @@ class InterventionViewSet(GeotrekMapentityViewSet):
     def get_queryset(self):
         qs = self.model.objects.existing()
         if self.format_kwarg == 'geojson':
-            qs = qs.only('id', 'name')
+            qs = qs.only('id', 'name').annotate_target_geom()
         else:
             qs = qs.select_related("stake", "status", "type", "target_type").prefetch_related('target')
         return qs
@@ -217,6 +217,9 @@ class ProjectFormatList(MapEntityFormat, ProjectList):
         'cities', 'districts', 'areas',
     ]
 
+    def get_queryset(self):
+        return super().get_queryset().annotate_interventions_total_cost()
+
 
 class ProjectDetail(MapEntityDetail):
     queryset = Project.objects.existing()
@@ -28,25 +28,24 @@ class SiteFilterSet(ZoningFilterSet, StructureRelatedFilterSet):
         ]
 
     def filter_orientation(self, qs, name, values):
-        q = Q()
-        for value in values:
-            q |= Q(**{'{}__contains'.format(name): value})
-        return qs.filter(q).get_ancestors(include_self=True)
+        if not values:
+            return qs
+        return qs.filter(**{'{}_in_hierarchy__overlap'.format(name): values})
 
     def filter_super(self, qs, name, values):
         if not values:
             return qs
-        return qs.filter(**{'{}__in'.format(name): values}).get_ancestors(include_self=True)
+        return qs.filter(practices_in_hierarchy__overlap=[value.pk for value in values])
 
     def filter_sector(self, qs, name, values):
         if not values:
             return qs
-        return qs.filter(practice__sector__in=values).get_ancestors(include_self=True)
+        return qs.filter(sectors_in_hierarchy__overlap=[value.pk for value in values])
 
     def filter_manager(self, qs, name, values):
         if not values:
             return qs
-        return qs.filter(managers__in=values).get_ancestors(include_self=True)
+        return qs.filter(managers_in_hierarchy__overlap=[value.pk for value in values])
 
 
 class CourseFilterSet(ZoningFilterSet, StructureRelatedFilterSet):
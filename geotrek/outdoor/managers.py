@@ -1,12 +1,63 @@
 from django.contrib.gis.db import models
+from django.db import connection
 from django.db.models import Manager
 from mptt.managers import TreeManager
 
 from geotrek.common.mixins.managers import ProviderChoicesMixin
 
+# Attributes of sites aggregated over themselves and their descendants,
+# `s` being the updated site and `d` its descendants
+UPDATE_HIERARCHY_ATTRIBUTES = """
+    UPDATE outdoor_site AS s SET
+        practices_in_hierarchy = ARRAY(
+            SELECT DISTINCT d.practice_id FROM outdoor_site AS d
+            WHERE d.tree_id = s.tree_id AND d.lft BETWEEN s.lft AND s.rght AND d.practice_id IS NOT NULL
+            ORDER BY d.practice_id),
+        sectors_in_hierarchy = ARRAY(
+            SELECT DISTINCT p.sector_id FROM outdoor_site AS d JOIN outdoor_practice AS p ON p.id = d.practice_id
+            WHERE d.tree_id = s.tree_id AND d.lft BETWEEN s.lft AND s.rght AND p.sector_id IS NOT NULL
+            ORDER BY p.sector_id),
+        ratings_in_hierarchy = ARRAY(
+            SELECT DISTINCT r.rating_id FROM outdoor_site AS d JOIN outdoor_site_ratings AS r ON r.site_id = d.id
+            WHERE d.tree_id = s.tree_id AND d.lft BETWEEN s.lft AND s.rght
+            ORDER BY r.rating_id),
+        managers_in_hierarchy = ARRAY(
+            SELECT DISTINCT m.organism_id FROM outdoor_site AS d JOIN outdoor_site_managers AS m ON m.site_id = d.id
+            WHERE d.tree_id = s.tree_id AND d.lft BETWEEN s.lft AND s.rght
+            ORDER BY m.organism_id),
+        orientation_in_hierarchy = ARRAY(
+            SELECT DISTINCT o.value FROM outdoor_site AS d,
+                jsonb_array_elements_text(CASE WHEN jsonb_typeof(d.orientation) = 'array' THEN d.orientation ELSE '[]' END) AS o
+            WHERE d.tree_id = s.tree_id AND d.lft BETWEEN s.lft AND s.rght
+            ORDER BY o.value),
+        wind_in_hierarchy = ARRAY(
+            SELECT DISTINCT w.value FROM outdoor_site AS d,
+                jsonb_array_elements_text(CASE WHEN jsonb_typeof(d.wind) = 'array' THEN d.wind ELSE '[]' END) AS w
+            WHERE d.tree_id = s.tree_id AND d.lft BETWEEN s.lft AND s.rght
+            ORDER BY w.value)
+"""
+
 
 class SiteManager(TreeManager, ProviderChoicesMixin):
-    pass
+
+    def update_hierarchy_attributes(self, site_ids):
+        """ Recompute attributes aggregated over descendants (practices, ratings, orientation...)
+        of given sites and of their ancestors, which are the only ones depending on them.
+        """
+        site_ids = [pk for pk in site_ids if pk is not None]
+        if not site_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(UPDATE_HIERARCHY_ATTRIBUTES + """
+                FROM outdoor_site AS c
+                WHERE c.id = ANY(%s) AND s.tree_id = c.tree_id AND s.lft <= c.lft AND s.rght >= c.rght
+            """, [site_ids])
+
+    def update_hierarchy_attributes_containing(self, field, value):
+        """ Recompute attributes aggregated over descendants of sites having value in given
+        *_in_hierarchy field, e.g. when value was removed without any signal on sites.
+        """
+        self.update_hierarchy_attributes(self.filter(**{'{}__contains'.format(field): [value]}).values_list('pk', flat=True))
 
 
 class CourseOrderedChildManager(models.Manager):
@@ -0,0 +1,71 @@
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('outdoor', '0045_alter_rating_color'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='site',
+            name='practices_in_hierarchy',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='site',
+            name='sectors_in_hierarchy',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='site',
+            name='ratings_in_hierarchy',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='site',
+            name='managers_in_hierarchy',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='site',
+            name='orientation_in_hierarchy',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=16), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='site',
+            name='wind_in_hierarchy',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=16), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.RunSQL("""
+            UPDATE outdoor_site AS s SET
+                practices_in_hierarchy = ARRAY(
+                    SELECT DISTINCT d.practice_id FROM outdoor_site AS d
+                    WHERE d.tree_id = s.tree_id AND d.lft BETWEEN s.lft AND s.rght AND d.practice_id IS NOT NULL
+                    ORDER BY d.practice_id),
+                sectors_in_hierarchy = ARRAY(
+                    SELECT DISTINCT p.sector_id FROM outdoor_site AS d JOIN outdoor_practice AS p ON p.id = d.practice_id
+                    WHERE d.tree_id = s.tree_id AND d.lft BETWEEN s.lft AND s.rght AND p.sector_id IS NOT NULL
+                    ORDER BY p.sector_id),
+                ratings_in_hierarchy = ARRAY(
+                    SELECT DISTINCT r.rating_id FROM outdoor_site AS d JOIN outdoor_site_ratings AS r ON r.site_id = d.id
+                    WHERE d.tree_id = s.tree_id AND d.lft BETWEEN s.lft AND s.rght
+                    ORDER BY r.rating_id),
+                managers_in_hierarchy = ARRAY(
+                    SELECT DISTINCT m.organism_id FROM outdoor_site AS d JOIN outdoor_site_managers AS m ON m.site_id = d.id
+                    WHERE d.tree_id = s.tree_id AND d.lft BETWEEN s.lft AND s.rght
+                    ORDER BY m.organism_id),
+                orientation_in_hierarchy = ARRAY(
+                    SELECT DISTINCT o.value FROM outdoor_site AS d,
+                        jsonb_array_elements_text(CASE WHEN jsonb_typeof(d.orientation) = 'array' THEN d.orientation ELSE '[]' END) AS o
+                    WHERE d.tree_id = s.tree_id AND d.lft BETWEEN s.lft AND s.rght
+                    ORDER BY o.value),
+                wind_in_hierarchy = ARRAY(
+                    SELECT DISTINCT w.value FROM outdoor_site AS d,
+                        jsonb_array_elements_text(CASE WHEN jsonb_typeof(d.wind) = 'array' THEN d.wind ELSE '[]' END) AS w
+                    WHERE d.tree_id = s.tree_id AND d.lft BETWEEN s.lft AND s.rght
+                    ORDER BY w.value)
+        """, reverse_sql=migrations.RunSQL.noop),
+    ]
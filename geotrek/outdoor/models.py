@@ -4,10 +4,11 @@ from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.gis.db import models
 from django.contrib.gis.measure import D
+from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.indexes import GistIndex
 from django.core.validators import MinValueValidator
 from django.db.models import Q
-from django.db.models.signals import pre_delete
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.utils.html import escape
 from django.utils.translation import gettext_lazy as _
@@ -213,6 +214,13 @@ class Site(ZoningPropertiesMixin, AddPropertyMixin, PicturesMixin, PublishableMi
     managers = models.ManyToManyField(Organism, verbose_name=_("Managers"), blank=True)
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     view_points = GenericRelation('common.HDViewPoint', related_query_name='site')
+    # Attributes of the site and its descendants, kept up to date by SiteManager.update_hierarchy_attributes()
+    practices_in_hierarchy = ArrayField(models.IntegerField(), default=list, blank=True, editable=False)
+    sectors_in_hierarchy = ArrayField(models.IntegerField(), default=list, blank=True, editable=False)
+    ratings_in_hierarchy = ArrayField(models.IntegerField(), default=list, blank=True, editable=False)
+    managers_in_hierarchy = ArrayField(models.IntegerField(), default=list, blank=True, editable=False)
+    orientation_in_hierarchy = ArrayField(models.CharField(max_length=16), default=list, blank=True, editable=False)
+    wind_in_hierarchy = ArrayField(models.CharField(max_length=16), default=list, blank=True, editable=False)
 
     check_structure_in_forms = False
 
@@ -256,15 +264,12 @@ class Site(ZoningPropertiesMixin, AddPropertyMixin, PicturesMixin, PublishableMi
     @property
     def super_practices_id(self):
         """ Return practices of itself and its descendants as ids """
-        practices_id = self.get_descendants(include_self=True) \
-            .exclude(practice=None) \
-            .values_list('practice_id', flat=True)
-        return set(practices_id)
+        return set(self.practices_in_hierarchy)
 
     @property
     def super_practices(self):
         """ Return practices of itself and its descendants as objects """
-        return Practice.objects.filter(id__in=self.super_practices_id)  # Sorted and unique
+        return Practice.objects.filter(id__in=self.practices_in_hierarchy)  # Sorted and unique
 
     @property
     def super_practices_display(self):
@@ -281,41 +286,32 @@ class Site(ZoningPropertiesMixin, AddPropertyMixin, PicturesMixin, PublishableMi
     @property
     def super_ratings_id(self):
         """ Return ratings of itself and its descendants as ids """
-        ratings_id = self.get_descendants(include_self=True) \
-            .exclude(ratings=None) \
-            .values_list('ratings', flat=True)
-        return set(ratings_id)
+        return set(self.ratings_in_hierarchy)
 
     @property
     def super_ratings(self):
         """ Return ratings of itself and its descendants as objects """
-        return Rating.objects.filter(id__in=self.super_ratings_id)  # Sorted and unique
+        return Rating.objects.filter(id__in=self.ratings_in_hierarchy)  # Sorted and unique
 
     @property
     def super_sectors(self):
         """ Return sectors of itself and its descendants """
-        sectors_id = self.get_descendants(include_self=True) \
-            .exclude(practice=None) \
-            .values_list('practice__sector_id', flat=True)
-        return Sector.objects.filter(id__in=sectors_id)  # Sorted and unique
+        return Sector.objects.filter(id__in=self.sectors_in_hierarchy)  # Sorted and unique
 
     @property
     def super_orientation(self):
         """ Return orientation of itself and its descendants """
-        orientation = set(sum(self.get_descendants(include_self=True).values_list('orientation', flat=True), []))
-        return [o for o, _o in self.ORIENTATION_CHOICES if o in orientation]  # Sorting
+        return [o for o, _o in self.ORIENTATION_CHOICES if o in self.orientation_in_hierarchy]  # Sorting
 
     @property
     def super_wind(self):
         """ Return wind of itself and its descendants """
-        wind = set(sum(self.get_descendants(include_self=True).values_list('wind', flat=True), []))
-        return [o for o, _o in self.WIND_CHOICES if o in wind]  # Sorting
+        return [o for o, _o in self.WIND_CHOICES if o in self.wind_in_hierarchy]  # Sorting
 
     @property
     def super_managers(self):
         """ Return managers of itself and its descendants """
-        sites = self.get_descendants(include_self=True)
-        return Organism.objects.filter(site__in=sites)  # Sorted and unique
+        return Organism.objects.filter(id__in=self.managers_in_hierarchy)  # Sorted and unique
 
     @property
     def published_labels(self):
@@ -342,7 +338,10 @@ class Site(ZoningPropertiesMixin, AddPropertyMixin, PicturesMixin, PublishableMi
         return Intervention.objects.existing().filter(qs).distinct('pk')
 
     def save(self, *args, **kwargs):
+        # Previous ancestors also need an update if site is moved in the tree
+        previous_parent_id = Site.objects.filter(pk=self.pk).values_list('parent_id', flat=True).first() if self.pk else None
         super().save(*args, **kwargs)
+        Site.objects.update_hierarchy_attributes([self.pk, previous_parent_id])
         self.refresh_from_db()
 
     def delete(self, *args, **kwargs):
@@ -366,6 +365,50 @@ class Site(ZoningPropertiesMixin, AddPropertyMixin, PicturesMixin, PublishableMi
         return intersecting(queryset_or_model(queryset, cls), obj=tourism_obj)
 
 
+@receiver(post_delete, sender=Site)
+def update_hierarchy_attributes_on_delete(sender, instance, **kwargs):
+    Site.objects.update_hierarchy_attributes([instance.parent_id])
+
+
+@receiver(m2m_changed, sender=Site.ratings.through)
+@receiver(m2m_changed, sender=Site.managers.through)
+def update_hierarchy_attributes_on_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        Site.objects.update_hierarchy_attributes([instance.pk])
+        instance.refresh_from_db(fields=['ratings_in_hierarchy', 'managers_in_hierarchy'])
+    elif action == 'post_clear':
+        # Sites are not given on clear, find them from their (not yet updated) attributes
+        field = 'ratings_in_hierarchy' if sender is Site.ratings.through else 'managers_in_hierarchy'
+        Site.objects.update_hierarchy_attributes_containing(field, instance.pk)
+    elif pk_set:
+        Site.objects.update_hierarchy_attributes(pk_set)
+
+
+# Site relations are removed by cascade (or set to null) without m2m_changed or post_save signals
+@receiver(post_delete, sender=Rating)
+def update_hierarchy_attributes_on_rating_delete(sender, instance, **kwargs):
+    Site.objects.update_hierarchy_attributes_containing('ratings_in_hierarchy', instance.pk)
+
+
+@receiver(post_delete, sender=Organism)
+def update_hierarchy_attributes_on_organism_delete(sender, instance, **kwargs):
+    Site.objects.update_hierarchy_attributes_containing('managers_in_hierarchy', instance.pk)
+
+
+@receiver(post_delete, sender=Sector)
+def update_hierarchy_attributes_on_sector_delete(sender, instance, **kwargs):
+    Site.objects.update_hierarchy_attributes_containing('sectors_in_hierarchy', instance.pk)
+
+
+@receiver(post_save, sender=Practice)
+def update_hierarchy_attributes_on_practice_save(sender, instance, created, **kwargs):
+    # Sector of practice may have changed
+    if not created:
+        Site.objects.update_hierarchy_attributes(instance.sites.values_list('pk', flat=True))
+
+
 Path.add_property('sites', lambda self: intersecting(Site, self), _("Sites"))
 Topology.add_property('sites', Site.topology_sites, _("Sites"))
 TouristicContent.add_property('sites', Site.tourism_sites, _("Sites"))
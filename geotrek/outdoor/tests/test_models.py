@@ -118,6 +118,9 @@ class SiteSuperTest(TestCase):
             orientation=[],
             wind=[]
         )
+        # Attributes in hierarchy of ancestors were updated in database by their descendants
+        for site in (cls.alone, cls.parent, cls.child, cls.grandchild1, cls.grandchild2):
+            site.refresh_from_db()
 
     def test_super_practices_descendants(self):
         self.assertListEqual(list(self.parent.super_practices.values_list('name', flat=True)),
@@ -148,8 +151,9 @@ class SiteSuperTest(TestCase):
         self.assertEqual(self.grandchild2.super_wind, [])
 
     def test_super_managers_descendants(self):
+        # Managers are unique, as other super_* attributes ('b' manages both parent and child)
         self.assertListEqual(list(self.parent.super_managers.values_list('organism', flat=True)),
-                             ['a', 'b', 'b', 'c'])
+                             ['a', 'b', 'c'])
 
     def test_super_managers_ascendants(self):
         self.assertListEqual(list(self.grandchild2.super_managers.values_list('pk', flat=True)), [])
@@ -161,6 +165,51 @@ class SiteSuperTest(TestCase):
         self.assertEqual(self.grandchild1.super_practices_display, "Bbb")
         self.assertEqual(self.grandchild2.super_practices_display, "")
 
+    def test_super_attributes_follow_moved_site(self):
+        self.grandchild1.parent = self.alone
+        self.grandchild1.save()
+        self.alone.refresh_from_db()
+        self.child.refresh_from_db()
+        self.assertListEqual(list(self.alone.super_practices.values_list('name', flat=True)), ['Bbb'])
+        self.assertListEqual(self.alone.super_orientation, ['N', 'S'])
+        self.assertListEqual(list(self.child.super_practices.values_list('name', flat=True)), ['Aaa'])
+        self.assertListEqual(self.child.super_orientation, ['E', 'S'])
+
+    def test_super_attributes_follow_descendant_changes(self):
+        rating = RatingFactory()
+        self.grandchild2.ratings.add(rating)
+        self.grandchild2.orientation = ['W']
+        self.grandchild2.save()
+        self.parent.refresh_from_db()
+        self.assertListEqual(list(self.parent.super_ratings.values_list('pk', flat=True)), [rating.pk])
+        self.assertListEqual(self.parent.super_orientation, ['N', 'E', 'S', 'W'])
+        self.assertListEqual(list(Site.objects.filter(ratings_in_hierarchy__overlap=[rating.pk]).order_by('pk')),
+                             [self.parent, self.child, self.grandchild2])
+        self.grandchild2.delete()
+        self.parent.refresh_from_db()
+        self.assertListEqual(list(self.parent.super_ratings), [])
+        self.assertListEqual(self.parent.super_orientation, ['N', 'E', 'S'])
+
+    def test_super_attributes_follow_reverse_clear(self):
+        rating = RatingFactory()
+        rating.sites.add(self.grandchild2)
+        self.parent.refresh_from_db()
+        self.assertListEqual(list(self.parent.super_ratings), [rating])
+        rating.sites.clear()
+        self.parent.refresh_from_db()
+        self.assertListEqual(list(self.parent.super_ratings), [])
+
+    def test_super_attributes_follow_related_deletion(self):
+        rating = RatingFactory()
+        self.grandchild2.ratings.add(rating)
+        rating.delete()
+        self.parent.practice.sector.delete()
+        self.parent.managers.get(organism='a').delete()
+        self.parent.refresh_from_db()
+        self.assertListEqual(list(self.parent.super_ratings), [])
+        self.assertListEqual(list(self.parent.super_sectors.values_list('name', flat=True)), ['Axx'])
+        self.assertListEqual(list(self.parent.super_managers.values_list('organism', flat=True)), ['b', 'c'])
+
 
 class SectorTest(TestCase):
     def test_sector_str(self):
@@ -136,7 +136,15 @@ class Command(BaseCommand):
                 if not self.check_fields_available_without_default(available_fields, field_code, 'code'):
                     break
 
-                for feature in layer:
+                try:
+                    # Snap all points of the layer on paths at once
+                    topologies = Topology.deserialize_points([feature.geom for feature in layer]) \
+                        if settings.TREKKING_TOPOLOGY_ENABLED else [None] * len(layer)
+                except IndexError:
+                    # No path to snap on, error will be raised for each feature
+                    topologies = [None] * len(layer)
+
+                for feature, topology in zip(layer, topologies):
                     feature_geom = feature.geom
                     name = feature.get(field_name) if field_name in available_fields else default_name
                     if feature_geom.geom_type == 'MultiPoint':
@@ -202,7 +210,7 @@ class Command(BaseCommand):
                         'code': code,
                         'eid': eid
                     }
-                    self.create_signage(feature_geom, fields_to_integrate, verbosity)
+                    self.create_signage(feature_geom, fields_to_integrate, verbosity, topology)
 
             transaction.savepoint_commit(sid)
             if verbosity >= 2:
@@ -213,7 +221,7 @@ class Command(BaseCommand):
             transaction.savepoint_rollback(sid)
             raise
 
-    def create_signage(self, geometry, fields_to_integrate, verbosity):
+    def create_signage(self, geometry, fields_to_integrate, verbosity, topology=None):
 
         with transaction.atomic():
             conditions = fields_to_integrate.pop('conditions')
@@ -233,10 +241,11 @@ class Command(BaseCommand):
                     signage.conditions.set(conditions)
         if settings.TREKKING_TOPOLOGY_ENABLED:
             try:
-                geometry = geometry.transform(settings.API_SRID, clone=True)
-                geometry.coord_dim = 2
-                serialized = '{"lng": %s, "lat": %s}' % (geometry.x, geometry.y)
-                topology = Topology.deserialize(serialized)
+                if topology is None:
+                    geometry = geometry.transform(settings.API_SRID, clone=True)
+                    geometry.coord_dim = 2
+                    serialized = '{"lng": %s, "lat": %s}' % (geometry.x, geometry.y)
+                    topology = Topology.deserialize(serialized)
                 signage.mutate(topology)
             except IndexError:
                 raise GEOSException('Invalid Geometry type.')
@@ -60,12 +60,20 @@ class Command(BaseCommand):
                         "Set it with --type-field, or set a default value with --type-default"))
                     break
 
-                for feature in layer:
+                try:
+                    # Snap all points of the layer on paths at once
+                    topologies = Topology.deserialize_points([feature.geom for feature in layer]) \
+                        if settings.TREKKING_TOPOLOGY_ENABLED else [None] * len(layer)
+                except IndexError:
+                    # No path to snap on, error will be raised for each feature
+                    topologies = [None] * len(layer)
+
+                for feature, topology in zip(layer, topologies):
                     feature_geom = feature.geom
                     name = feature.get(field_name) if field_name in available_fields else options.get('name_default')
                     poitype = feature.get(field_poitype) if field_poitype in available_fields else options.get('type_default')
                     description = feature.get(field_description) if field_description in available_fields else ""
-                    self.create_poi(feature_geom, name, poitype, description)
+                    self.create_poi(feature_geom, name, poitype, description, topology)
                     if verbosity >= 2:
                         self.stdout.write(self.style.NOTICE("{} POI created.".format(name)))
 
@@ -78,16 +86,17 @@ class Command(BaseCommand):
             transaction.savepoint_rollback(sid)
             raise
 
-    def create_poi(self, geometry, name, poitype, description):
+    def create_poi(self, geometry, name, poitype, description, topology=None):
         poitype, created = POIType.objects.get_or_create(label=poitype)
         poi = POI.objects.create(name=name, type=poitype, description=description)
         if settings.TREKKING_TOPOLOGY_ENABLED:
-            # Use existing topology helpers to transform a Point(x, y)
-            # to a path aggregation (topology)
-            geometry = geometry.transform(settings.API_SRID, clone=True)
-            geometry.coord_dim = 2
-            serialized = '{"lng": %s, "lat": %s}' % (geometry.x, geometry.y)
-            topology = Topology.deserialize(serialized)
+            if topology is None:
+                # Use existing topology helpers to transform a Point(x, y)
+                # to a path aggregation (topology)
+                geometry = geometry.transform(settings.API_SRID, clone=True)
+                geometry.coord_dim = 2
+                serialized = '{"lng": %s, "lat": %s}' % (geometry.x, geometry.y)
+                topology = Topology.deserialize(serialized)
             # Move deserialization aggregations to the POI
             poi.mutate(topology)
         else:
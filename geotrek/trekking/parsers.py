@@ -1420,23 +1420,31 @@ class SchemaRandonneeParser(AttachmentParserMixin, Parser):
             upload_name, ext = os.path.splitext(attachment_upload(attachment, kwargs.get('name')))
             existing_name = attachment.attachment_file.name
             regexp = f"{upload_name}({random_suffix_regexp()})?(_[a-zA-Z0-9]{{7}})?{ext}"
-            if re.search(r"^{regexp}$".format(regexp=regexp), existing_name) and not self.has_size_changed(kwargs.get('url'), attachment):
-                found = True
-                attachments_to_delete.remove(attachment)
-                if (
-                        kwargs.get('author') != attachment.author
-                        or kwargs.get('legend') != attachment.legend
-                        or kwargs.get('title') != attachment.title
-                        or (kwargs.get('license_label') and not attachment.license)
-                        or (attachment.license and kwargs.get('license_label') != attachment.license.label)
-                ):
-                    attachment.author = kwargs.get('author')
-                    attachment.legend = textwrap.shorten(kwargs.get('legend'), width=127)
-                    attachment.title = textwrap.shorten(kwargs.get('title'), width=127)
-                    attachment.license = self.get_or_create_license(kwargs.get('license_label'))
-                    attachment.save(**{'skip_file_save': True})
-                    updated = True
-                break
+            if not re.search(r"^{regexp}$".format(regexp=regexp), existing_name):
+                continue
+            changed, validators = self.get_source_changes(kwargs.get('url'), attachment)
+            if changed:
+                continue
+            found = True
+            attachments_to_delete.remove(attachment)
+            metadata_changed = (
+                kwargs.get('author') != attachment.author
+                or kwargs.get('legend') != attachment.legend
+                or kwargs.get('title') != attachment.title
+                or (kwargs.get('license_label') and not attachment.license)
+                or (attachment.license and kwargs.get('license_label') != attachment.license.label)
+            )
+            if metadata_changed:
+                attachment.author = kwargs.get('author')
+                attachment.legend = textwrap.shorten(kwargs.get('legend'), width=127)
+                attachment.title = textwrap.shorten(kwargs.get('title'), width=127)
+                attachment.license = self.get_or_create_license(kwargs.get('license_label'))
+                updated = True
+            for field, value in validators.items():
+                setattr(attachment, field, value)
+            if metadata_changed or validators:
+                attachment.save(**{'skip_file_save': True})
+            break
         return found, updated
 
     def get_or_create_license(self, license_label):
@@ -0,0 +1,71 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Position along line topologies of their first intersection with zoning geometries
+POSITION_SQL = """
+    CASE WHEN GeometryType(t.geom) = 'LINESTRING'
+         THEN coalesce((SELECT MIN(ST_LineLocatePoint(t.geom, ST_StartPoint(part.geom)))
+                        FROM ST_Dump(ST_Intersection(t.geom, z.geom)) AS part), 1)
+         ELSE 0 END
+"""
+
+
+def fill_memberships_sql(table, column, zoning_table, zoning_key):
+    return f"""
+        INSERT INTO {table} (topology_id, {column}, position)
+        SELECT t.id, z.{zoning_key}, {POSITION_SQL}
+        FROM core_topology t JOIN {zoning_table} z ON ST_Intersects(t.geom, z.geom);
+    """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0038_auto_20250130_0912'),
+        ('zoning', '0103_alter_restrictedarea_area_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CityMembership',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.FloatField(default=0.0)),
+                ('city', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='topology_memberships', to='zoning.city')),
+                ('topology', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='city_memberships', to='core.topology')),
+            ],
+            options={
+                'ordering': ['position', 'city__name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DistrictMembership',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.FloatField(default=0.0)),
+                ('district', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='topology_memberships', to='zoning.district')),
+                ('topology', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='district_memberships', to='core.topology')),
+            ],
+            options={
+                'ordering': ['position', 'district__name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RestrictedAreaMembership',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.FloatField(default=0.0)),
+                ('area', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='topology_memberships', to='zoning.restrictedarea')),
+                ('topology', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='restrictedarea_memberships', to='core.topology')),
+            ],
+            options={
+                'ordering': ['position', 'area__area_type', 'area__name'],
+            },
+        ),
+        migrations.RunSQL(fill_memberships_sql('zoning_citymembership', 'city_id', 'zoning_city', 'code'),
+                          migrations.RunSQL.noop),
+        migrations.RunSQL(fill_memberships_sql('zoning_districtmembership', 'district_id', 'zoning_district', 'id'),
+                          migrations.RunSQL.noop),
+        migrations.RunSQL(fill_memberships_sql('zoning_restrictedareamembership', 'area_id', 'zoning_restrictedarea', 'id'),
+                          migrations.RunSQL.noop),
+    ]
@@ -1,10 +1,11 @@
 import hashlib
 
 from django.core.cache import cache
+from django.db.models import Prefetch
 from django.utils.translation import gettext_lazy as _
 
 from geotrek.common.utils import intersecting, uniquify
-from .models import RestrictedArea, District, City
+from .models import RestrictedArea, District, City, CityMembership, DistrictMembership, RestrictedAreaMembership
 
 
 class ZoningPropertiesMixin:
@@ -86,3 +87,65 @@ class ZoningPropertiesMixin:
         if not hasattr(self, 'published'):
             return self.cities
         return [city for city in self.cities if city.published]
+
+
+class TopologyZoningPropertiesMixin(ZoningPropertiesMixin):
+    """ Zoning of topologies is read from memberships maintained by triggers,
+    ordered along lines, instead of being computed with spatial queries.
+    """
+    @classmethod
+    def zoning_memberships_querysets(cls):
+        return {
+            'city_memberships': CityMembership.objects.select_related('city').defer('city__geom'),
+            'district_memberships': DistrictMembership.objects.select_related('district').defer('district__geom'),
+            'restrictedarea_memberships': RestrictedAreaMembership.objects.select_related('area__area_type')
+                                                                          .defer('area__geom'),
+        }
+
+    @classmethod
+    def zoning_prefetches(cls, *related_names):
+        """ Prefetch zoning memberships of a list of topologies (all of them if none given) """
+        return [Prefetch(related_name, queryset=queryset)
+                for related_name, queryset in cls.zoning_memberships_querysets().items()
+                if not related_names or related_name in related_names]
+
+    def _zoning_memberships(self, related_name):
+        if self.pk is None:
+            return []
+        prefetched = getattr(self, '_prefetched_objects_cache', {})
+        if related_name in prefetched:
+            return list(prefetched[related_name])
+        return list(self.zoning_memberships_querysets()[related_name].filter(topology_id=self.pk))
+
+    def get_areas(self):
+        if self.pk is None:
+            return super().get_areas()
+        return [membership.area for membership in self._zoning_memberships('restrictedarea_memberships')]
+
+    @property
+    def areas(self):
+        return self.get_areas()
+
+    def get_districts(self):
+        if self.pk is None:
+            return super().get_districts()
+        return [membership.district for membership in self._zoning_memberships('district_memberships')]
+
+    @property
+    def districts(self):
+        return self.get_districts()
+
+    def get_cities(self):
+        if self.pk is None:
+            return super().get_cities()
+        return [membership.city for membership in self._zoning_memberships('city_memberships')]
+
+    @property
+    def cities(self):
+        return self.get_cities()
+
+    def get_departure_city(self):
+        """ City where a line topology starts (or containing a point topology) """
+        # Positions come from linear referencing, the first city may not start exactly at 0
+        first = min(self._zoning_memberships('city_memberships'), key=lambda membership: membership.position, default=None)
+        return first.city if first else None
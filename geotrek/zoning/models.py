@@ -73,3 +73,40 @@ class District(TimeStampedModelMixin, models.Model):
 
     def __str__(self):
         return self.name
+
+
+class CityMembership(models.Model):
+    """ City intersected by a topology (maintained at DB-level with triggers) """
+    topology = models.ForeignKey('core.Topology', on_delete=models.DO_NOTHING, db_constraint=False,
+                                 related_name='city_memberships')
+    city = models.ForeignKey(City, on_delete=models.DO_NOTHING, db_constraint=False,
+                             related_name='topology_memberships')
+    # Position along a line topology of its first intersection with the city
+    position = models.FloatField(default=0.0)
+
+    class Meta:
+        ordering = ['position', 'city__name']
+
+
+class DistrictMembership(models.Model):
+    """ District intersected by a topology (maintained at DB-level with triggers) """
+    topology = models.ForeignKey('core.Topology', on_delete=models.DO_NOTHING, db_constraint=False,
+                                 related_name='district_memberships')
+    district = models.ForeignKey(District, on_delete=models.DO_NOTHING, db_constraint=False,
+                                 related_name='topology_memberships')
+    position = models.FloatField(default=0.0)
+
+    class Meta:
+        ordering = ['position', 'district__name']
+
+
+class RestrictedAreaMembership(models.Model):
+    """ Restricted area intersected by a topology (maintained at DB-level with triggers) """
+    topology = models.ForeignKey('core.Topology', on_delete=models.DO_NOTHING, db_constraint=False,
+                                 related_name='restrictedarea_memberships')
+    area = models.ForeignKey(RestrictedArea, on_delete=models.DO_NOTHING, db_constraint=False,
+                             related_name='topology_memberships')
+    position = models.FloatField(default=0.0)
+
+    class Meta:
+        ordering = ['position', 'area__area_type', 'area__name']
@@ -0,0 +1,97 @@
+-------------------------------------------------------------------------------
+-- Keep zoning layers intersected by topologies up-to-date
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {{ schema_geotrek }}.ft_zoning_position(topology_geom geometry, zoning_geom geometry) RETURNS float AS $$
+-- Position along a line of its first intersection with a zoning geometry,
+-- used to list zonings in the order they are crossed
+    SELECT CASE WHEN GeometryType(topology_geom) = 'LINESTRING'
+                THEN coalesce((SELECT MIN(ST_LineLocatePoint(topology_geom, ST_StartPoint(part.geom)))
+                               FROM ST_Dump(ST_Intersection(topology_geom, zoning_geom)) AS part), 1)
+                ELSE 0 END;
+$$ LANGUAGE sql IMMUTABLE;
+
+
+CREATE FUNCTION {{ schema_geotrek }}.update_topology_zoning(t_id integer) RETURNS void AS $$
+BEGIN
+    DELETE FROM zoning_citymembership WHERE topology_id = t_id;
+    DELETE FROM zoning_districtmembership WHERE topology_id = t_id;
+    DELETE FROM zoning_restrictedareamembership WHERE topology_id = t_id;
+
+    INSERT INTO zoning_citymembership (topology_id, city_id, position)
+        SELECT t.id, z.code, ft_zoning_position(t.geom, z.geom)
+        FROM core_topology t JOIN zoning_city z ON ST_Intersects(t.geom, z.geom)
+        WHERE t.id = t_id;
+    INSERT INTO zoning_districtmembership (topology_id, district_id, position)
+        SELECT t.id, z.id, ft_zoning_position(t.geom, z.geom)
+        FROM core_topology t JOIN zoning_district z ON ST_Intersects(t.geom, z.geom)
+        WHERE t.id = t_id;
+    INSERT INTO zoning_restrictedareamembership (topology_id, area_id, position)
+        SELECT t.id, z.id, ft_zoning_position(t.geom, z.geom)
+        FROM core_topology t JOIN zoning_restrictedarea z ON ST_Intersects(t.geom, z.geom)
+        WHERE t.id = t_id;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE FUNCTION {{ schema_geotrek }}.ft_topology_zoning_iu() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    PERFORM update_topology_zoning(NEW.id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_topology_zoning_i_tgr
+AFTER INSERT ON core_topology
+FOR EACH ROW
+WHEN (NEW.geom IS NOT NULL)
+EXECUTE PROCEDURE ft_topology_zoning_iu();
+
+CREATE TRIGGER core_topology_zoning_u_tgr
+AFTER UPDATE OF geom ON core_topology
+FOR EACH ROW
+WHEN (OLD.geom IS DISTINCT FROM NEW.geom)
+EXECUTE PROCEDURE ft_topology_zoning_iu();
+
+
+CREATE FUNCTION {{ schema_geotrek }}.ft_topology_zoning_d() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    DELETE FROM zoning_citymembership WHERE topology_id = OLD.id;
+    DELETE FROM zoning_districtmembership WHERE topology_id = OLD.id;
+    DELETE FROM zoning_restrictedareamembership WHERE topology_id = OLD.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_topology_zoning_d_tgr
+AFTER DELETE ON core_topology
+FOR EACH ROW EXECUTE PROCEDURE ft_topology_zoning_d();
+
+
+-- Arguments: membership table, its zoning column, zoning primary key
+CREATE FUNCTION {{ schema_geotrek }}.ft_zoning_memberships_iud() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        EXECUTE format('DELETE FROM %I WHERE %I = ($1).%I', TG_ARGV[0], TG_ARGV[1], TG_ARGV[2]) USING OLD;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        EXECUTE format('INSERT INTO %I (topology_id, %I, position)
+                        SELECT t.id, ($1).%I, ft_zoning_position(t.geom, ($1).geom)
+                        FROM core_topology t WHERE ST_Intersects(t.geom, ($1).geom)',
+                       TG_ARGV[0], TG_ARGV[1], TG_ARGV[2]) USING NEW;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER zoning_city_memberships_iud_tgr
+AFTER INSERT OR UPDATE OF code, geom OR DELETE ON zoning_city
+FOR EACH ROW EXECUTE PROCEDURE ft_zoning_memberships_iud('zoning_citymembership', 'city_id', 'code');
+
+CREATE TRIGGER zoning_district_memberships_iud_tgr
+AFTER INSERT OR UPDATE OF geom OR DELETE ON zoning_district
+FOR EACH ROW EXECUTE PROCEDURE ft_zoning_memberships_iud('zoning_districtmembership', 'district_id', 'id');
+
+CREATE TRIGGER zoning_restrictedarea_memberships_iud_tgr
+AFTER INSERT OR UPDATE OF geom OR DELETE ON zoning_restrictedarea
+FOR EACH ROW EXECUTE PROCEDURE ft_zoning_memberships_iud('zoning_restrictedareamembership', 'area_id', 'id');
@@ -19,3 +19,11 @@ DROP VIEW IF EXISTS f_v_secteur CASCADE;
 DROP VIEW IF EXISTS v_districts CASCADE;
 DROP VIEW IF EXISTS f_v_zonage CASCADE;
 DROP VIEW IF EXISTS v_restrictedareas CASCADE;
+
+-- 30
+
+DROP FUNCTION IF EXISTS ft_zoning_position(geometry, geometry) CASCADE;
+DROP FUNCTION IF EXISTS update_topology_zoning(integer) CASCADE;
+DROP FUNCTION IF EXISTS ft_topology_zoning_iu() CASCADE;
+DROP FUNCTION IF EXISTS ft_topology_zoning_d() CASCADE;
+DROP FUNCTION IF EXISTS ft_zoning_memberships_iud() CASCADE;
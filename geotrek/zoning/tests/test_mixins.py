@@ -2,6 +2,7 @@ from django.conf import settings
 from django.test import TestCase
 
 from geotrek.core.tests.factories import PathFactory
+from geotrek.trekking.models import Trek
 from geotrek.trekking.tests.factories import TrekFactory
 from geotrek.zoning.tests.factories import CityFactory, DistrictFactory, RestrictedAreaFactory
 
@@ -103,3 +104,47 @@ class ZoningPropertiesMixinTest(TestCase):
         self.assertEqual(len(self.path.areas), 2)
         self.assertListEqual([a.pk for a in self.path.published_areas], [area.pk, self.area.pk])
         self.assertEqual(len(self.path.published_areas), 2)
+
+
+class TopologyZoningPropertiesMixinTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.city_1 = CityFactory.create(code='01', geom='SRID=2154;MULTIPOLYGON(((200000 300000, 900000 300000, '
+                                        '900000 1200000, 200000 1200000, 200000 300000)))')
+        cls.city_2 = CityFactory.create(code='02', geom='SRID=2154;MULTIPOLYGON(((900000 300000, 1100000 300000, '
+                                        '1100000 1200000, 900000 1200000, 900000 300000)))')
+
+    def create_trek(self, geom):
+        if settings.TREKKING_TOPOLOGY_ENABLED:
+            path = PathFactory.create(geom=geom)
+            return TrekFactory.create(paths=[path], published=False), path
+        return TrekFactory.create(geom=geom, published=False), None
+
+    def test_memberships_follow_topology_geometry(self):
+        trek, path = self.create_trek('SRID=2154;LINESTRING(1000000 400000, 300000 400000)')
+        self.assertListEqual([c.code for c in trek.cities], ['02', '01'])
+        self.assertEqual(trek.get_departure_city(), self.city_2)
+        if path:
+            path.reverse()
+            path.save()
+        else:
+            trek.geom = 'SRID=2154;LINESTRING(300000 400000, 1000000 400000)'
+            trek.save()
+        self.assertListEqual([c.code for c in trek.cities], ['01', '02'])
+        self.assertEqual(trek.get_departure_city(), self.city_1)
+
+    def test_memberships_follow_zoning_changes(self):
+        trek, path = self.create_trek('SRID=2154;LINESTRING(300000 400000, 1000000 400000)')
+        city = CityFactory.create(code='03', geom='SRID=2154;MULTIPOLYGON(((950000 350000, 1050000 350000, '
+                                  '1050000 450000, 950000 450000, 950000 350000)))')
+        self.assertListEqual([c.code for c in trek.cities], ['01', '02', '03'])
+        city.delete()
+        self.assertListEqual([c.code for c in trek.cities], ['01', '02'])
+
+    def test_memberships_prefetched(self):
+        self.create_trek('SRID=2154;LINESTRING(300000 400000, 1000000 400000)')
+        self.create_trek('SRID=2154;LINESTRING(1000000 400000, 300000 400000)')
+        treks = Trek.objects.prefetch_related(*Trek.zoning_prefetches('city_memberships')).order_by('pk')
+        with self.assertNumQueries(2):
+            self.assertListEqual([[c.code for c in trek.cities] for trek in treks],
+                                 [['01', '02'], ['02', '01']])
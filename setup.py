@@ -55,6 +55,7 @@ setup(
         "pyopenair",
         "django-treebeard",
         'easy-thumbnails[svg]',
+        'numpy',
         # prod,
         'gunicorn',
         'sentry-sdk',